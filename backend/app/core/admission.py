@@ -0,0 +1,57 @@
+from typing import Dict
+from fastapi import HTTPException, status
+from app.core.concurrency import ConcurrencyLimiter, ConcurrencyLimitExceeded
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 各高成本端點的准入限制：超過並行上限的請求在有界佇列中等待，
+# 已准入的請求不會因為過載而一起變慢（佇列深度及拒絕數見 esigned_executor_* 指標）
+admission_limiters: Dict[str, ConcurrencyLimiter] = {
+    "sign": ConcurrencyLimiter(
+        "admission-sign",
+        max_concurrency=settings.admission_sign_concurrency,
+        max_queue=settings.admission_sign_max_queue,
+        queue_timeout=settings.admission_sign_queue_timeout
+    ),
+    "upload": ConcurrencyLimiter(
+        "admission-upload",
+        max_concurrency=settings.admission_upload_concurrency,
+        max_queue=settings.admission_upload_max_queue,
+        queue_timeout=settings.admission_upload_queue_timeout
+    ),
+}
+
+def admission(name: str):
+    """
+    建立准入控制依賴
+
+    佇列已滿時回傳 429，等待逾時回傳 503，兩者都帶有 Retry-After 標頭；
+    准入的名額在請求處理完成後釋放
+
+    Args:
+        name: admission_limiters 中的名稱，例如 "sign"
+    """
+    limiter = admission_limiters[name]
+
+    async def dependency():
+        try:
+            await limiter.acquire()
+        except ConcurrencyLimitExceeded as e:
+            logger.warning(f"准入控制拒絕請求: {name} ({e.reason})")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS if e.reason == "queue_full"
+                else status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="伺服器忙碌中，請稍後重試",
+                headers={"Retry-After": str(e.retry_after)}
+            )
+        try:
+            yield
+        finally:
+            limiter.release()
+
+    return dependency
+
+def admission_stats() -> dict:
+    return {name: limiter.stats() for name, limiter in admission_limiters.items()}
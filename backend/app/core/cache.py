@@ -0,0 +1,99 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+from app.core.config import settings
+from app.core.change_streams import ChangeStreamWatcher
+from app.core.metrics import CACHE_REQUESTS
+import logging
+
+logger = logging.getLogger(__name__)
+
+class TTLCache:
+    """程序內快取，每筆資料有存活時間 (TTL)，超過容量時淘汰最久未使用的資料 (LRU)"""
+
+    def __init__(self, name: str, max_size: int, ttl_seconds: float):
+        self.name = name
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hit_counter = CACHE_REQUESTS.labels(name, "hit")
+        self._miss_counter = CACHE_REQUESTS.labels(name, "miss")
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                self._miss_counter.inc()
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                self._miss_counter.inc()
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            self._hit_counter.inc()
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Any], bool]):
+        """移除所有符合條件的資料"""
+        with self._lock:
+            for key in [key for key, (_, value) in self._data.items() if predicate(value)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0
+        }
+
+# 用戶快取：以 username 及 ("id", 用戶 ID) 為鍵
+user_cache = TTLCache("user", settings.user_cache_max_size, settings.user_cache_ttl_seconds)
+
+def invalidate_user(username: Optional[str] = None, user_id: Any = None):
+    """使用戶快取失效（資料變更後呼叫），以用戶名或 ID 都會移除該用戶的所有快取資料"""
+    if username is not None:
+        user_cache.invalidate(username)
+        user_cache.invalidate_where(lambda user: user.get("username") == username)
+    if user_id is not None:
+        user_id = str(user_id)
+        user_cache.invalidate_where(lambda user: str(user["_id"]) == user_id)
+
+class UserCacheInvalidator(ChangeStreamWatcher):
+    """監看 users collection，讓其他 worker 的變更也能使本 worker 的快取失效"""
+
+    def __init__(self):
+        super().__init__("users")
+
+    def _dispatch(self, change: dict):
+        if change.get("operationType") in ("update", "replace", "delete"):
+            invalidate_user(user_id=change.get("documentKey", {}).get("_id"))
+
+user_cache_invalidator = UserCacheInvalidator()
@@ -0,0 +1,75 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import List, Optional
+from pymongo.errors import OperationFailure
+from app.core.config import settings
+from app.database import get_database
+import logging
+
+logger = logging.getLogger(__name__)
+
+# MongoDB 未以 replica set 執行時不支援 change stream
+CHANGE_STREAM_NOT_SUPPORTED = 40573
+
+class ChangeStreamWatcher(ABC):
+    """
+    監看單一 collection 的 change stream
+
+    連線中斷時自動以 resume token 重新連線；MongoDB 不支援 change stream 時停止監看
+    """
+
+    def __init__(self, collection_name: str, full_document: Optional[str] = None, pipeline: Optional[List[dict]] = None):
+        self.collection_name = collection_name
+        self.full_document = full_document
+        self.pipeline = pipeline
+        self.available = False
+        self._task: Optional[asyncio.Task] = None
+        self._resume_token = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.available = False
+
+    async def _watch(self):
+        db = await get_database()
+        collection = db[self.collection_name]
+        while True:
+            try:
+                async with collection.watch(
+                    pipeline=self.pipeline,
+                    full_document=self.full_document,
+                    resume_after=self._resume_token
+                ) as stream:
+                    self.available = True
+                    logger.info(f"{self.collection_name} 變更事件串流已啟動")
+                    async for change in stream:
+                        self._resume_token = stream.resume_token
+                        self._dispatch(change)
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                self.available = False
+                if e.code == CHANGE_STREAM_NOT_SUPPORTED:
+                    logger.warning(f"MongoDB 未啟用 replica set，停用 {self.collection_name} 變更事件串流")
+                    return
+                logger.error(f"{self.collection_name} 變更事件串流錯誤: {e}")
+                self._resume_token = None
+            except Exception as e:
+                self.available = False
+                logger.error(f"{self.collection_name} 變更事件串流中斷: {e}")
+
+            await asyncio.sleep(settings.change_stream_retry_seconds)
+
+    @abstractmethod
+    def _dispatch(self, change: dict):
+        """處理一筆變更事件（在事件迴圈中同步執行，不可阻塞）"""
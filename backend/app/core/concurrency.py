@@ -0,0 +1,122 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Callable, Optional
+from app.core.metrics import EXECUTOR_IN_FLIGHT, EXECUTOR_QUEUED, EXECUTOR_REJECTED
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ConcurrencyLimitExceeded(Exception):
+    """等待佇列已滿或等待逾時"""
+
+    def __init__(self, name: str, reason: str, retry_after: int = 1):
+        self.name = name
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"{name}: {reason}")
+
+class ConcurrencyLimiter:
+    """
+    並行數量限制器
+
+    超過上限的請求在有界佇列中等待，佇列已滿或等待逾時時拋出 ConcurrencyLimitExceeded
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.queued = 0
+        self.completed = 0
+        self.rejected = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._in_flight_gauge = EXECUTOR_IN_FLIGHT.labels(name)
+        self._queued_gauge = EXECUTOR_QUEUED.labels(name)
+
+    async def acquire(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        if self._semaphore.locked() and self.queued >= self.max_queue:
+            self.rejected += 1
+            EXECUTOR_REJECTED.labels(self.name, "queue_full").inc()
+            raise ConcurrencyLimitExceeded(self.name, "queue_full", self._retry_after())
+
+        self.queued += 1
+        self._queued_gauge.inc()
+        try:
+            # 不使用 wait_for：Python 3.11 的 wait_for 在取得名額的同時逾時會拋出 TimeoutError
+            # 而不釋放名額；asyncio.timeout 以取消結束等待，Semaphore.acquire 被取消時會歸還名額
+            async with asyncio.timeout(self.queue_timeout):
+                await self._semaphore.acquire()
+        except TimeoutError:
+            self.rejected += 1
+            EXECUTOR_REJECTED.labels(self.name, "queue_timeout").inc()
+            raise ConcurrencyLimitExceeded(self.name, "queue_timeout", self._retry_after())
+        finally:
+            self.queued -= 1
+            self._queued_gauge.dec()
+
+        self.in_flight += 1
+        self._in_flight_gauge.inc()
+
+    def release(self):
+        self.in_flight -= 1
+        self._in_flight_gauge.dec()
+        self.completed += 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _retry_after(self) -> int:
+        return max(1, int(self.queue_timeout))
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected
+        }
+
+class BoundedExecutor:
+    """
+    有並行上限的執行緒池
+
+    用於在事件迴圈外執行 CPU 密集的同步函數（例如 bcrypt），
+    避免阻塞其他請求；超過上限的呼叫排隊等待
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.limiter = ConcurrencyLimiter(name, max_workers, max_queue, queue_timeout)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """在執行緒池中執行函數並等待結果（保留呼叫端的 contextvars）"""
+        async with self.limiter.slot():
+            loop = asyncio.get_running_loop()
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(
+                self._executor,
+                functools.partial(context.run, func, *args, **kwargs)
+            )
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait)
+
+    def stats(self) -> dict:
+        return self.limiter.stats()
@@ -1,453 +1,217 @@
+import asyncio
+import time
 import aiosmtplib
+from collections import deque
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from typing import Deque, List, Optional, Set
 from app.core.config import settings
+from app.core.email_templates import render_email
 import logging
-import ssl
 
 logger = logging.getLogger(__name__)
 
-async def send_activation_email(email: str, activation_code: str, language: str = "zh-TW"):
-    """發送啟用郵件 - 正式郵件發送版本"""
-    
-    try:
-        logger.info(f"準備發送啟用郵件到: {email}")
-        
-        # 多語言郵件內容（HTML格式）
-        email_templates = {
-            "zh-TW": {
-                "subject": "eSignedOnline 帳號啟用",
-                "body": f"""
-                <html>
-                <body>
-                    <h2>歡迎使用 eSignedOnline</h2>
-                    <p>您的帳號已成功註冊。請使用以下啟用碼啟用您的帳號：</p>
-                    <h3 style="color: #1976d2;">{activation_code}</h3>
-                    <p>請在系統中輸入此啟用碼以完成帳號啟用。</p>
-                    <p>此啟用碼將在24小時後過期。</p>
-                    <br>
-                    <p>謝謝！</p>
-                    <p>eSignedOnline 團隊</p>
-                </body>
-                </html>
-                """
-            },
-            "en": {
-                "subject": "eSignedOnline Account Activation",
-                "body": f"""
-                <html>
-                <body>
-                    <h2>Welcome to eSignedOnline</h2>
-                    <p>Your account has been successfully registered. Please use the following activation code:</p>
-                    <h3 style="color: #1976d2;">{activation_code}</h3>
-                    <p>Please enter this activation code in the system to complete your account activation.</p>
-                    <p>This activation code will expire in 24 hours.</p>
-                    <br>
-                    <p>Thank you!</p>
-                    <p>eSignedOnline Team</p>
-                </body>
-                </html>
-                """
-            },
-            "vi": {
-                "subject": "Kích hoạt tài khoản eSignedOnline",
-                "body": f"""
-                <html>
-                <body>
-                    <h2>Chào mừng đến với eSignedOnline</h2>
-                    <p>Tài khoản của bạn đã được đăng ký thành công. Vui lòng sử dụng mã kích hoạt sau:</p>
-                    <h3 style="color: #1976d2;">{activation_code}</h3>
-                    <p>Vui lòng nhập mã kích hoạt này vào hệ thống để hoàn tất việc kích hoạt tài khoản.</p>
-                    <p>Mã kích hoạt này sẽ hết hạn sau 24 giờ.</p>
-                    <br>
-                    <p>Cảm ơn!</p>
-                    <p>Đội ngũ eSignedOnline</p>
-                </body>
-                </html>
-                """
-            }
-        }
-        
-        template = email_templates.get(language, email_templates["zh-TW"])
-        
-        # 創建郵件
-        message = MIMEMultipart("alternative")
-        message["From"] = settings.smtp_username
-        message["To"] = email
-        message["Subject"] = template["subject"]
-        
-        # 添加HTML內容
-        html_part = MIMEText(template["body"], "html")
-        message.attach(html_part)
-        
-        # 嘗試使用標準 SMTP 發送
-        try:
-            logger.info(f"嘗試使用標準 SMTP 發送: {settings.smtp_host}:{settings.smtp_port}")
-            
-            smtp = aiosmtplib.SMTP(
-                hostname=settings.smtp_host,
-                port=settings.smtp_port,
-                use_tls=False
-            )
-            
-            await smtp.connect()
-            await smtp.starttls()
-            await smtp.login(settings.smtp_username, settings.smtp_password)
-            await smtp.send_message(message)
-            await smtp.quit()
-            
-            logger.info(f"啟用郵件已成功發送到: {email}")
-            return True
-            
-        except Exception as smtp_error:
-            logger.warning(f"標準 SMTP 發送失敗: {smtp_error}")
-            logger.info("嘗試備用 SMTP 方法...")
-            # 使用備用方法
-            return await send_activation_email_fallback(email, activation_code, language)
-        
-    except Exception as e:
-        logger.error(f"郵件發送失敗: {e}")
-        # 記錄啟用碼到日誌供管理員查看
-        logger.error(f"!!! 重要：用戶 {email} 的啟用碼是: {activation_code} !!!")
-        print(f"!!! 重要：用戶 {email} 的啟用碼是: {activation_code} !!!")
-        return False
+class _PooledConnection:
+    """連接池中的 SMTP 連接及其使用統計"""
 
-async def send_activation_email_fallback(email: str, activation_code: str, language: str = "zh-TW"):
-    """備用郵件發送方法 - 使用不同的 SMTP 配置"""
-    
-    # 多語言郵件內容
-    email_templates = {
-        "zh-TW": {
-            "subject": "eSignedOnline 帳號啟用",
-            "body": f"""
-            <html>
-            <body>
-                <h2>歡迎使用 eSignedOnline</h2>
-                <p>您的帳號已成功註冊，請使用以下啟用碼啟用您的帳號：</p>
-                <h3 style="color: #1976d2;">{activation_code}</h3>
-                <p>請在系統中輸入此啟用碼以完成帳號啟用。</p>
-                <p>此啟用碼將在 24 小時後失效。</p>
-                <br>
-                <p>謝謝！</p>
-                <p>eSignedOnline 團隊</p>
-            </body>
-            </html>
-            """
-        },
-        "en": {
-            "subject": "eSignedOnline Account Activation",
-            "body": f"""
-            <html>
-            <body>
-                <h2>Welcome to eSignedOnline</h2>
-                <p>Your account has been successfully registered. Please use the following activation code to activate your account:</p>
-                <h3 style="color: #1976d2;">{activation_code}</h3>
-                <p>Please enter this activation code in the system to complete account activation.</p>
-                <p>This activation code will expire in 24 hours.</p>
-                <br>
-                <p>Thank you!</p>
-                <p>eSignedOnline Team</p>
-            </body>
-            </html>
-            """
-        },
-        "vi": {
-            "subject": "Kích hoạt tài khoản eSignedOnline",
-            "body": f"""
-            <html>
-            <body>
-                <h2>Chào mừng đến với eSignedOnline</h2>
-                <p>Tài khoản của bạn đã được đăng ký thành công. Vui lòng sử dụng mã kích hoạt sau để kích hoạt tài khoản:</p>
-                <h3 style="color: #1976d2;">{activation_code}</h3>
-                <p>Vui lòng nhập mã kích hoạt này vào hệ thống để hoàn tất việc kích hoạt tài khoản.</p>
-                <p>Mã kích hoạt này sẽ hết hạn sau 24 giờ.</p>
-                <br>
-                <p>Cảm ơn!</p>
-                <p>Đội ngũ eSignedOnline</p>
-            </body>
-            </html>
-            """
-        }
-    }
-    
-    template = email_templates.get(language, email_templates["zh-TW"])
-    
-    message = MIMEMultipart("alternative")
-    message["From"] = settings.smtp_username
-    message["To"] = email
-    message["Subject"] = template["subject"]
-    
-    html_part = MIMEText(template["body"], "html")
-    message.attach(html_part)
-    
-    try:
-        # 方法1: 嘗試使用 SSL 端口 (465)
-        logger.info(f"備用方法1: 嘗試使用 SSL 端口 465")
-        
+    def __init__(self, smtp: aiosmtplib.SMTP):
+        self.smtp = smtp
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+
+class SMTPConnectionPool:
+    """
+    SMTP 連接池
+
+    保留已完成 TLS 與登入的連接供後續郵件重複使用；
+    閒置過久的連接先以 NOOP 檢查，每個連接發送一定數量的郵件後重新連接，
+    避免觸發郵件服務商的連接頻率限制
+    """
+
+    def __init__(
+        self,
+        name: str,
+        hostname: str,
+        port: int,
+        use_tls: bool = False,
+        start_tls: bool = False,
+        validate_certs: bool = True
+    ):
+        self.name = name
+        self.hostname = hostname
+        self.port = port
+        self.use_tls = use_tls
+        self.start_tls = start_tls
+        self.validate_certs = validate_certs
+        self.max_size = settings.smtp_pool_size
+        self.max_messages = settings.smtp_max_messages_per_connection
+        self.idle_check_seconds = settings.smtp_idle_check_seconds
+        self.idle_timeout = settings.smtp_idle_timeout_seconds
+        self.connects = 0
+        self.reused = 0
+        self.failures = 0
+        self._idle: Deque[_PooledConnection] = deque()
+        # 背景關閉中的連接；保留參考避免工作在完成前被垃圾回收
+        self._closing: Set[asyncio.Task] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def _connect(self) -> _PooledConnection:
         smtp = aiosmtplib.SMTP(
-            hostname=settings.smtp_host,
-            port=465,  # Gmail SSL 端口
-            use_tls=True,
-            validate_certs=False
+            hostname=self.hostname,
+            port=self.port,
+            use_tls=self.use_tls,
+            start_tls=self.start_tls,
+            validate_certs=self.validate_certs,
+            timeout=settings.smtp_timeout_seconds
         )
-        
         await smtp.connect()
-        await smtp.login(settings.smtp_username, settings.smtp_password)
-        await smtp.send_message(message)
-        await smtp.quit()
-        
-        logger.info(f"備用方法1成功：啟用郵件已發送到 {email}")
-        return True
-        
-    except Exception as ssl_error:
-        logger.warning(f"備用方法1 (SSL) 失敗: {ssl_error}")
-        
-        # 方法2: 嘗試使用 TLS 端口 (587) 但不啟用 STARTTLS
-        try:
-            logger.info(f"備用方法2: 嘗試 TLS 端口 587")
-            
-            smtp = aiosmtplib.SMTP(
-                hostname=settings.smtp_host,
-                port=587,
-                use_tls=False
-            )
-            
-            await smtp.connect()
+        if settings.smtp_username:
             await smtp.login(settings.smtp_username, settings.smtp_password)
-            await smtp.send_message(message)
-            await smtp.quit()
-            
-            logger.info(f"備用方法2成功：啟用郵件已發送到 {email}")
-            return True
-            
-        except Exception as tls_error:
-            logger.error(f"備用方法2也失敗: {tls_error}")
-            
-            # 所有方法都失敗，記錄詳細錯誤信息
-            logger.error(f"所有SMTP方法都失敗。SMTP配置:")
-            logger.error(f"  主機: {settings.smtp_host}")
-            logger.error(f"  用戶名: {settings.smtp_username}")
-            logger.error(f"  密碼長度: {len(settings.smtp_password) if settings.smtp_password else 0}")
-            logger.error(f"!!! 重要：用戶 {email} 的啟用碼: {activation_code} !!!")
-            print(f"!!! 重要：用戶 {email} 的啟用碼: {activation_code} !!!")
-            
+        self.connects += 1
+        logger.info(f"已建立 SMTP 連接 ({self.name}): {self.hostname}:{self.port}")
+        return _PooledConnection(smtp)
+
+    async def _is_healthy(self, connection: _PooledConnection) -> bool:
+        """檢查閒置連接是否仍可使用"""
+        if not connection.smtp.is_connected:
+            return False
+        idle = time.monotonic() - connection.last_used
+        if idle > self.idle_timeout:
             return False
+        if idle > self.idle_check_seconds:
+            try:
+                await connection.smtp.noop()
+            except Exception:
+                return False
+        return True
 
-async def send_password_reset_email(email: str, reset_token: str, language: str = "zh-TW"):
-    """發送重設密碼郵件"""
-    
-    try:
-        logger.info(f"準備發送重設密碼郵件到: {email}")
-        
-        # 多語言郵件內容（HTML格式）
-        email_templates = {
-            "zh-TW": {
-                "subject": "eSignedOnline 密碼重設",
-                "body": f"""
-                <html>
-                <body>
-                    <h2>密碼重設請求</h2>
-                    <p>您收到此郵件是因為有人請求重設您的 eSignedOnline 帳號密碼。</p>
-                    <p>請使用以下重設碼重設您的密碼：</p>
-                    <h3 style="color: #1976d2;">{reset_token}</h3>
-                    <p>此重設碼將在1小時後過期。</p>
-                    <p>如果您沒有請求重設密碼，請忽略此郵件。</p>
-                    <br>
-                    <p>eSignedOnline 團隊</p>
-                </body>
-                </html>
-                """
-            },
-            "en": {
-                "subject": "eSignedOnline Password Reset",
-                "body": f"""
-                <html>
-                <body>
-                    <h2>Password Reset Request</h2>
-                    <p>You received this email because someone requested a password reset for your eSignedOnline account.</p>
-                    <p>Please use the following reset code to reset your password:</p>
-                    <h3 style="color: #1976d2;">{reset_token}</h3>
-                    <p>This reset code will expire in 1 hour.</p>
-                    <p>If you didn't request a password reset, please ignore this email.</p>
-                    <br>
-                    <p>eSignedOnline Team</p>
-                </body>
-                </html>
-                """
-            },
-            "vi": {
-                "subject": "Đặt lại mật khẩu eSignedOnline",
-                "body": f"""
-                <html>
-                <body>
-                    <h2>Yêu cầu đặt lại mật khẩu</h2>
-                    <p>Bạn nhận được email này vì có người đã yêu cầu đặt lại mật khẩu cho tài khoản eSignedOnline của bạn.</p>
-                    <p>Vui lòng sử dụng mã đặt lại sau để đặt lại mật khẩu:</p>
-                    <h3 style="color: #1976d2;">{reset_token}</h3>
-                    <p>Mã đặt lại này sẽ hết hạn sau 1 giờ.</p>
-                    <p>Nếu bạn không yêu cầu đặt lại mật khẩu, vui lòng bỏ qua email này.</p>
-                    <br>
-                    <p>Đội ngũ eSignedOnline</p>
-                </body>
-                </html>
-                """
-            }
-        }
-        
-        template = email_templates.get(language, email_templates["zh-TW"])
-        
-        # 創建郵件
-        message = MIMEMultipart("alternative")
-        message["From"] = settings.smtp_username
-        message["To"] = email
-        message["Subject"] = template["subject"]
-        
-        # 添加HTML內容
-        html_part = MIMEText(template["body"], "html")
-        message.attach(html_part)
-        
-        # 嘗試使用標準 SMTP 發送
+    async def _acquire(self) -> _PooledConnection:
+        while self._idle:
+            connection = self._idle.pop()
+            if await self._is_healthy(connection):
+                self.reused += 1
+                return connection
+            await self._discard(connection)
+        return await self._connect()
+
+    def _release(self, connection: _PooledConnection):
+        connection.messages_sent += 1
+        connection.last_used = time.monotonic()
+        if connection.messages_sent >= self.max_messages:
+            task = asyncio.create_task(self._discard(connection, quit=True))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+        else:
+            self._idle.append(connection)
+
+    async def _discard(self, connection: _PooledConnection, quit: bool = False):
         try:
-            logger.info(f"嘗試使用標準 SMTP 發送重設密碼郵件: {settings.smtp_host}:{settings.smtp_port}")
-            
-            smtp = aiosmtplib.SMTP(
-                hostname=settings.smtp_host,
-                port=settings.smtp_port,
-                use_tls=False
-            )
-            
-            await smtp.connect()
-            await smtp.starttls()
-            await smtp.login(settings.smtp_username, settings.smtp_password)
-            await smtp.send_message(message)
-            await smtp.quit()
-            
-            logger.info(f"重設密碼郵件已成功發送到: {email}")
-            return True
-            
-        except Exception as smtp_error:
-            logger.warning(f"標準 SMTP 發送重設密碼郵件失敗: {smtp_error}")
-            logger.info("嘗試備用 SMTP 方法...")
-            # 使用備用方法
-            return await send_password_reset_email_fallback(email, reset_token, language)
-        
-    except Exception as e:
-        logger.error(f"重設密碼郵件發送失敗: {e}")
-        # 記錄重設令牌到日誌供管理員查看
-        logger.error(f"!!! 重要：用戶 {email} 的重設密碼令牌: {reset_token} !!!")
-        print(f"!!! 重要：用戶 {email} 的重設密碼令牌: {reset_token} !!!")
-        return False
+            if quit and connection.smtp.is_connected:
+                await connection.smtp.quit()
+            else:
+                connection.smtp.close()
+        except Exception:
+            connection.smtp.close()
+
+    async def send(self, message: MIMEMultipart):
+        """
+        使用池中的連接發送郵件
+
+        重複使用的連接發送失敗時（例如伺服器已關閉連接），改用新連接重試一次
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_size)
 
-async def send_password_reset_email_fallback(email: str, reset_token: str, language: str = "zh-TW"):
-    """備用重設密碼郵件發送方法"""
-    
-    # 多語言郵件內容
-    email_templates = {
-        "zh-TW": {
-            "subject": "eSignedOnline 密碼重設",
-            "body": f"""
-            <html>
-            <body>
-                <h2>密碼重設請求</h2>
-                <p>您收到此郵件是因為有人請求重設您的 eSignedOnline 帳號密碼。</p>
-                <p>請使用以下重設碼重設您的密碼：</p>
-                <h3 style="color: #1976d2;">{reset_token}</h3>
-                <p>此重設碼將在1小時後過期。</p>
-                <p>如果您沒有請求重設密碼，請忽略此郵件。</p>
-                <br>
-                <p>eSignedOnline 團隊</p>
-            </body>
-            </html>
-            """
-        },
-        "en": {
-            "subject": "eSignedOnline Password Reset",
-            "body": f"""
-            <html>
-            <body>
-                <h2>Password Reset Request</h2>
-                <p>You received this email because someone requested a password reset for your eSignedOnline account.</p>
-                <p>Please use the following reset code to reset your password:</p>
-                <h3 style="color: #1976d2;">{reset_token}</h3>
-                <p>This reset code will expire in 1 hour.</p>
-                <p>If you didn't request a password reset, please ignore this email.</p>
-                <br>
-                <p>eSignedOnline Team</p>
-            </body>
-            </html>
-            """
-        },
-        "vi": {
-            "subject": "Đặt lại mật khẩu eSignedOnline",
-            "body": f"""
-            <html>
-            <body>
-                <h2>Yêu cầu đặt lại mật khẩu</h2>
-                <p>Bạn nhận được email này vì có người đã yêu cầu đặt lại mật khẩu cho tài khoản eSignedOnline của bạn.</p>
-                <p>Vui lòng sử dụng mã đặt lại sau để đặt lại mật khẩu:</p>
-                <h3 style="color: #1976d2;">{reset_token}</h3>
-                <p>Mã đặt lại này sẽ hết hạn sau 1 giờ.</p>
-                <p>Nếu bạn không yêu cầu đặt lại mật khẩu, vui lòng bỏ qua email này.</p>
-                <br>
-                <p>Đội ngũ eSignedOnline</p>
-            </body>
-            </html>
-            """
+        async with self._semaphore:
+            for attempt in range(2):
+                connection = await self._acquire()
+                reused = connection.messages_sent > 0
+                try:
+                    await connection.smtp.send_message(message)
+                except (aiosmtplib.SMTPServerDisconnected, ConnectionError) as e:
+                    await self._discard(connection)
+                    if reused and attempt == 0:
+                        logger.info(f"SMTP 連接 ({self.name}) 已中斷，重新連接: {e}")
+                        continue
+                    self.failures += 1
+                    raise
+                except Exception:
+                    await self._discard(connection)
+                    self.failures += 1
+                    raise
+                self._release(connection)
+                return
+
+    async def close(self):
+        while self._idle:
+            await self._discard(self._idle.pop(), quit=True)
+        if self._closing:
+            await asyncio.gather(*self._closing, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "idle": len(self._idle),
+            "connects": self.connects,
+            "reused": self.reused,
+            "failures": self.failures
         }
-    }
-    
-    template = email_templates.get(language, email_templates["zh-TW"])
-    
+
+# 依序嘗試的 SMTP 連接方式：設定的 STARTTLS 端口、SSL 端口 465、不加密的端口 587
+smtp_pools: List[SMTPConnectionPool] = [
+    SMTPConnectionPool("starttls", settings.smtp_host, settings.smtp_port, start_tls=True),
+    SMTPConnectionPool("ssl", settings.smtp_host, 465, use_tls=True, validate_certs=False),
+    SMTPConnectionPool("plain", settings.smtp_host, 587),
+]
+
+async def close_smtp_pools():
+    for pool in smtp_pools:
+        await pool.close()
+
+async def send_email(email: str, subject: str, html_body: str, text_body: Optional[str] = None) -> bool:
+    """
+    發送郵件（純文字及 HTML 兩種格式），依序嘗試各個 SMTP 連接方式
+
+    Returns:
+        bool: 是否發送成功
+    """
     message = MIMEMultipart("alternative")
     message["From"] = settings.smtp_username
     message["To"] = email
-    message["Subject"] = template["subject"]
-    
-    html_part = MIMEText(template["body"], "html")
-    message.attach(html_part)
-    
-    try:
-        # 方法1: 嘗試使用 SSL 端口 (465)
-        logger.info(f"備用方法1: 嘗試使用 SSL 端口 465 發送重設密碼郵件")
-        
-        smtp = aiosmtplib.SMTP(
-            hostname=settings.smtp_host,
-            port=465,
-            use_tls=True,
-            validate_certs=False
-        )
-        
-        await smtp.connect()
-        await smtp.login(settings.smtp_username, settings.smtp_password)
-        await smtp.send_message(message)
-        await smtp.quit()
-        
-        logger.info(f"備用方法1成功：重設密碼郵件已發送到 {email}")
-        return True
-        
-    except Exception as ssl_error:
-        logger.warning(f"備用方法1 (SSL) 重設密碼郵件失敗: {ssl_error}")
-        
+    message["Subject"] = subject
+    if text_body:
+        message.attach(MIMEText(text_body, "plain", "utf-8"))
+    message.attach(MIMEText(html_body, "html", "utf-8"))
+
+    for pool in smtp_pools:
         try:
-            logger.info(f"備用方法2: 嘗試 TLS 端口 587 發送重設密碼郵件")
-            
-            smtp = aiosmtplib.SMTP(
-                hostname=settings.smtp_host,
-                port=587,
-                use_tls=False
-            )
-            
-            await smtp.connect()
-            await smtp.login(settings.smtp_username, settings.smtp_password)
-            await smtp.send_message(message)
-            await smtp.quit()
-            
-            logger.info(f"備用方法2成功：重設密碼郵件已發送到 {email}")
+            await pool.send(message)
+            logger.info(f"郵件已發送到 {email} ({pool.name})")
             return True
-            
-        except Exception as tls_error:
-            logger.error(f"所有重設密碼郵件發送方法都失敗: {tls_error}")
-            logger.error(f"!!! 重要：用戶 {email} 的重設密碼令牌: {reset_token} !!!")
-            print(f"!!! 重要：用戶 {email} 的重設密碼令牌: {reset_token} !!!")
-            
-            return False
+        except Exception as e:
+            logger.warning(f"SMTP 發送失敗 ({pool.name} {pool.hostname}:{pool.port}): {e}")
+
+    logger.error(f"所有 SMTP 連接方式都失敗，無法發送郵件到 {email}")
+    return False
+
+async def send_templated_email(email: str, kind: str, language: Optional[str] = None, **context) -> bool:
+    """
+    以模板產生郵件內容並發送
+
+    Args:
+        email: 收件人
+        kind: 郵件類型（app/templates/email 下的目錄名稱）
+        language: 語言代碼，預設為系統預設語言
+        context: 模板變數
+    """
+    rendered = render_email(kind, language or settings.default_language, **context)
+    return await send_email(email, rendered.subject, rendered.html, rendered.text)
+
+async def send_activation_email(email: str, activation_code: str, language: str = "zh-TW"):
+    """發送啟用郵件"""
+    logger.info(f"準備發送啟用郵件到: {email}")
+    return await send_templated_email(email, "activation", language, activation_code=activation_code)
+
+async def send_password_reset_email(email: str, reset_token: str, language: str = "zh-TW"):
+    """發送重設密碼郵件"""
+    logger.info(f"準備發送重設密碼郵件到: {email}")
+    return await send_templated_email(email, "password_reset", language, reset_token=reset_token)
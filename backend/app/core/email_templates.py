@@ -0,0 +1,64 @@
+import os
+from typing import NamedTuple
+from jinja2 import Environment, FileSystemLoader, TemplateNotFound, select_autoescape
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates", "email")
+
+class RenderedEmail(NamedTuple):
+    subject: str
+    text: str
+    html: str
+
+# 模板目錄結構：<郵件類型>/<語言>.txt（含 subject 區塊）及 <郵件類型>/<語言>.html
+# 模板編譯後快取在 Environment 中，不會重新檢查檔案是否變更
+environment = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=select_autoescape(["html"]),
+    trim_blocks=True,
+    lstrip_blocks=True,
+    auto_reload=False,
+    cache_size=-1
+)
+
+def load_email_templates() -> int:
+    """在啟動時預先編譯所有郵件模板，回傳模板數量"""
+    names = environment.list_templates(extensions=["txt", "html"])
+    for name in names:
+        environment.get_template(name)
+    logger.info(f"已載入 {len(names)} 個郵件模板")
+    return len(names)
+
+def has_email_template(kind: str) -> bool:
+    return os.path.isfile(os.path.join(TEMPLATE_DIR, kind, f"{settings.default_language}.txt"))
+
+def _get_templates(kind: str, language: str):
+    try:
+        return (
+            environment.get_template(f"{kind}/{language}.txt"),
+            environment.get_template(f"{kind}/{language}.html")
+        )
+    except TemplateNotFound:
+        if language == settings.default_language:
+            raise
+        return _get_templates(kind, settings.default_language)
+
+def render_email(kind: str, language: str, **context) -> RenderedEmail:
+    """
+    產生指定類型及語言的郵件內容（沒有該語言的模板時使用預設語言）
+
+    Args:
+        kind: 郵件類型，即模板目錄名稱，例如 "activation"
+        language: 語言代碼
+        context: 模板變數
+    """
+    text_template, html_template = _get_templates(kind, language or settings.default_language)
+    subject = "".join(text_template.blocks["subject"](text_template.new_context(context))).strip()
+    return RenderedEmail(
+        subject=subject,
+        text=text_template.render(context).strip() + "\n",
+        html=html_template.render(context)
+    )
@@ -0,0 +1,136 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
+from fastapi import Request
+from starlette.datastructures import FormData
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 只記錄文字類型的請求體；multipart 上傳及二進位內容可能很大且對除錯沒有幫助
+LOGGABLE_CONTENT_TYPES = ("application/json", "application/x-www-form-urlencoded", "text/")
+
+class ErrorLogSampler:
+    """
+    相同錯誤的記錄頻率限制
+
+    每個錯誤鍵在時間窗口內只記錄前幾次，其餘只計數，下一次記錄時附上略過的次數；
+    超過鍵數上限時淘汰最久未出現的鍵，錯誤量再大也只佔用固定的記憶體及日誌量
+    """
+
+    def __init__(self, window_seconds: float, max_per_window: int, max_keys: int):
+        self.window_seconds = window_seconds
+        self.max_per_window = max_per_window
+        self.max_keys = max_keys
+        self.suppressed_total = 0
+        # 鍵 -> (窗口開始時間, 窗口內次數, 略過次數)
+        self._entries: "OrderedDict[Any, Tuple[float, int, int]]" = OrderedDict()
+
+    def sample(self, key) -> Tuple[bool, int]:
+        """
+        Returns:
+            tuple: (是否記錄, 先前略過的次數)
+        """
+        now = time.monotonic()
+        window_start, count, suppressed = self._entries.get(key, (now, 0, 0))
+        if now - window_start >= self.window_seconds:
+            window_start, count = now, 0
+
+        count += 1
+        should_log = count <= self.max_per_window
+        if should_log:
+            reported, suppressed = suppressed, 0
+        else:
+            reported = 0
+            suppressed += 1
+            self.suppressed_total += 1
+
+        self._entries[key] = (window_start, count, suppressed)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+
+        return should_log, reported
+
+validation_log_sampler = ErrorLogSampler(
+    window_seconds=settings.validation_log_window_seconds,
+    max_per_window=settings.validation_log_max_per_window,
+    max_keys=settings.validation_log_max_keys
+)
+
+def sanitize_errors(errors: List[dict]) -> List[dict]:
+    """
+    移除驗證錯誤中的輸入值，ctx 轉為字串
+
+    input 可能是整個請求體（回應及日誌都不應重複輸出），
+    ctx 可能包含無法序列化為 JSON 的例外物件
+    """
+    sanitized = []
+    for error in errors:
+        item = {"type": error.get("type"), "loc": list(error.get("loc", ())), "msg": error.get("msg")}
+        if error.get("ctx"):
+            item["ctx"] = {key: str(value) for key, value in error["ctx"].items()}
+        sanitized.append(item)
+    return sanitized
+
+def _body_preview(request: Request, body: Any) -> Optional[str]:
+    """請求體前綴（使用已解析的請求體，不重新讀取）"""
+    if body is None or settings.validation_log_body_max_bytes <= 0:
+        return None
+
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if not content_type.startswith(LOGGABLE_CONTENT_TYPES):
+        return f"<{content_type or 'unknown'} 略過>"
+
+    if isinstance(body, FormData):
+        body = {key: value for key, value in body.multi_items() if isinstance(value, str)}
+
+    limit = settings.validation_log_body_max_bytes
+    if isinstance(body, bytes):
+        text = body[:limit].decode("utf-8", errors="replace")
+    elif isinstance(body, str):
+        text = body[:limit]
+    else:
+        text = json.dumps(body, ensure_ascii=False, default=str)[:limit]
+
+    declared = request.headers.get("content-length")
+    if len(text) >= limit or (declared and declared.isdigit() and int(declared) > limit):
+        text += "…(已截斷)"
+    return text
+
+def log_validation_error(request: Request, errors: List[dict], body: Any = None, kind: str = "request"):
+    """
+    記錄驗證錯誤（結構化 JSON，相同錯誤依時間窗口取樣）
+
+    Args:
+        request: 請求
+        errors: 已清理的錯誤（sanitize_errors）
+        body: 已解析的請求體（RequestValidationError.body）
+        kind: "request" 或 "model"
+    """
+    route = request.scope.get("route")
+    path = route.path if route is not None else request.url.path
+    key = (kind, request.method, path, tuple((e["type"], tuple(e["loc"])) for e in errors))
+
+    should_log, suppressed = validation_log_sampler.sample(key)
+    if not should_log:
+        return
+
+    record = {
+        "event": "validation_error",
+        "kind": kind,
+        "method": request.method,
+        "path": path,
+        "client": request.client.host if request.client else None,
+        "errors": errors[:settings.validation_log_max_errors],
+        "error_count": len(errors)
+    }
+    if kind == "request":
+        record["body"] = _body_preview(request, body)
+    if suppressed:
+        record["suppressed"] = suppressed
+
+    summary = "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['type']}" for e in record["errors"])
+    logger.warning("驗證錯誤 %s %s: %s", request.method, path, summary, extra={"fields": record})
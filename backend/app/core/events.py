@@ -0,0 +1,162 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+from app.core.config import settings
+from app.core.change_streams import ChangeStreamWatcher
+from app.core.security import can_list_document, can_view_document
+from app.database import get_database
+from app.models.document import DOCUMENT_LIST_PROJECTION
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 刪除通知只需保留到各 worker 的 change stream 讀取為止
+DELETION_RETENTION = timedelta(hours=1)
+
+def _serialize_document(document: dict) -> dict:
+    """將文件轉換為與文件列表相同的格式"""
+    return {
+        "id": str(document["_id"]),
+        "filename": document["filename"],
+        "original_filename": document["original_filename"],
+        "file_path": document["file_path"],
+        "file_size": document["file_size"],
+        "status": document["status"],
+        "uploaded_by": document["uploaded_by"],
+        "signed_by": document.get("signed_by"),
+        "signed_filename": document.get("signed_filename"),
+        "signers": [
+            {key: signer.get(key) for key in ("username", "field", "status", "signed_at")}
+            for signer in document["signers"]
+        ] if document.get("signers") else None,
+        "next_signer": document.get("next_signer"),
+        "created_at": document["created_at"],
+        "updated_at": document["updated_at"]
+    }
+
+def format_sse(event: str, data: dict) -> str:
+    """格式化 Server-Sent Events 訊息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+class DocumentSubscription:
+    """單一 SSE 連線的訂閱"""
+
+    def __init__(self, user: dict, queue_size: int):
+        self.user = user
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    def put(self, event: str, data: dict):
+        try:
+            self.queue.put_nowait((event, data))
+        except asyncio.QueueFull:
+            # 用戶端處理太慢：清空佇列並要求重新載入完整列表
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(("resync", {}))
+
+async def record_document_deletion(document: dict):
+    """
+    記錄文件刪除通知（刪除文件後呼叫）
+
+    change stream 的刪除事件只有文件 ID，通知保留判斷權限所需的欄位，
+    讓各 worker 只對原本列表中有此文件的用戶推送 deleted；記錄失敗不影響請求本身
+    """
+    try:
+        db = await get_database()
+        now = datetime.utcnow()
+        await db.document_deletions.insert_one({
+            "document_id": str(document["_id"]),
+            "status": document.get("status"),
+            "signed_by": document.get("signed_by"),
+            "next_signer": document.get("next_signer"),
+            "signers": [{"username": signer["username"]} for signer in document.get("signers") or []],
+            "created_at": now,
+            "expires_at": now + DELETION_RETENTION
+        })
+    except Exception as e:
+        logger.error(f"記錄文件刪除通知失敗: {e}")
+
+class DocumentDeletionWatcher(ChangeStreamWatcher):
+    """監看刪除通知，交由 DocumentEventBroker 依權限分送"""
+
+    def __init__(self, broker: "DocumentEventBroker"):
+        super().__init__("document_deletions", pipeline=[{"$match": {"operationType": "insert"}}])
+        self.broker = broker
+
+    def _dispatch(self, change: dict):
+        notice = change.get("fullDocument")
+        if notice is not None:
+            self.broker.dispatch_deletion(notice)
+
+class DocumentEventBroker(ChangeStreamWatcher):
+    """
+    文件變更事件分送器
+
+    每個 worker 只開啟一個 documents collection 的 change stream，
+    再依各訂閱者的權限逐筆過濾後分送；訂閱時不載入用戶的文件列表
+    """
+
+    def __init__(self):
+        # 完整文件只保留列表欄位，不從 MongoDB 傳回擷取文字、搜尋索引等大型欄位
+        super().__init__("documents", full_document="updateLookup", pipeline=[{"$project": {
+            "operationType": 1,
+            "documentKey": 1,
+            "fullDocument._id": 1,
+            **{f"fullDocument.{field}": 1 for field in DOCUMENT_LIST_PROJECTION}
+        }}])
+        self.subscriptions = set()
+        self.deletions = DocumentDeletionWatcher(self)
+
+    def start(self):
+        super().start()
+        self.deletions.start()
+
+    async def stop(self):
+        await self.deletions.stop()
+        await super().stop()
+
+    def subscribe(self, user: dict) -> DocumentSubscription:
+        subscription = DocumentSubscription(user, settings.document_events_queue_size)
+        self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: DocumentSubscription):
+        self.subscriptions.discard(subscription)
+
+    def _dispatch(self, change: dict):
+        operation = change.get("operationType")
+        document_id = str(change.get("documentKey", {}).get("_id", ""))
+
+        if operation == "delete":
+            # 刪除事件沒有文件內容，一般用戶由刪除通知（dispatch_deletion）判斷權限；
+            # 管理員可看到全部文件，也包含不經由 API 刪除的文件
+            for subscription in list(self.subscriptions):
+                if subscription.user.get("role") == "admin":
+                    subscription.put("deleted", {"id": document_id})
+            return
+
+        if operation not in ("insert", "update", "replace"):
+            return
+
+        document = change.get("fullDocument")
+        if document is None:
+            # 文件在查詢完整內容前已被刪除
+            return
+
+        data = _serialize_document(document)
+        event = "created" if operation == "insert" else "updated"
+        for subscription in list(self.subscriptions):
+            # 與 /available、/signed 列表相同的條件，多人簽署文件只推送給目前輪到的簽署者
+            if can_list_document(subscription.user, document):
+                subscription.put(event, data)
+            elif can_view_document(subscription.user, document):
+                # 用戶仍可查看但不再出現在其列表（例如輪到下一位簽署者），從其列表移除
+                subscription.put("deleted", {"id": document_id})
+
+    def dispatch_deletion(self, notice: dict):
+        """分送刪除通知給刪除前列表中有此文件的一般用戶（管理員已由刪除事件通知）"""
+        for subscription in list(self.subscriptions):
+            if subscription.user.get("role") != "admin" and can_list_document(subscription.user, notice):
+                subscription.put("deleted", {"id": notice["document_id"]})
+
+document_events = DocumentEventBroker()
@@ -0,0 +1,124 @@
+import asyncio
+import shutil
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+from app.core.config import settings
+from app.core.signing import signing_executor
+from app.core.warmup import warmup_state
+from app.database import get_database
+import logging
+
+logger = logging.getLogger(__name__)
+
+class CachedCheck:
+    """
+    快取檢查結果
+
+    負載平衡器及容器平台頻繁呼叫就緒檢查，結果在短時間內重用，
+    同時間的多個請求只執行一次檢查
+    """
+
+    def __init__(self, name: str, check):
+        self.name = name
+        self._check = check
+        self._result: Optional[dict] = None
+        self._checked_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def get(self) -> dict:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            if self._result is None or time.monotonic() - self._checked_at >= settings.health_check_cache_seconds:
+                self._result = await self._check()
+                self._checked_at = time.monotonic()
+            return self._result
+
+async def _check_database() -> dict:
+    start = time.perf_counter()
+    try:
+        db = await get_database()
+        await asyncio.wait_for(db.command("ping"), timeout=settings.health_db_timeout_seconds)
+    except Exception as e:
+        logger.warning(f"健康檢查 MongoDB ping 失敗: {e}")
+        return {"status": "fail", "error": str(e) or type(e).__name__}
+
+    latency_ms = round((time.perf_counter() - start) * 1000, 1)
+    return {
+        "status": "ok" if latency_ms <= settings.health_max_db_latency_ms else "fail",
+        "latency_ms": latency_ms,
+        "threshold_ms": settings.health_max_db_latency_ms
+    }
+
+async def _check_outbox() -> dict:
+    try:
+        db = await get_database()
+        backlog = await db.email_outbox.count_documents({
+            "status": "pending",
+            "next_attempt_at": {"$lte": datetime.utcnow()}
+        })
+        dead = await db.email_outbox.count_documents({"status": "dead"})
+    except Exception as e:
+        return {"status": "fail", "error": str(e) or type(e).__name__}
+
+    # 郵件佇列由所有 worker 共用，預設只回報不影響就緒狀態，避免所有 worker 同時退出服務
+    threshold = settings.health_max_outbox_backlog
+    return {
+        "status": "fail" if threshold and backlog > threshold else "ok",
+        "backlog": backlog,
+        "dead": dead,
+        "threshold": threshold or None
+    }
+
+database_check = CachedCheck("database", _check_database)
+outbox_check = CachedCheck("email_outbox", _check_outbox)
+
+def check_disk() -> dict:
+    try:
+        usage = shutil.disk_usage(settings.upload_path)
+    except OSError as e:
+        return {"status": "fail", "error": str(e)}
+
+    free_mb = usage.free // (1024 * 1024)
+    return {
+        "status": "ok" if free_mb >= settings.health_min_free_disk_mb else "fail",
+        "free_mb": free_mb,
+        "total_mb": usage.total // (1024 * 1024),
+        "threshold_mb": settings.health_min_free_disk_mb
+    }
+
+def check_signing() -> dict:
+    stats = signing_executor.stats()
+    capacity = stats["max_concurrency"] + stats["max_queue"]
+    saturation = round((stats["in_flight"] + stats["queued"]) / capacity, 3) if capacity else 1.0
+    return {
+        "status": "ok" if saturation <= settings.health_max_signing_saturation else "fail",
+        "saturation": saturation,
+        "threshold": settings.health_max_signing_saturation,
+        **stats
+    }
+
+async def database_status() -> dict:
+    return await database_check.get()
+
+async def readiness() -> Tuple[bool, dict]:
+    """
+    就緒檢查
+
+    Returns:
+        (是否就緒, 各項檢查結果)
+    """
+    checks = {
+        "database": await database_check.get(),
+        "disk": check_disk(),
+        "signing": check_signing(),
+        "email_outbox": await outbox_check.get()
+    }
+    ready = all(check["status"] == "ok" for check in checks.values())
+    return ready, {
+        "status": "ready" if ready else "not_ready",
+        "warmup": warmup_state.stats(),
+        "checks": checks
+    }
@@ -0,0 +1,155 @@
+import os
+import time
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from pymongo import monitoring
+
+# 多 worker 部署時由 start_server.py 設定 PROMETHEUS_MULTIPROC_DIR，
+# 各 worker 將指標寫入該目錄，/metrics 匯總所有 worker 的數值
+
+HTTP_REQUESTS = Counter(
+    "esigned_http_requests_total",
+    "HTTP 請求數",
+    ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "esigned_http_request_duration_seconds",
+    "HTTP 請求處理時間",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "esigned_http_requests_in_flight",
+    "處理中的 HTTP 請求數",
+    ["method"],
+    multiprocess_mode="livesum"
+)
+
+MONGO_COMMAND_DURATION = Histogram(
+    "esigned_mongo_command_duration_seconds",
+    "MongoDB 指令執行時間",
+    ["command", "outcome"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+
+PDF_SIGN_STAGE_DURATION = Histogram(
+    "esigned_pdf_sign_stage_duration_seconds",
+    "PDF 簽署各階段處理時間",
+    ["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+CACHE_REQUESTS = Counter(
+    "esigned_cache_requests_total",
+    "程序內快取查詢數（命中率 = hit / 全部）",
+    ["cache", "result"]
+)
+
+EXECUTOR_IN_FLIGHT = Gauge(
+    "esigned_executor_in_flight",
+    "執行中的工作數",
+    ["executor"],
+    multiprocess_mode="livesum"
+)
+EXECUTOR_QUEUED = Gauge(
+    "esigned_executor_queued",
+    "等待中的工作數",
+    ["executor"],
+    multiprocess_mode="livesum"
+)
+EXECUTOR_REJECTED = Counter(
+    "esigned_executor_rejected_total",
+    "因佇列已滿或等待逾時而拒絕的工作數",
+    ["executor", "reason"]
+)
+
+RESPONSE_SERIALIZATION_DURATION = Histogram(
+    "esigned_response_serialization_duration_seconds",
+    "JSON 回應序列化時間",
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+)
+
+RATE_LIMIT_REQUESTS = Counter(
+    "esigned_rate_limit_requests_total",
+    "頻率限制檢查次數",
+    ["scope", "result"]
+)
+
+SIGN_JOBS = Counter(
+    "esigned_sign_jobs_total",
+    "非同步簽署工作數（依結果）",
+    ["outcome"]
+)
+
+def observe_pdf_stage(stage: str, start: float) -> float:
+    """記錄 PDF 簽署階段耗時，回傳目前時間作為下一階段的起點"""
+    now = time.perf_counter()
+    PDF_SIGN_STAGE_DURATION.labels(stage).observe(now - start)
+    return now
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """記錄每個 MongoDB 指令的執行時間"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_DURATION.labels(event.command_name, "success").observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        MONGO_COMMAND_DURATION.labels(event.command_name, "failure").observe(event.duration_micros / 1e6)
+
+class MetricsMiddleware:
+    """記錄 HTTP 請求數、處理時間及處理中的請求數（以路由樣板分類，例如 /api/documents/{document_id}）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_flight = HTTP_REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            route = scope.get("route")
+            route_path = route.path if route is not None else "unmatched"
+            labels = (method, route_path, str(status_code))
+            HTTP_REQUESTS.labels(*labels).inc()
+            HTTP_REQUEST_DURATION.labels(*labels).observe(time.perf_counter() - start)
+
+def generate_metrics() -> bytes:
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+def mark_worker_dead(pid: int):
+    """worker 結束時清除其即時指標（gunicorn child_exit）"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
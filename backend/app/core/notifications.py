@@ -0,0 +1,207 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+from pymongo.errors import DuplicateKeyError
+from app.core.config import settings
+from app.core.outbox import enqueue_email
+from app.database import get_database
+from bson import ObjectId
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 收件人範圍：所有啟用中的一般用戶（可簽署文件的用戶）
+AUDIENCE_USERS = "users"
+
+# 摘要中列為「待簽署」的事件：新上傳的文件，及多人簽署時輪到下一位簽署者
+AWAITING_EVENTS = ("uploaded", "awaiting_signature")
+
+async def record_document_event(
+    event: str,
+    document: dict,
+    actor: str,
+    recipients: Optional[List[str]] = None,
+    audience: Optional[str] = None
+):
+    """
+    記錄文件事件，由 NotificationCoalescer 定期彙整為摘要郵件
+
+    記錄失敗不影響請求本身
+
+    Args:
+        event: "uploaded"、"awaiting_signature" 或 "signed"
+        document: 文件資料
+        actor: 觸發事件的用戶名（不會通知自己）
+        recipients: 收件人用戶名
+        audience: 收件人範圍，例如 AUDIENCE_USERS
+    """
+    if not settings.notifications_enabled:
+        return
+
+    try:
+        db = await get_database()
+        await db.notification_events.insert_one({
+            "event": event,
+            "document_id": str(document["_id"]),
+            "filename": document["original_filename"],
+            "uploaded_by": document.get("uploaded_by"),
+            "signed_by": document.get("signed_by"),
+            "actor": actor,
+            "recipients": recipients or [],
+            "audience": audience,
+            "batch_id": None,
+            "processed_at": None,
+            "created_at": datetime.utcnow()
+        })
+    except Exception as e:
+        logger.error(f"記錄文件通知事件失敗: {e}")
+
+def _format_time(value: Optional[datetime]) -> str:
+    return value.strftime("%Y-%m-%d %H:%M UTC") if value else ""
+
+class NotificationCoalescer:
+    """
+    通知摘要彙整
+
+    每個時間窗口取出累積的文件事件，依收件人分組後每人只寄出一封摘要郵件，
+    郵件數量與收件人數成正比，而不是與事件數成正比。
+    多個 worker 以 MongoDB 租約確保每個窗口只有一個 worker 執行彙整
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if settings.notifications_enabled:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.notification_digest_window_seconds)
+            try:
+                if await self._acquire_lease():
+                    await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"彙整通知摘要失敗: {e}")
+
+    async def _acquire_lease(self) -> bool:
+        """取得本窗口的彙整租約（其他 worker 已取得時回傳 False）"""
+        now = datetime.utcnow()
+        db = await get_database()
+        try:
+            await db.locks.find_one_and_update(
+                {"_id": "notification_digest", "locked_until": {"$lte": now}},
+                {"$set": {
+                    "locked_until": now + timedelta(seconds=settings.notification_digest_window_seconds * 0.9)
+                }},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    async def _claim_events(self) -> List[dict]:
+        now = datetime.utcnow()
+        batch_id = uuid.uuid4().hex
+        db = await get_database()
+        # 先前彙整中斷而未完成的事件也一併重新處理
+        await db.notification_events.update_many(
+            {
+                "processed_at": None,
+                "$or": [
+                    {"batch_id": None},
+                    {"claimed_at": {"$lt": now - timedelta(seconds=settings.notification_digest_window_seconds * 2)}}
+                ]
+            },
+            {"$set": {"batch_id": batch_id, "claimed_at": now}}
+        )
+        return await db.notification_events.find({"batch_id": batch_id}).sort("created_at", 1).to_list(None)
+
+    async def _load_recipients(self, events: List[dict]) -> List[dict]:
+        usernames = {username for event in events for username in event["recipients"]}
+        conditions = [{"username": {"$in": list(usernames)}}]
+        if any(event["audience"] == AUDIENCE_USERS for event in events):
+            conditions.append({"role": "user"})
+
+        db = await get_database()
+        return await db.users.find(
+            {"is_active": True, "$or": conditions},
+            {"username": 1, "email": 1, "full_name": 1, "role": 1}
+        ).to_list(None)
+
+    async def _existing_document_ids(self, events: List[dict]) -> set:
+        """待簽署的文件在彙整前可能已被刪除"""
+        ids = [ObjectId(event["document_id"]) for event in events if event["event"] in AWAITING_EVENTS]
+        if not ids:
+            return set()
+        db = await get_database()
+        return {str(doc["_id"]) async for doc in db.documents.find({"_id": {"$in": ids}}, {"_id": 1})}
+
+    async def flush(self) -> int:
+        """彙整累積的事件並加入摘要郵件，回傳寄出的摘要數量"""
+        events = await self._claim_events()
+        if not events:
+            return 0
+
+        users = await self._load_recipients(events)
+        existing_ids = await self._existing_document_ids(events)
+        digests = {}
+
+        for event in events:
+            if event["event"] in AWAITING_EVENTS and event["document_id"] not in existing_ids:
+                continue
+
+            for user in users:
+                if user["username"] == event["actor"]:
+                    continue
+                if user["username"] not in event["recipients"] and not (
+                    event["audience"] == AUDIENCE_USERS and user["role"] == "user"
+                ):
+                    continue
+
+                digest = digests.setdefault(user["username"], {"user": user, "awaiting": [], "signed": []})
+                if event["event"] in AWAITING_EVENTS:
+                    digest["awaiting"].append({
+                        "filename": event["filename"],
+                        "uploaded_by": event["uploaded_by"],
+                        "document_url": f"{settings.frontend_url}/sign/{event['document_id']}"
+                    })
+                else:
+                    digest["signed"].append({
+                        "filename": event["filename"],
+                        "signer": event["signed_by"],
+                        "signed_at": _format_time(event["created_at"])
+                    })
+
+        for digest in digests.values():
+            user = digest["user"]
+            await enqueue_email("digest", user["email"], {
+                "name": user.get("full_name") or user["username"],
+                "awaiting": digest["awaiting"],
+                "signed": digest["signed"],
+                "documents_url": f"{settings.frontend_url}/documents"
+            })
+
+        now = datetime.utcnow()
+        db = await get_database()
+        await db.notification_events.update_many(
+            {"batch_id": events[0]["batch_id"]},
+            {"$set": {
+                "processed_at": now,
+                "expires_at": now + timedelta(days=settings.notification_retention_days)
+            }}
+        )
+
+        logger.info(f"已彙整 {len(events)} 個文件事件為 {len(digests)} 封摘要郵件")
+        return len(digests)
+
+notification_coalescer = NotificationCoalescer()
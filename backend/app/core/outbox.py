@@ -0,0 +1,186 @@
+import asyncio
+import random
+from datetime import datetime, timedelta
+from typing import List, Optional
+from pymongo import ReturnDocument
+from app.core.config import settings
+from app.core.email import send_templated_email
+from app.core.email_templates import has_email_template
+from app.database import get_database
+import logging
+
+logger = logging.getLogger(__name__)
+
+class EmailOutbox:
+    """
+    郵件發送佇列
+
+    郵件先寫入 MongoDB 的 email_outbox collection，由背景工作者發送；
+    失敗時以指數退避重試，超過次數後標記為 dead 供管理員檢視及重送
+    """
+
+    def __init__(self):
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def enqueue(self, kind: str, to: str, payload: dict, language: Optional[str] = None):
+        """
+        加入待發送郵件，回傳郵件 ID
+
+        Args:
+            kind: 郵件類型（郵件模板名稱）
+            to: 收件人
+            payload: 模板變數
+            language: 語言代碼
+        """
+        if not has_email_template(kind):
+            raise ValueError(f"未知的郵件類型: {kind}")
+
+        now = datetime.utcnow()
+        db = await get_database()
+        result = await db.email_outbox.insert_one({
+            "kind": kind,
+            "to": to,
+            "language": language or settings.default_language,
+            "payload": payload,
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "last_error": None,
+            "created_at": now,
+            "updated_at": now
+        })
+
+        self.notify()
+        return result.inserted_id
+
+    def notify(self):
+        """喚醒等待中的工作者"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        for index in range(settings.email_outbox_workers):
+            self._tasks.append(asyncio.create_task(self._worker(index)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self, index: int):
+        logger.info(f"郵件發送工作者 {index} 已啟動")
+        while True:
+            try:
+                message = await self._claim()
+                if message is not None:
+                    await self._deliver(message)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"郵件發送工作者 {index} 錯誤: {e}")
+
+            # 沒有待發送郵件時等待新郵件或定期輪詢
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.email_outbox_poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim(self):
+        """取得一封待發送的郵件（逾時未完成的郵件可由其他工作者重新取得）"""
+        now = datetime.utcnow()
+        db = await get_database()
+        return await db.email_outbox.find_one_and_update(
+            {
+                "$or": [
+                    {"status": "pending", "next_attempt_at": {"$lte": now}},
+                    {"status": "sending", "locked_until": {"$lt": now}}
+                ]
+            },
+            {
+                "$set": {
+                    "status": "sending",
+                    "locked_until": now + timedelta(seconds=settings.email_outbox_lease_seconds),
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _deliver(self, message: dict):
+        db = await get_database()
+        error = None
+        try:
+            if not await send_templated_email(message["to"], message["kind"], message["language"], **message["payload"]):
+                error = "SMTP 發送失敗"
+        except Exception as e:
+            error = str(e)
+
+        now = datetime.utcnow()
+        if error is None:
+            await db.email_outbox.update_one(
+                {"_id": message["_id"]},
+                {
+                    "$set": {
+                        "status": "sent",
+                        "sent_at": now,
+                        "updated_at": now,
+                        # 已發送的郵件保留一段時間後由 TTL 索引刪除
+                        "purge_at": now + timedelta(days=settings.email_outbox_retention_days)
+                    },
+                    "$unset": {"locked_until": "", "payload": ""}
+                }
+            )
+            logger.info(f"郵件 {message['_id']} ({message['kind']}) 已發送")
+            return
+
+        if message["attempts"] >= settings.email_outbox_max_attempts:
+            await db.email_outbox.update_one(
+                {"_id": message["_id"]},
+                {
+                    "$set": {"status": "dead", "last_error": error, "updated_at": now},
+                    "$unset": {"locked_until": ""}
+                }
+            )
+            logger.error(f"郵件 {message['_id']} ({message['kind']}) 發送 {message['attempts']} 次失敗，已停止重試: {error}")
+            return
+
+        # 指數退避並加入隨機延遲，避免大量郵件同時重試
+        delay = min(
+            settings.email_outbox_backoff_base_seconds * 2 ** (message["attempts"] - 1),
+            settings.email_outbox_backoff_max_seconds
+        )
+        delay *= random.uniform(0.8, 1.2)
+        await db.email_outbox.update_one(
+            {"_id": message["_id"]},
+            {
+                "$set": {
+                    "status": "pending",
+                    "last_error": error,
+                    "next_attempt_at": now + timedelta(seconds=delay),
+                    "updated_at": now
+                },
+                "$unset": {"locked_until": ""}
+            }
+        )
+        logger.warning(f"郵件 {message['_id']} ({message['kind']}) 第 {message['attempts']} 次發送失敗，{delay:.0f} 秒後重試: {error}")
+
+    async def stats(self) -> dict:
+        """各狀態的郵件數量"""
+        db = await get_database()
+        counts = {"pending": 0, "sending": 0, "sent": 0, "dead": 0}
+        async for row in db.email_outbox.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            counts[row["_id"]] = row["count"]
+        return counts
+
+email_outbox = EmailOutbox()
+
+async def enqueue_email(kind: str, to: str, payload: dict, language: Optional[str] = None):
+    """加入待發送郵件"""
+    return await email_outbox.enqueue(kind, to, payload, language)
@@ -0,0 +1,187 @@
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from fastapi import HTTPException, Request, status
+from pymongo import ReturnDocument
+from app.core.config import settings
+from app.database import get_database
+from app.core.metrics import RATE_LIMIT_REQUESTS
+import logging
+
+logger = logging.getLogger(__name__)
+
+class MemoryTokenBucketStore:
+    """程序內的令牌桶儲存（每個 worker 各自計算），超過容量時淘汰最久未使用的桶"""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def consume(self, key: str, capacity: float, refill_rate: float) -> Tuple[bool, float]:
+        """
+        嘗試從令牌桶取出一個令牌
+
+        Returns:
+            tuple: (是否允許, 剩餘令牌數)
+        """
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * refill_rate)
+
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+        return allowed, tokens
+
+class MongoTokenBucketStore:
+    """以 MongoDB 儲存的令牌桶（多個 worker 共用），以單一原子更新完成補充與扣除"""
+
+    async def consume(self, key: str, capacity: float, refill_rate: float) -> Tuple[bool, float]:
+        now = time.time()
+        # 令牌補滿後即可刪除，由 TTL 索引清理
+        expires_at = datetime.utcnow() + timedelta(seconds=capacity / refill_rate)
+
+        db = await get_database()
+        bucket = await db.rate_limits.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {
+                    "tokens": {"$min": [
+                        capacity,
+                        {"$add": [
+                            {"$ifNull": ["$tokens", capacity]},
+                            {"$multiply": [
+                                {"$subtract": [now, {"$ifNull": ["$updated", now]}]},
+                                refill_rate
+                            ]}
+                        ]}
+                    ]},
+                    "updated": now
+                }},
+                {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+                {"$set": {
+                    "tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                    "expires_at": expires_at
+                }}
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return bucket["allowed"], bucket["tokens"]
+
+class RateLimiter:
+    """以令牌桶演算法限制請求頻率，並統計各範圍允許與拒絕的次數"""
+
+    def __init__(self):
+        if settings.rate_limit_backend == "mongo":
+            self.store = MongoTokenBucketStore()
+        else:
+            self.store = MemoryTokenBucketStore(settings.rate_limit_max_keys)
+        self.allowed = {}
+        self.rejected = {}
+
+    async def check(self, scope: str, kind: str, identity: str, capacity: float, per_minute: float) -> Optional[int]:
+        """
+        檢查並扣除令牌
+
+        Returns:
+            int: 被拒絕時建議的重試秒數，允許時回傳 None
+        """
+        refill_rate = per_minute / 60.0
+        try:
+            allowed, tokens = await self.store.consume(f"{scope}:{kind}:{identity}", capacity, refill_rate)
+        except Exception as e:
+            # 共用儲存無法使用時不阻擋請求
+            logger.error(f"頻率限制檢查失敗: {e}")
+            return None
+
+        if allowed:
+            return None
+        return max(1, math.ceil((1 - tokens) / refill_rate))
+
+    def record(self, scope: str, allowed: bool):
+        counters = self.allowed if allowed else self.rejected
+        counters[scope] = counters.get(scope, 0) + 1
+        RATE_LIMIT_REQUESTS.labels(scope, "allowed" if allowed else "rejected").inc()
+
+    def stats(self) -> dict:
+        return {
+            "backend": settings.rate_limit_backend,
+            "allowed": dict(self.allowed),
+            "rejected": dict(self.rejected)
+        }
+
+rate_limiter = RateLimiter()
+
+def get_client_ip(request: Request) -> str:
+    """取得用戶端 IP（經由 nginx 代理時使用 X-Real-IP）"""
+    if settings.rate_limit_trust_proxy_headers:
+        real_ip = request.headers.get("x-real-ip")
+        if real_ip:
+            return real_ip.strip()
+    return request.client.host if request.client else "unknown"
+
+async def _get_request_field(request: Request, field: str) -> Optional[str]:
+    """從 JSON 或表單請求體取得欄位值（請求體已由 FastAPI 讀取並快取）"""
+    content_type = request.headers.get("content-type", "")
+    try:
+        if content_type.startswith("application/json"):
+            data = await request.json()
+        elif content_type.startswith(("application/x-www-form-urlencoded", "multipart/form-data")):
+            data = await request.form()
+        else:
+            return None
+    except Exception:
+        return None
+
+    value = data.get(field) if hasattr(data, "get") else None
+    if not value or not isinstance(value, str):
+        return None
+    return value.strip().lower()
+
+def rate_limit(scope: str, identity_field: Optional[str] = None):
+    """
+    建立頻率限制依賴
+
+    依用戶端 IP 及（可選的）請求體欄位（例如 username、email）分別限制，
+    在路由處理函數執行前回傳 429，避免觸發密碼雜湊或資料庫查詢
+
+    Args:
+        scope: 限制範圍名稱，例如 "login"
+        identity_field: 用於區分帳號的請求體欄位
+    """
+    async def dependency(request: Request):
+        if not settings.rate_limit_enabled:
+            return
+
+        retry_after = await rate_limiter.check(
+            scope, "ip", get_client_ip(request),
+            settings.rate_limit_ip_capacity, settings.rate_limit_ip_per_minute
+        )
+
+        if retry_after is None and identity_field:
+            identity = await _get_request_field(request, identity_field)
+            if identity:
+                retry_after = await rate_limiter.check(
+                    scope, identity_field, identity,
+                    settings.rate_limit_identity_capacity, settings.rate_limit_identity_per_minute
+                )
+
+        rate_limiter.record(scope, retry_after is None)
+        if retry_after is not None:
+            logger.warning(f"請求過於頻繁: {scope} 來自 {get_client_ip(request)}")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="請求過於頻繁，請稍後再試",
+                headers={"Retry-After": str(retry_after)}
+            )
+
+    return dependency
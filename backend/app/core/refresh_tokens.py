@@ -0,0 +1,118 @@
+import hashlib
+import secrets
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+from app.core.config import settings
+from app.database import get_database
+import logging
+
+logger = logging.getLogger(__name__)
+
+class InvalidRefreshToken(Exception):
+    """刷新令牌無效、已過期或已被使用"""
+
+def _hash_token(token: str) -> str:
+    """刷新令牌只以雜湊值儲存"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+async def issue_refresh_token(
+    user: dict,
+    family_id: Optional[str] = None,
+    family_expires_at: Optional[datetime] = None
+) -> str:
+    """
+    發出刷新令牌
+
+    同一次登入輪替出的令牌屬於同一個 family，
+    每次輪替延長有效期（滑動期限），但不超過 family 的最長期限
+    """
+    now = datetime.utcnow()
+    if family_id is None:
+        family_id = uuid.uuid4().hex
+        family_expires_at = now + timedelta(days=settings.refresh_session_max_days)
+
+    token = secrets.token_urlsafe(32)
+    db = await get_database()
+    await db.refresh_tokens.insert_one({
+        "token_hash": _hash_token(token),
+        "family_id": family_id,
+        "user_id": str(user["_id"]),
+        "username": user["username"],
+        "token_version": user.get("token_version", 0),
+        "used_at": None,
+        "revoked": False,
+        "expires_at": min(now + timedelta(days=settings.refresh_token_expire_days), family_expires_at),
+        "family_expires_at": family_expires_at,
+        "created_at": now
+    })
+    return token
+
+async def rotate_refresh_token(token: str) -> dict:
+    """
+    使用刷新令牌（只能使用一次）
+
+    重複使用已輪替過的令牌視為令牌外洩，撤銷整個 family；
+    輪替後短時間內的重複使用（多個分頁或並行請求同時刷新）仍允許，由呼叫端發出同 family 的新令牌
+
+    Returns:
+        dict: 刷新令牌紀錄
+    Raises:
+        InvalidRefreshToken: 令牌無效、已過期或已被使用
+    """
+    db = await get_database()
+    token_hash = _hash_token(token)
+    now = datetime.utcnow()
+
+    record = await db.refresh_tokens.find_one_and_update(
+        {
+            "token_hash": token_hash,
+            "used_at": None,
+            "revoked": False,
+            "expires_at": {"$gt": now}
+        },
+        {"$set": {"used_at": now}}
+    )
+    if record is not None:
+        return record
+
+    existing = await db.refresh_tokens.find_one({"token_hash": token_hash})
+    if (
+        existing is not None
+        and existing.get("used_at") is not None
+        and not existing.get("revoked")
+        and existing["expires_at"] > now
+        and now - existing["used_at"] <= timedelta(seconds=settings.refresh_reuse_grace_seconds)
+    ):
+        logger.info(f"用戶 {existing['username']} 的刷新令牌在寬限時間內重複使用，視為同時刷新")
+        return existing
+    
+    if existing is not None and existing.get("used_at") is not None:
+        logger.warning(f"偵測到刷新令牌重複使用，撤銷用戶 {existing['username']} 的登入階段")
+        await revoke_refresh_family(existing["family_id"])
+
+    raise InvalidRefreshToken()
+
+async def revoke_refresh_family(family_id: str):
+    """撤銷同一次登入的所有刷新令牌"""
+    db = await get_database()
+    await db.refresh_tokens.update_many(
+        {"family_id": family_id},
+        {"$set": {"revoked": True}}
+    )
+
+async def revoke_user_refresh_tokens(user_id) -> int:
+    """撤銷用戶所有的登入階段（用戶名或密碼變更），回傳撤銷的令牌數"""
+    db = await get_database()
+    result = await db.refresh_tokens.update_many(
+        {"user_id": str(user_id), "revoked": False},
+        {"$set": {"revoked": True}}
+    )
+    return result.modified_count
+
+async def revoke_refresh_token(token: str):
+    """撤銷刷新令牌所屬的登入階段（登出）"""
+    db = await get_database()
+    record = await db.refresh_tokens.find_one({"token_hash": _hash_token(token)})
+    if record is not None:
+        await revoke_refresh_family(record["family_id"])
@@ -0,0 +1,28 @@
+import time
+from typing import Any
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from app.core.metrics import RESPONSE_SERIALIZATION_DURATION
+
+def _default(value: Any):
+    """orjson 不支援的型別（datetime、Enum 由 orjson 原生處理）"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+class ORJSONResponse(JSONResponse):
+    """
+    以 orjson 序列化的 JSON 回應（應用程式預設回應類別）
+
+    列表端點直接回傳此回應，略過 response_model 的逐筆驗證及 jsonable_encoder；
+    datetime 輸出格式與 Pydantic 相同（ISO 8601），ObjectId 輸出為字串
+    """
+
+    def render(self, content: Any) -> bytes:
+        start = time.perf_counter()
+        body = orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        RESPONSE_SERIALIZATION_DURATION.observe(time.perf_counter() - start)
+        return body
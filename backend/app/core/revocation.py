@@ -0,0 +1,128 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+from pymongo import ReturnDocument
+from app.core.config import settings
+from app.core.cache import invalidate_user
+from app.database import get_database
+import logging
+
+logger = logging.getLogger(__name__)
+
+class TokenRevocationList:
+    """
+    存取令牌撤銷清單
+
+    在記憶體中保存已撤銷的 jti、已刪除的用戶及用戶令牌版本，
+    定期從 MongoDB 重新載入，讓令牌驗證不需要查詢資料庫
+    """
+
+    def __init__(self):
+        self.revoked_jtis = {}      # jti -> 過期時間
+        self.revoked_users = {}     # user_id -> 過期時間
+        self.user_versions = {}     # user_id -> token_version
+        self._task: Optional[asyncio.Task] = None
+
+    def is_revoked(self, jti: Optional[str], user_id: Optional[str], version: Optional[int]) -> bool:
+        """檢查令牌是否已撤銷"""
+        if jti and jti in self.revoked_jtis:
+            return True
+        if user_id:
+            if user_id in self.revoked_users:
+                return True
+            if (version or 0) < self.user_versions.get(user_id, 0):
+                return True
+        return False
+
+    async def revoke_token(self, jti: str, expires_at: datetime):
+        """撤銷單一令牌（登出）"""
+        self.revoked_jtis[jti] = expires_at
+        db = await get_database()
+        await db.revoked_tokens.update_one(
+            {"jti": jti},
+            {"$set": {"jti": jti, "expires_at": expires_at}},
+            upsert=True
+        )
+
+    async def revoke_user(self, user_id: str):
+        """撤銷用戶所有已發出的令牌（刪除用戶）"""
+        expires_at = datetime.utcnow() + timedelta(minutes=settings.access_token_expire_minutes)
+        self.revoked_users[user_id] = expires_at
+        db = await get_database()
+        await db.revoked_tokens.update_one(
+            {"user_id": user_id},
+            {"$set": {"user_id": user_id, "expires_at": expires_at}},
+            upsert=True
+        )
+
+    async def bump_user_version(self, user_id) -> int:
+        """遞增用戶令牌版本，使舊版本的令牌失效（密碼或權限變更）"""
+        db = await get_database()
+        user = await db.users.find_one_and_update(
+            {"_id": user_id},
+            {"$inc": {"token_version": 1}},
+            projection={"token_version": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        version = user["token_version"] if user else 0
+        self.user_versions[str(user_id)] = version
+        invalidate_user(user_id=user_id)
+        return version
+
+    async def refresh(self):
+        """從資料庫重新載入撤銷清單"""
+        db = await get_database()
+        now = datetime.utcnow()
+
+        revoked_jtis = {}
+        revoked_users = {}
+        async for doc in db.revoked_tokens.find({"expires_at": {"$gt": now}}):
+            if doc.get("jti"):
+                revoked_jtis[doc["jti"]] = doc["expires_at"]
+            elif doc.get("user_id"):
+                revoked_users[doc["user_id"]] = doc["expires_at"]
+
+        user_versions = {}
+        async for user in db.users.find({"token_version": {"$gt": 0}}, {"token_version": 1}):
+            user_versions[str(user["_id"])] = user["token_version"]
+
+        # 保留重新載入期間在本 worker 新增、尚未過期的項目
+        for jti, expires_at in self.revoked_jtis.items():
+            if expires_at > now:
+                revoked_jtis.setdefault(jti, expires_at)
+        for user_id, expires_at in self.revoked_users.items():
+            if expires_at > now:
+                revoked_users.setdefault(user_id, expires_at)
+        for user_id, version in self.user_versions.items():
+            user_versions[user_id] = max(version, user_versions.get(user_id, 0))
+
+        self.revoked_jtis = revoked_jtis
+        self.revoked_users = revoked_users
+        self.user_versions = user_versions
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(settings.token_revocation_refresh_seconds)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"重新載入令牌撤銷清單失敗: {e}")
+
+    async def start(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.error(f"載入令牌撤銷清單失敗: {e}")
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+token_revocations = TokenRevocationList()
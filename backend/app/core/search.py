@@ -0,0 +1,151 @@
+import re
+import unicodedata
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+from pymongo.errors import DuplicateKeyError
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.database import get_database
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 以字母/數字連續片段切詞（底線也視為分隔符號）
+TOKEN_PATTERN = re.compile(r"[^\W_]+", re.UNICODE)
+MAX_TOKEN_LENGTH = 64
+
+# 擷取文字失敗（檔案損壞或遺失）的文件標記，補建索引時不再重試
+TEXT_INDEX_FAILED = "failed"
+
+def normalize_text(text: str) -> str:
+    """正規化文字（全形轉半形、轉小寫）"""
+    return unicodedata.normalize("NFKC", text or "").lower()
+
+def tokenize(text: str) -> List[str]:
+    """將文字切分為搜尋詞"""
+    return [token[:MAX_TOKEN_LENGTH] for token in TOKEN_PATTERN.findall(normalize_text(text))]
+
+def build_search_tokens(original_filename: str, content_text: str = "") -> List[str]:
+    """
+    建立文件的前綴搜尋詞（去除重複，檔名優先）
+
+    Args:
+        original_filename: 原始檔名
+        content_text: 從 PDF 擷取的文字
+    Returns:
+        list: 不重複的搜尋詞，最多 settings.search_max_tokens 個
+    """
+    tokens = {}
+    for token in tokenize(original_filename) + tokenize(content_text):
+        if token not in tokens:
+            tokens[token] = None
+            if len(tokens) >= settings.search_max_tokens:
+                break
+    return list(tokens)
+
+def build_prefix_query(q: str) -> Optional[dict]:
+    """
+    建立前綴搜尋條件：前面的詞需完全符合，最後一個詞以前綴比對
+
+    Returns:
+        dict: MongoDB 查詢條件，查詢字串沒有可用的詞時回傳 None
+    """
+    terms = tokenize(q)
+    if not terms:
+        return None
+
+    conditions = [{"search_tokens": term} for term in terms[:-1]]
+    conditions.append({"search_tokens": re.compile("^" + re.escape(terms[-1]))})
+    return {"$and": conditions}
+
+async def index_document_text(file_path: str, original_filename: str):
+    """
+    擷取 PDF 文字並更新搜尋索引欄位（上傳後於背景執行）
+
+    以 file_path 更新，已簽署的副本共用原始檔案路徑，因此一併更新；
+    擷取失敗時標記為 TEXT_INDEX_FAILED
+    """
+    from app.utils.pdf_utils import extract_pdf_text
+
+    try:
+        content_text = await run_in_threadpool(
+            extract_pdf_text, file_path, settings.search_text_max_chars
+        )
+
+        db = await get_database()
+        await db.documents.update_many(
+            {"file_path": file_path},
+            {
+                "$set": {
+                    "content_text": content_text,
+                    "search_tokens": build_search_tokens(original_filename, content_text),
+                    "text_indexed": True
+                }
+            }
+        )
+        logger.info(f"已建立文件搜尋索引: {original_filename} ({len(content_text)} 字元)")
+
+    except Exception as e:
+        logger.error(f"建立文件搜尋索引失敗 {file_path}: {e}")
+        try:
+            db = await get_database()
+            await db.documents.update_many(
+                {"file_path": file_path, "text_indexed": {"$ne": True}},
+                {"$set": {"text_indexed": TEXT_INDEX_FAILED}}
+            )
+        except Exception as e:
+            logger.error(f"標記搜尋索引失敗的文件失敗 {file_path}: {e}")
+
+async def _acquire_backfill_lease(owner: str) -> bool:
+    """取得或延長補建索引的租約（其他 worker 持有時回傳 False）"""
+    now = datetime.utcnow()
+    db = await get_database()
+    try:
+        await db.locks.find_one_and_update(
+            {"_id": "search_backfill", "$or": [{"locked_until": {"$lte": now}}, {"owner": owner}]},
+            {"$set": {
+                "owner": owner,
+                "locked_until": now + timedelta(seconds=settings.search_backfill_lease_seconds)
+            }},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+async def backfill_search_index(batch_size: int = 100):
+    """
+    為尚未建立搜尋索引的既有文件補建索引
+
+    多個 worker 以 MongoDB 租約確保同時只有一個 worker 執行，每處理一份文件延長租約；
+    擷取失敗的文件已標記，worker 重新啟動時不會再次處理
+    """
+    owner = uuid.uuid4().hex
+    if not await _acquire_backfill_lease(owner):
+        return
+
+    db = await get_database()
+    indexed = 0
+    seen_paths = set()
+    try:
+        cursor = db.documents.find(
+            {"text_indexed": {"$nin": [True, TEXT_INDEX_FAILED]}},
+            {"file_path": 1, "original_filename": 1}
+        ).batch_size(batch_size)
+
+        async for doc in cursor:
+            if doc["file_path"] in seen_paths:
+                continue
+            seen_paths.add(doc["file_path"])
+            if not await _acquire_backfill_lease(owner):
+                logger.warning("補建搜尋索引的租約已被其他 worker 取得，停止補建")
+                break
+            await index_document_text(doc["file_path"], doc["original_filename"])
+            indexed += 1
+    finally:
+        # 完成後釋放租約，之後啟動的 worker 只需確認沒有待補建的文件
+        await db.locks.update_one({"_id": "search_backfill", "owner": owner}, {"$set": {"locked_until": datetime.utcnow()}})
+
+    if indexed:
+        logger.info(f"已補建 {indexed} 份文件的搜尋索引")
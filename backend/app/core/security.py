@@ -6,15 +6,35 @@ from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.core.config import settings
 from app.models.user import TokenData
+from app.core.cache import user_cache
+from app.core.revocation import token_revocations
+from app.core.concurrency import BoundedExecutor, ConcurrencyLimitExceeded
+from bson import ObjectId
+import os
 import secrets
 import string
+import uuid
 
-# 密碼加密
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# 密碼加密：成本與設定不同的雜湊在登入成功時自動重新雜湊
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.bcrypt_rounds,
+    bcrypt__min_rounds=settings.bcrypt_rounds,
+    bcrypt__max_rounds=settings.bcrypt_rounds
+)
 
 # JWT 安全
 security = HTTPBearer()
 
+# 密碼雜湊執行緒池：bcrypt 計算不阻塞事件迴圈，超過上限的請求排隊等待
+password_executor = BoundedExecutor(
+    "password-hash",
+    max_workers=settings.password_hash_workers or os.cpu_count() or 1,
+    max_queue=settings.password_hash_max_queue,
+    queue_timeout=settings.password_hash_queue_timeout
+)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """驗證密碼"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -23,6 +43,31 @@ def get_password_hash(password: str) -> str:
     """生成密碼雜湊"""
     return pwd_context.hash(password)
 
+def password_needs_update(hashed_password: str) -> bool:
+    """檢查密碼雜湊是否需要以目前的設定重新雜湊"""
+    return pwd_context.needs_update(hashed_password)
+
+def _server_busy_exception(exc: ConcurrencyLimitExceeded) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="伺服器忙碌中，請稍後重試",
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """在密碼雜湊執行緒池中驗證密碼"""
+    try:
+        return await password_executor.run(verify_password, plain_password, hashed_password)
+    except ConcurrencyLimitExceeded as e:
+        raise _server_busy_exception(e)
+
+async def get_password_hash_async(password: str) -> str:
+    """在密碼雜湊執行緒池中生成密碼雜湊"""
+    try:
+        return await password_executor.run(get_password_hash, password)
+    except ConcurrencyLimitExceeded as e:
+        raise _server_busy_exception(e)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """創建訪問令牌"""
     to_encode = data.copy()
@@ -35,6 +80,20 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
+def create_user_access_token(user: dict, expires_delta: Optional[timedelta] = None):
+    """為用戶創建包含授權聲明的訪問令牌"""
+    return create_access_token(
+        data={
+            "sub": user["username"],
+            "uid": str(user["_id"]),
+            "role": user.get("role"),
+            "is_active": user.get("is_active", False),
+            "ver": user.get("token_version", 0),
+            "jti": uuid.uuid4().hex
+        },
+        expires_delta=expires_delta
+    )
+
 def verify_token(token: str) -> TokenData:
     """驗證令牌"""
     credentials_exception = HTTPException(
@@ -48,26 +107,78 @@ def verify_token(token: str) -> TokenData:
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
-        token_data = TokenData(username=username)
+        token_data = TokenData(
+            username=username,
+            user_id=payload.get("uid"),
+            role=payload.get("role"),
+            is_active=payload.get("is_active"),
+            version=payload.get("ver"),
+            jti=payload.get("jti"),
+            expires_at=datetime.utcfromtimestamp(payload["exp"]) if payload.get("exp") else None
+        )
     except JWTError:
         raise credentials_exception
     
+    # 檢查撤銷清單（記憶體內，不查詢資料庫）
+    if token_revocations.is_revoked(token_data.jti, token_data.user_id, token_data.version):
+        raise credentials_exception
+    
     return token_data
 
 def generate_activation_code() -> str:
     """生成啟用碼"""
     return ''.join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(8))
 
+async def get_user_by_username(username: str):
+    """依用戶名取得用戶（優先使用快取）"""
+    user = user_cache.get(username)
+    if user is None:
+        from app.database import get_database
+        db = await get_database()
+        
+        user = await db.users.find_one({"username": username})
+        if user is None:
+            return None
+        user_cache.set(username, user)
+    
+    # 回傳副本，避免呼叫端修改快取內容
+    return dict(user)
+
+async def get_user_by_id(user_id: str):
+    """依用戶 ID 取得用戶（優先使用快取；以 ("id", 用戶 ID) 為鍵，invalidate_user 以用戶名或 ID 都會移除）"""
+    key = ("id", user_id)
+    user = user_cache.get(key)
+    if user is None:
+        from app.database import get_database
+        db = await get_database()
+        
+        user = await db.users.find_one({"_id": ObjectId(user_id)})
+        if user is None:
+            return None
+        user_cache.set(key, user)
+    
+    return dict(user)
+
+async def get_user_from_token(token: str):
+    """
+    依令牌取得用戶（查詢參數傳遞令牌的端點使用），令牌無效時拋出 HTTPException
+
+    令牌中的 uid 與目前使用該用戶名的帳號不符時回傳 None
+    """
+    token_data = verify_token(token)
+    user = await get_user_by_username(token_data.username)
+    if user is None or (token_data.user_id and str(user["_id"]) != token_data.user_id):
+        return None
+    return user
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """獲取當前用戶"""
     token = credentials.credentials
     token_data = verify_token(token)
     
-    from app.database import get_database
-    db = await get_database()
-    
-    user = await db.users.find_one({"username": token_data.username})
-    if user is None:
+    user = await get_user_by_username(token_data.username)
+    # 用戶名改由其他帳號使用時，令牌中的 uid 與目前的用戶不符
+    if user is None or (token_data.user_id and str(user["_id"]) != token_data.user_id):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用戶不存在"
@@ -92,3 +203,88 @@ async def get_admin_user(current_user = Depends(get_current_active_user)):
             detail="需要管理員權限"
         )
     return current_user
+
+async def get_token_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """
+    從令牌聲明取得當前用戶（不查詢資料庫）
+    
+    只包含 _id、username、role、is_active；需要完整資料時請使用 get_current_user。
+    沒有授權聲明的舊版令牌改為查詢資料庫。
+    
+    權限檢查以用戶名比對擁有者及簽署者，用戶名以 uid 從（快取的）用戶資料取得，
+    不直接信任 sub；用戶名已變更的令牌視為失效
+    """
+    token_data = verify_token(credentials.credentials)
+    
+    if not token_data.has_claims:
+        user = await get_user_by_username(token_data.username)
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="用戶不存在"
+            )
+        return user
+    
+    user = await get_user_by_id(token_data.user_id)
+    if user is None or user["username"] != token_data.username:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="用戶不存在"
+        )
+    
+    return {
+        "_id": ObjectId(token_data.user_id),
+        "username": user["username"],
+        "role": token_data.role,
+        "is_active": token_data.is_active
+    }
+
+async def get_authorized_user(current_user = Depends(get_token_user)):
+    """從令牌聲明取得當前活躍用戶"""
+    if not current_user.get("is_active"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="用戶帳號未啟用"
+        )
+    return current_user
+
+async def get_authorized_admin(current_user = Depends(get_authorized_user)):
+    """從令牌聲明取得管理員用戶"""
+    if current_user.get("role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="需要管理員權限"
+        )
+    return current_user
+
+def is_document_signer(user: dict, document: dict) -> bool:
+    """檢查用戶是否為多人簽署文件的簽署者"""
+    return any(signer.get("username") == user.get("username") for signer in document.get("signers") or [])
+
+def can_view_document(user: dict, document: dict) -> bool:
+    """
+    檢查用戶是否可查看文件（管理員可查看全部，一般用戶只能查看可簽署文件或自己簽署的文件；
+    多人簽署文件只有簽署者可查看）
+    """
+    if user.get("role") == "admin":
+        return True
+    if document.get("signers"):
+        return is_document_signer(user, document)
+    if document.get("status") == "uploaded":
+        return True
+    return document.get("status") == "signed" and document.get("signed_by") == user.get("username")
+
+def can_list_document(user: dict, document: dict) -> bool:
+    """
+    檢查文件是否出現在用戶的文件列表（可簽署 / 已簽署），條件與列表查詢相同
+
+    多人簽署文件未完成時只列給目前輪到的簽署者，完成後列給所有簽署者；
+    其他文件與 can_view_document 相同
+    """
+    if user.get("role") == "admin":
+        return True
+    if document.get("signers"):
+        if document.get("status") == "uploaded":
+            return document.get("next_signer") == user.get("username")
+        return is_document_signer(user, document)
+    return can_view_document(user, document)
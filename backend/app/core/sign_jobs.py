@@ -0,0 +1,318 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+from bson import ObjectId
+from fastapi import HTTPException, status
+from pymongo import ReturnDocument
+from app.core.config import settings
+from app.core.metrics import SIGN_JOBS
+from app.core.signing import sign_document_as
+from app.database import get_database
+import logging
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+class JobProgress:
+    """
+    簽署進度（由執行緒池中的簽署流程更新，背景工作定期寫入資料庫）
+
+    只做屬性指派，不在簽署執行緒中存取資料庫或事件迴圈
+    """
+
+    def __init__(self):
+        self.stage = "queued"
+        self.fraction = 0.0
+
+    def __call__(self, stage: str, fraction: float):
+        self.stage = stage
+        self.fraction = fraction
+
+class SignJobQueue:
+    """
+    非同步簽署工作佇列
+
+    工作寫入 MongoDB 的 sign_jobs collection，由各 worker 的背景工作者取得並執行；
+    執行中的工作定期延長租約並寫入進度，worker 重啟或異常結束時租約逾期，
+    工作由其他工作者重新取得。已完成的工作保留一段時間後由 TTL 索引刪除
+    """
+
+    def __init__(self):
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def enqueue(self, document_id: str, username: str, signature_data: Optional[str]) -> str:
+        """
+        加入簽署工作，回傳工作 ID
+
+        Args:
+            document_id: 文件 ID
+            username: 簽署者
+            signature_data: 前端送出的簽名資料（JSON 字串）
+        """
+        now = datetime.utcnow()
+        db = await get_database()
+        result = await db.sign_jobs.insert_one({
+            "document_id": document_id,
+            "username": username,
+            "signature_data": signature_data,
+            "status": "queued",
+            "stage": "queued",
+            "progress": 0.0,
+            "attempts": 0,
+            "available_at": now,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now
+        })
+
+        SIGN_JOBS.labels(outcome="queued").inc()
+        self.notify()
+        return str(result.inserted_id)
+
+    def notify(self):
+        """喚醒等待中的工作者"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        for index in range(settings.sign_job_workers):
+            self._tasks.append(asyncio.create_task(self._worker(index)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self, index: int):
+        logger.info(f"簽署工作者 {index} 已啟動")
+        while True:
+            try:
+                job = await self._claim()
+                if job is not None:
+                    await self._run(job)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"簽署工作者 {index} 錯誤: {e}")
+
+            # 沒有待執行的工作時等待新工作或定期輪詢
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.sign_job_poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim(self):
+        """取得一個待執行的工作（租約逾期的工作可由其他工作者重新取得）"""
+        now = datetime.utcnow()
+        db = await get_database()
+        return await db.sign_jobs.find_one_and_update(
+            {
+                "$or": [
+                    {"status": "queued", "available_at": {"$lte": now}},
+                    {"status": "running", "locked_until": {"$lt": now}}
+                ]
+            },
+            {
+                "$set": {
+                    "status": "running",
+                    "lease_id": uuid.uuid4().hex,
+                    "locked_until": now + timedelta(seconds=settings.sign_job_lease_seconds),
+                    "started_at": now,
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _finish(self, job: dict, fields: dict, outcome: str):
+        """寫入最終狀態（只在仍持有租約時寫入，避免覆蓋其他工作者的結果）"""
+        now = datetime.utcnow()
+        db = await get_database()
+        result = await db.sign_jobs.update_one(
+            {"_id": job["_id"], "lease_id": job["lease_id"]},
+            {
+                "$set": {
+                    **fields,
+                    "finished_at": now,
+                    "updated_at": now,
+                    "expires_at": now + timedelta(days=settings.sign_job_retention_days)
+                },
+                "$unset": {"locked_until": "", "lease_id": "", "signature_data": ""}
+            }
+        )
+        if result.matched_count:
+            SIGN_JOBS.labels(outcome=outcome).inc()
+        else:
+            logger.warning(f"簽署工作 {job['_id']} 的租約已被其他工作者取得，略過結果")
+
+    async def _heartbeat(self, job: dict, progress: JobProgress):
+        """定期寫入進度並延長租約，租約已被其他工作者取得時結束"""
+        db = await get_database()
+        while True:
+            await asyncio.sleep(settings.sign_job_progress_seconds)
+            now = datetime.utcnow()
+            try:
+                result = await db.sign_jobs.update_one(
+                    {"_id": job["_id"], "lease_id": job["lease_id"]},
+                    {"$set": {
+                        "stage": progress.stage,
+                        "progress": round(progress.fraction, 3),
+                        "locked_until": now + timedelta(seconds=settings.sign_job_lease_seconds),
+                        "updated_at": now
+                    }}
+                )
+            except Exception as e:
+                # 暫時性的資料庫錯誤：租約遠長於寫入間隔，下一次再延長
+                logger.warning(f"延長簽署工作 {job['_id']} 的租約失敗: {e}")
+                continue
+            if not result.matched_count:
+                return
+
+    async def _already_signed(self, job: dict) -> Optional[dict]:
+        """
+        重新取得的工作：前一次執行可能已寫入簽名後才中斷（尚未標記完成），
+        多人簽署文件中此簽署者已簽署時回傳文件，否則回傳 None
+
+        單人簽署依已簽署檔名更新同一筆記錄，重新執行不會重複簽署
+        """
+        if job["attempts"] <= 1 or not ObjectId.is_valid(job["document_id"]):
+            return None
+        db = await get_database()
+        document = await db.documents.find_one({"_id": ObjectId(job["document_id"])})
+        if document and any(
+            signer["username"] == job["username"] and signer["status"] == "signed"
+            for signer in document.get("signers") or []
+        ):
+            return document
+        return None
+
+    async def _run(self, job: dict):
+        document = await self._already_signed(job)
+        if document is not None:
+            await self._succeed(job, document)
+            logger.info(f"簽署工作 {job['_id']} 的簽名已於前一次執行寫入，標記為完成")
+            return
+
+        if job["attempts"] > settings.sign_job_max_attempts:
+            await self._finish(job, {"status": "failed", "error": "簽署工作重試次數過多", "error_status": 500}, "failed")
+            logger.error(f"簽署工作 {job['_id']} 執行 {job['attempts'] - 1} 次未完成，已停止重試")
+            return
+
+        logger.info(f"開始執行簽署工作 {job['_id']}（文件 {job['document_id']}，第 {job['attempts']} 次）")
+        progress = JobProgress()
+        signing = asyncio.create_task(
+            sign_document_as(job["document_id"], job["username"], job.get("signature_data"), progress)
+        )
+        heartbeat = asyncio.create_task(self._heartbeat(job, progress))
+        try:
+            await asyncio.wait({signing, heartbeat}, return_when=asyncio.FIRST_COMPLETED)
+            if not signing.done():
+                # 租約已被其他工作者取得：停止執行，避免同一個工作簽署兩次
+                signing.cancel()
+                await asyncio.gather(signing, return_exceptions=True)
+                logger.warning(f"簽署工作 {job['_id']} 的租約已被其他工作者取得，停止執行")
+                return
+            document = signing.result()
+        except HTTPException as e:
+            heartbeat.cancel()
+            if e.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
+                await self._requeue(job, e)
+            else:
+                await self._finish(job, {"status": "failed", "error": e.detail, "error_status": e.status_code}, "failed")
+                logger.warning(f"簽署工作 {job['_id']} 失敗: {e.detail}")
+            return
+        except Exception as e:
+            heartbeat.cancel()
+            await self._finish(job, {"status": "failed", "error": f"PDF 簽名處理錯誤: {e}", "error_status": 500}, "failed")
+            logger.error(f"簽署工作 {job['_id']} 異常: {e}")
+            return
+        finally:
+            # 工作者被取消（關閉）時也停止簽署及寫入進度，租約逾期後由其他工作者重新執行
+            heartbeat.cancel()
+            signing.cancel()
+
+        await self._succeed(job, document)
+        logger.info(f"簽署工作 {job['_id']} 已完成")
+
+    async def _succeed(self, job: dict, document: dict):
+        await self._finish(job, {
+            "status": "succeeded",
+            "stage": "done",
+            "progress": 1.0,
+            "result": {
+                "document_id": str(document["_id"]),
+                "document_status": document["status"],
+                "signed_filename": document.get("signed_filename"),
+                # 多人簽署文件在最後一位簽署後才有可下載的檔案
+                "download_url": f"/api/documents/{document['_id']}/download" if document["status"] == "signed" else None,
+                "next_signer": document.get("next_signer")
+            }
+        }, "succeeded")
+
+    async def _requeue(self, job: dict, error: HTTPException):
+        """簽署執行緒池忙碌：稍後重新執行，不計入重試次數"""
+        retry_after = int((error.headers or {}).get("Retry-After", settings.sign_job_poll_seconds))
+        now = datetime.utcnow()
+        db = await get_database()
+        await db.sign_jobs.update_one(
+            {"_id": job["_id"], "lease_id": job["lease_id"]},
+            {
+                "$set": {
+                    "status": "queued",
+                    "stage": "queued",
+                    "available_at": now + timedelta(seconds=retry_after),
+                    "updated_at": now
+                },
+                "$unset": {"locked_until": "", "lease_id": ""},
+                "$inc": {"attempts": -1}
+            }
+        )
+        SIGN_JOBS.labels(outcome="requeued").inc()
+        logger.info(f"簽署執行緒池忙碌，簽署工作 {job['_id']} 於 {retry_after} 秒後重試")
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        """取得工作，ID 無效時回傳 None"""
+        if not ObjectId.is_valid(job_id):
+            return None
+        db = await get_database()
+        return await db.sign_jobs.find_one({"_id": ObjectId(job_id)}, {"signature_data": 0})
+
+    async def stats(self) -> dict:
+        """各狀態的工作數量"""
+        db = await get_database()
+        counts = {"queued": 0, "running": 0, "succeeded": 0, "failed": 0}
+        async for row in db.sign_jobs.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            counts[row["_id"]] = row["count"]
+        return counts
+
+sign_jobs = SignJobQueue()
+
+def job_view(job: dict) -> dict:
+    """工作的回應內容"""
+    view = {
+        "job_id": str(job["_id"]),
+        "document_id": job["document_id"],
+        "status": job["status"],
+        "stage": job.get("stage"),
+        "progress": job.get("progress", 0.0),
+        "attempts": job.get("attempts", 0),
+        "created_at": job["created_at"],
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at")
+    }
+    if job["status"] == "succeeded":
+        view["result"] = job.get("result")
+    elif job["status"] == "failed":
+        view["error"] = job.get("error")
+        view["error_status"] = job.get("error_status")
+    return view
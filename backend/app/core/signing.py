@@ -0,0 +1,360 @@
+import json
+import os
+import shutil
+from contextlib import suppress
+from datetime import datetime
+from typing import Callable, Optional
+from bson import ObjectId
+from fastapi import HTTPException, status
+from app.core.concurrency import BoundedExecutor, ConcurrencyLimitExceeded
+from app.core.config import settings
+from app.core.notifications import record_document_event
+from app.core.search import build_search_tokens
+from app.database import get_database
+from app.utils.pdf_utils import add_signature_to_pdf, apply_signature_layers, prepare_signature_layer
+import logging
+
+logger = logging.getLogger(__name__)
+
+# PDF 簽署在執行緒池中執行，避免阻塞事件迴圈；
+# PyPDF2 受 GIL 限制，多核心的平行處理由多個 worker 程序提供
+signing_executor = BoundedExecutor(
+    "pdf-sign",
+    max_workers=settings.signing_workers,
+    max_queue=settings.signing_max_queue,
+    queue_timeout=settings.signing_queue_timeout
+)
+
+async def sign_pdf_async(
+    original_pdf_path: str,
+    signature_image_data: str,
+    signature_info: dict,
+    output_path: str,
+    progress_callback: Optional[Callable[[str, float], None]] = None
+) -> bool:
+    """在簽署執行緒池中將簽名合成到 PDF"""
+    try:
+        return await signing_executor.run(
+            add_signature_to_pdf,
+            original_pdf_path=original_pdf_path,
+            signature_image_data=signature_image_data,
+            signature_info=signature_info,
+            output_path=output_path,
+            progress_callback=progress_callback
+        )
+    except ConcurrencyLimitExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="伺服器忙碌中，請稍後重試",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+async def get_signable_document(document_id: str, username: Optional[str] = None) -> dict:
+    """
+    取得待簽署的文件，文件不存在、已簽署或（多人簽署文件）尚未輪到此用戶時拋出 HTTPException
+    """
+    db = await get_database()
+    document = await db.documents.find_one({"_id": ObjectId(document_id)})
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="文件不存在"
+        )
+    
+    # 檢查文件狀態
+    if document["status"] != "uploaded":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="文件已被簽署"
+        )
+    
+    # 多人簽署文件依順序簽署
+    if document.get("signers") and username is not None and document.get("next_signer") != username:
+        if not any(signer["username"] == username for signer in document["signers"]):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="您不是此文件的簽署者"
+            )
+        if any(signer["username"] == username and signer["status"] == "signed" for signer in document["signers"]):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="您已簽署此文件"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"尚未輪到您簽署，目前等待 {document.get('next_signer')} 簽署"
+        )
+    return document
+
+async def sign_document_as(
+    document_id: str,
+    username: str,
+    raw_signature_data: Optional[str],
+    progress_callback: Optional[Callable[[str, float], None]] = None
+) -> dict:
+    """
+    以指定用戶簽署文件並建立已簽署文件記錄（同步簽署及簽署工作共用）
+
+    Args:
+        document_id: 文件 ID
+        username: 簽署者
+        raw_signature_data: 前端送出的簽名資料（JSON 字串，包含 signature_image）
+        progress_callback: 進度回呼，見 add_signature_to_pdf
+
+    Returns:
+        已簽署的文件資料
+    """
+    db = await get_database()
+    document = await get_signable_document(document_id, username)
+    if document.get("signers"):
+        return await add_signature_layer(document, username, raw_signature_data, progress_callback)
+    
+    # 生成簽署後的檔名
+    signed_filename = f"{username}-{document['original_filename']}"
+    signed_file_path = os.path.join(settings.signed_doc_path, signed_filename)
+    
+    # 確保目錄存在
+    os.makedirs(settings.signed_doc_path, exist_ok=True)
+    
+    # 解析簽名數據
+    signature_data = json.loads(raw_signature_data or "{}")
+    signature_image = signature_data.get("signature_image")
+    
+    if signature_image:
+        # 使用 PDF 工具添加簽名
+        try:
+            logger.info("Processing PDF signature for document %s", document_id)
+            logger.debug("Original filename: %s", document['original_filename'])
+            
+            success = await sign_pdf_async(
+                original_pdf_path=document["file_path"],
+                signature_image_data=signature_image,
+                signature_info=signature_data,
+                output_path=signed_file_path,
+                progress_callback=progress_callback
+            )
+            
+            if not success:
+                logger.error("PDF signature processing failed for document %s", document_id)
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="PDF 簽名處理失敗"
+                )
+            
+            logger.info("PDF signature processing completed successfully for document %s", document_id)
+            
+            # 檢查輸出文件是否存在
+            if not os.path.exists(signed_file_path):
+                logger.error("Signed PDF file was not created: %s", signed_file_path)
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="簽名文件創建失敗"
+                )
+            
+            logger.debug("Signed PDF file size: %s bytes", os.path.getsize(signed_file_path))
+            
+        except HTTPException:
+            # 重新拋出 HTTP 異常
+            raise
+        except Exception as e:
+            logger.error("PDF signature processing exception for document %s: %s", document_id, e)
+            logger.error("Original PDF path: %s", document['file_path'])
+            logger.error("Original file exists: %s", os.path.exists(document['file_path']))
+            logger.error("Output path: %s", signed_file_path)
+            
+            # 如果是 PyPDF2 錯誤，提供更友好的錯誤信息
+            if "startxref not found" in str(e) or "PyPDF2" in str(e):
+                # 檢查是否成功創建了fallback文件
+                if os.path.exists(signed_file_path):
+                    logger.info("Enhanced fallback PDF was created successfully at: %s", signed_file_path)
+                    # 不拋出異常，因為系統已成功創建了包含提取內容和簽名的PDF
+                else:
+                    raise HTTPException(
+                        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        detail="PDF 文件格式嚴重損壞，無法處理。請聯繫技術支持檢查原始文件。"
+                    )
+            else:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"PDF 簽名處理錯誤: {str(e)}"
+                )
+    else:
+        # 如果沒有簽名圖像，只複製文件
+        shutil.copy2(document["file_path"], signed_file_path)
+    
+    # 創建新的已簽署文件記錄
+    signed_document_data = {
+        "filename": document["filename"],  # 保持原始文件名
+        "original_filename": document["original_filename"],
+        "file_path": document["file_path"],  # 原始文件路徑
+        "file_size": document["file_size"],
+        "status": "signed",
+        "uploaded_by": document["uploaded_by"],
+        "signed_by": username,
+        "signed_at": datetime.utcnow(),
+        "signed_filename": signed_filename,
+        "signed_file_path": signed_file_path,
+        "signature_data": raw_signature_data,
+        "search_tokens": document.get("search_tokens", build_search_tokens(document["original_filename"])),
+        "content_text": document.get("content_text", ""),
+        "text_indexed": document.get("text_indexed", False),
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    }
+    
+    doc_exists = await db.documents.find_one({"signed_filename": signed_filename})
+    new_document = None
+    if doc_exists:
+        _ = await db.documents.update_one({"_id": doc_exists["_id"]}, {"$set": signed_document_data})
+        new_document = await db.documents.find_one({"_id": doc_exists["_id"]})
+    else:
+        result = await db.documents.insert_one(signed_document_data)
+        new_document = await db.documents.find_one({"_id": result.inserted_id})
+    
+    # 通知上傳者文件已簽署（定期彙整為摘要郵件）
+    await record_document_event(
+        "signed", new_document,
+        actor=username, recipients=[new_document["uploaded_by"]]
+    )
+    
+    return new_document
+
+async def add_signature_layer(
+    document: dict,
+    username: str,
+    raw_signature_data: Optional[str],
+    progress_callback: Optional[Callable[[str, float], None]] = None
+) -> dict:
+    """
+    多人簽署文件：保存簽名圖層並輪到下一位簽署者
+
+    每個簽名只保存縮放後的 PNG 圖層（signature_layers collection），不重寫 PDF；
+    最後一位簽署時才將所有圖層一次合成為已簽署文件。簽署順序以 signed_count
+    條件更新保證，同時送出的重複簽署只有一個成功
+
+    Returns:
+        更新後的文件資料
+    """
+    db = await get_database()
+    order = document.get("signed_count", 0)
+    signers = document["signers"]
+    is_last = order == len(signers) - 1
+    
+    signature_data = json.loads(raw_signature_data or "{}")
+    signature_image = signature_data.get("signature_image")
+    if not signature_image:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="缺少簽名圖像"
+        )
+    
+    try:
+        image = await signing_executor.run(prepare_signature_layer, signature_image)
+    except ConcurrencyLimitExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="伺服器忙碌中，請稍後重試",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except Exception as e:
+        logger.warning("Invalid signature image for document %s: %s", document["_id"], e)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="簽名圖像格式錯誤"
+        )
+    
+    now = datetime.utcnow()
+    layer = {
+        "document_id": document["_id"],
+        "order": order,
+        "username": username,
+        "image": image,
+        "name": signature_data.get("name", username),
+        "timestamp": signature_data.get("timestamp", now.strftime("%Y-%m-%d %H:%M:%S")),
+        "field": signers[order].get("field") or {},
+        "created_at": now
+    }
+    layer_id = (await db.signature_layers.insert_one(layer)).inserted_id
+    
+    update = {
+        f"signers.{order}.status": "signed",
+        f"signers.{order}.signed_at": now,
+        f"signers.{order}.layer_id": layer_id,
+        "next_signer": None if is_last else signers[order + 1]["username"],
+        "updated_at": now
+    }
+    
+    signed_file_path = None
+    if is_last:
+        # 所有簽名到齊：讀取先前的圖層並一次合成；檔案路徑包含圖層 ID，重複請求不會互相覆寫
+        layer_ids = [signer["layer_id"] for signer in signers[:order]]
+        layers = {item["_id"]: item async for item in db.signature_layers.find({"_id": {"$in": layer_ids}})}
+        all_layers = [layers[layer_id] for layer_id in layer_ids if layer_id in layers] + [layer]
+        
+        os.makedirs(settings.signed_doc_path, exist_ok=True)
+        signed_file_path = os.path.join(settings.signed_doc_path, f"{document['_id']}-{layer_id}.pdf")
+        success = False
+        try:
+            success = await signing_executor.run(
+                apply_signature_layers,
+                original_pdf_path=document["file_path"],
+                layers=all_layers,
+                output_path=signed_file_path,
+                progress_callback=progress_callback
+            )
+        except ConcurrencyLimitExceeded as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="伺服器忙碌中，請稍後重試",
+                headers={"Retry-After": str(e.retry_after)}
+            )
+        finally:
+            # 合成失敗、發生例外或請求被取消時，移除剛建立的圖層及可能寫到一半的檔案
+            if not success:
+                await db.signature_layers.delete_one({"_id": layer_id})
+                with suppress(OSError):
+                    os.remove(signed_file_path)
+        if not success:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="PDF 簽名處理失敗"
+            )
+        
+        update.update({
+            "status": "signed",
+            "signed_by": username,
+            "signed_at": now,
+            "signed_filename": f"signed-{document['original_filename']}",
+            "signed_file_path": signed_file_path
+        })
+    
+    result = await db.documents.update_one(
+        {"_id": document["_id"], "status": "uploaded", "signed_count": order},
+        {"$set": update, "$inc": {"signed_count": 1}}
+    )
+    if not result.matched_count:
+        # 其他請求已先完成這個順序的簽署
+        await db.signature_layers.delete_one({"_id": layer_id})
+        if signed_file_path:
+            with suppress(OSError):
+                os.remove(signed_file_path)
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="文件狀態已變更，請重新整理後再試"
+        )
+    
+    logger.info("Document %s signed by %s (%s/%s)", document["_id"], username, order + 1, len(signers))
+    new_document = await db.documents.find_one({"_id": document["_id"]})
+    
+    # 通知上傳者，並通知下一位簽署者輪到他簽署
+    await record_document_event(
+        "signed", {**new_document, "signed_by": username},
+        actor=username, recipients=[new_document["uploaded_by"]]
+    )
+    if new_document.get("next_signer"):
+        await record_document_event(
+            "awaiting_signature", new_document,
+            actor=username, recipients=[new_document["next_signer"]]
+        )
+    
+    return new_document
@@ -0,0 +1,140 @@
+import json
+import logging
+import os
+import secrets
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from typing import Any, List, Optional, Tuple
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 已設定 OpenTelemetry 收集器時使用 OTel tracer，否則將 span 以 JSON lines 寫入檔案
+_otel_tracer = None
+_span_logger: Optional[logging.Logger] = None
+
+# 目前的 span（建立父子關係）及本次請求收集的 Server-Timing 項目
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+_server_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("server_timings", default=None)
+
+class Span:
+    """與 OpenTelemetry span 欄位相容的簡易 span"""
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: dict):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes)
+        self.status = "OK"
+        self.start_time = time.time()
+        self.duration = 0.0
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_exception(self, exception: BaseException):
+        self.status = "ERROR"
+        self.attributes["exception.type"] = type(exception).__name__
+        self.attributes["exception.message"] = str(exception)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration_ms": round(self.duration * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+            "service": settings.app_name,
+            "pid": os.getpid()
+        }
+
+def configure_tracing():
+    """依設定選擇 span 匯出方式（啟動時呼叫一次）"""
+    global _otel_tracer, _span_logger
+
+    if settings.tracing_otlp_endpoint:
+        try:
+            from opentelemetry import trace
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+            provider = TracerProvider(resource=Resource.create({"service.name": settings.app_name}))
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=settings.tracing_otlp_endpoint)))
+            trace.set_tracer_provider(provider)
+            _otel_tracer = trace.get_tracer("esigned")
+            logger.info(f"追蹤資料匯出至 OpenTelemetry 收集器: {settings.tracing_otlp_endpoint}")
+            return
+        except ImportError:
+            logger.warning("未安裝 opentelemetry-sdk，改為寫入 JSON lines 檔案")
+
+    if settings.tracing_jsonl_path:
+        # 每個 worker 程序寫入並輪替自己的檔案，RotatingFileHandler 無法在多個程序間安全輪替同一個檔案
+        root, ext = os.path.splitext(settings.tracing_jsonl_path)
+        handler = RotatingFileHandler(
+            f"{root}.{os.getpid()}{ext}",
+            maxBytes=settings.tracing_jsonl_max_bytes,
+            backupCount=3,
+            encoding="utf-8"
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        _span_logger = logging.getLogger("esigned.traces")
+        _span_logger.handlers = [handler]
+        _span_logger.setLevel(logging.INFO)
+        _span_logger.propagate = False
+
+def _record_server_timing(name: str, duration: float):
+    timings = _server_timings.get()
+    if timings is not None:
+        timings.append((name, duration))
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    建立追蹤 span
+
+    用法:
+        with span("pdf.load", file_size=size) as s:
+            ...
+            s.set_attribute("page_count", pages)
+    """
+    start = time.perf_counter()
+
+    if _otel_tracer is not None:
+        with _otel_tracer.start_as_current_span(name, attributes=attributes) as otel_span:
+            try:
+                yield otel_span
+            finally:
+                _record_server_timing(name, time.perf_counter() - start)
+        return
+
+    current = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_exception(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.duration = time.perf_counter() - start
+        _record_server_timing(name, current.duration)
+        if _span_logger is not None:
+            _span_logger.info(json.dumps(current.to_dict(), ensure_ascii=False, default=str))
+
+def start_server_timing() -> List[Tuple[str, float]]:
+    """開始收集本次請求的 span 耗時，用於 Server-Timing 回應標頭"""
+    timings: List[Tuple[str, float]] = []
+    _server_timings.set(timings)
+    return timings
+
+def format_server_timing(timings: List[Tuple[str, float]]) -> str:
+    """格式化為 Server-Timing 標頭，例如 pdf.load;dur=12.3"""
+    return ", ".join(f"{name};dur={duration * 1000:.1f}" for name, duration in timings)
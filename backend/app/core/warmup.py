@@ -0,0 +1,76 @@
+import base64
+import os
+import tempfile
+import time
+from io import BytesIO
+from typing import Optional
+from fastapi.concurrency import run_in_threadpool
+from PIL import Image
+from reportlab.pdfgen import canvas
+from app.utils.pdf_utils import add_signature_to_pdf, extract_pdf_text
+import logging
+
+logger = logging.getLogger(__name__)
+
+class WarmupState:
+    """啟動預熱的結果（未啟用預熱時 completed 為 False）"""
+
+    def __init__(self):
+        self.completed = False
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def stats(self) -> dict:
+        return {
+            "completed": self.completed,
+            "duration_ms": round(self.duration * 1000, 1) if self.duration is not None else None,
+            "error": self.error
+        }
+
+warmup_state = WarmupState()
+
+def _build_sample_pdf() -> bytes:
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=(200, 200))
+    c.setFont("Helvetica", 10)
+    c.drawString(20, 100, "warm-up")
+    c.save()
+    return buffer.getvalue()
+
+def _build_sample_signature() -> str:
+    buffer = BytesIO()
+    Image.new("RGBA", (40, 20), (0, 0, 0, 255)).save(buffer, "PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+def sign_sample_pdf():
+    """簽署一份很小的 PDF，完成 PyPDF2、reportlab、Pillow 的首次載入與初始化"""
+    with tempfile.TemporaryDirectory(prefix="esigned-warmup-") as directory:
+        input_path = os.path.join(directory, "sample.pdf")
+        output_path = os.path.join(directory, "signed.pdf")
+        with open(input_path, "wb") as f:
+            f.write(_build_sample_pdf())
+
+        if not add_signature_to_pdf(
+            original_pdf_path=input_path,
+            signature_image_data=_build_sample_signature(),
+            signature_info={"name": "warm-up", "timestamp": "warm-up"},
+            output_path=output_path
+        ):
+            raise RuntimeError("簽署範例 PDF 失敗")
+        extract_pdf_text(output_path)
+
+async def warm_up():
+    """
+    啟動預熱：在接受請求前先簽署一份範例 PDF
+
+    預熱失敗只記錄警告，不阻止服務啟動
+    """
+    start = time.perf_counter()
+    try:
+        await run_in_threadpool(sign_sample_pdf)
+    except Exception as e:
+        warmup_state.error = str(e)
+        logger.warning(f"啟動預熱失敗: {e}")
+    warmup_state.duration = time.perf_counter() - start
+    warmup_state.completed = True
+    logger.info(f"啟動預熱完成，耗時 {warmup_state.duration * 1000:.0f} ms")
@@ -1,4 +1,6 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.metrics import MongoCommandMetrics
+from pymongo import ASCENDING, DESCENDING, TEXT
 from app.core.config import settings
 import logging
 
@@ -16,13 +18,15 @@ async def get_database():
 async def connect_to_mongo():
     """連接到 MongoDB"""
     try:
-        db.client = AsyncIOMotorClient(settings.mongodb_url)
+        db.client = AsyncIOMotorClient(settings.mongodb_url, event_listeners=[MongoCommandMetrics()])
         db.database = db.client.esigned
         
         # 測試連接
         await db.client.admin.command('ping')
         logger.info("成功連接到 MongoDB")
         
+        await create_indexes()
+        
     except Exception as e:
         logger.error(f"無法連接到 MongoDB: {e}")
         raise e
@@ -32,3 +36,52 @@ async def close_mongo_connection():
     if db.client:
         db.client.close()
         logger.info("已關閉 MongoDB 連接")
+
+async def create_indexes():
+    """建立應用程式所需的索引（已存在時不會重建）"""
+    database = db.database
+    index_specs = [
+        # 全文檢索：檔名權重較高，內容文字由上傳後的背景任務擷取
+        (
+            database.documents,
+            [("original_filename", TEXT), ("content_text", TEXT)],
+            {
+                "name": "documents_text_search",
+                "weights": {"original_filename": 10, "content_text": 1},
+                "default_language": "none",
+            },
+        ),
+        # 前綴搜尋：以錨定的正規表示式查詢多鍵索引
+        (database.documents, [("search_tokens", ASCENDING)], {}),
+        (database.documents, [("status", ASCENDING), ("created_at", DESCENDING)], {}),
+        (database.documents, [("signed_by", ASCENDING), ("created_at", DESCENDING)], {}),
+        # 多人簽署文件：依簽署者及目前輪到的簽署者查詢；簽名圖層依文件取出
+        (database.documents, [("signers.username", ASCENDING)], {"sparse": True}),
+        (database.documents, [("next_signer", ASCENDING)], {"sparse": True}),
+        (database.signature_layers, [("document_id", ASCENDING), ("order", ASCENDING)], {}),
+        # 令牌撤銷清單：過期後由 MongoDB 自動刪除
+        (database.revoked_tokens, [("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+        # 刷新令牌：以雜湊值查詢，過期後自動刪除
+        (database.refresh_tokens, [("token_hash", ASCENDING)], {"unique": True}),
+        (database.refresh_tokens, [("family_id", ASCENDING)], {}),
+        (database.refresh_tokens, [("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+        # 共用頻率限制的令牌桶
+        (database.rate_limits, [("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+        # 郵件發送佇列：依狀態取得待發送郵件，已發送郵件過了保留期限後自動刪除
+        (database.email_outbox, [("status", ASCENDING), ("next_attempt_at", ASCENDING)], {}),
+        (database.email_outbox, [("purge_at", ASCENDING)], {"expireAfterSeconds": 0}),
+        # 簽署工作：依狀態取得待執行工作，已完成工作過了保留期限後自動刪除
+        (database.sign_jobs, [("status", ASCENDING), ("available_at", ASCENDING)], {}),
+        (database.sign_jobs, [("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+        # 通知事件：依批次取出，處理後保留一段時間再刪除
+        (database.notification_events, [("processed_at", ASCENDING), ("batch_id", ASCENDING)], {}),
+        (database.notification_events, [("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+        # 文件刪除通知：各 worker 的 change stream 讀取後即可刪除
+        (database.document_deletions, [("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+    ]
+    
+    for collection, keys, options in index_specs:
+        try:
+            await collection.create_index(keys, **options)
+        except Exception as e:
+            logger.warning(f"建立索引 {keys} 失敗: {e}")
@@ -1,17 +1,38 @@
 from fastapi import FastAPI, HTTPException, Depends, status, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.exceptions import RequestValidationError
 from pydantic import ValidationError
 from contextlib import asynccontextmanager
 import uvicorn
+import asyncio
 import os
 import logging
 from motor.motor_asyncio import AsyncIOMotorClient
 from app.database import get_database, connect_to_mongo
-from app.routers import auth, documents, users
+from app.routers import admin, auth, documents, jobs, users
 from app.core.config import settings
+from app.core.search import backfill_search_index
+from app.core.events import document_events
+from app.core.cache import user_cache_invalidator
+from app.core.revocation import token_revocations
+from app.core.security import password_executor
+from app.core.rate_limit import rate_limiter
+from app.core.outbox import email_outbox
+from app.core.email import close_smtp_pools, smtp_pools
+from app.core.email_templates import load_email_templates
+from app.core.notifications import notification_coalescer
+from app.core.warmup import warm_up
+from app.core.signing import signing_executor
+from app.core.sign_jobs import sign_jobs
+from app.core.admission import admission_stats
+from app.core.health import database_status, readiness
+from app.core.tracing import configure_tracing
+from app.core.responses import ORJSONResponse
+from app.core.error_logging import log_validation_error, sanitize_errors
+from app.core.logging_config import RequestIdMiddleware, configure_logging
+from app.core.metrics import MetricsMiddleware, METRICS_CONTENT_TYPE, generate_metrics
 
 logger = logging.getLogger(__name__)
 
@@ -22,10 +43,40 @@ database = None
 async def lifespan(app: FastAPI):
     # 啟動時執行
     global database
+    configure_logging()
+    configure_tracing()
     await connect_to_mongo()
     database = await get_database()
+    # 背景補建既有文件的搜尋索引
+    backfill_task = asyncio.create_task(backfill_search_index())
+    # 每個 worker 共用一個文件變更事件串流
+    document_events.start()
+    # 其他 worker 修改用戶資料時使本 worker 的用戶快取失效
+    user_cache_invalidator.start()
+    # 載入令牌撤銷清單並定期更新
+    await token_revocations.start()
+    # 預先編譯郵件模板，並背景發送佇列中的郵件
+    load_email_templates()
+    email_outbox.start()
+    # 背景執行非同步簽署工作（包含其他 worker 中斷後留下的工作）
+    sign_jobs.start()
+    # 定期將文件事件彙整為通知摘要
+    notification_coalescer.start()
+    # 預熱 PDF 處理模組，完成後才開始接受請求，避免第一個簽署請求的延遲
+    if settings.warmup_enabled:
+        await warm_up()
     yield
     # 關閉時執行
+    backfill_task.cancel()
+    await notification_coalescer.stop()
+    await email_outbox.stop()
+    await sign_jobs.stop()
+    await close_smtp_pools()
+    await document_events.stop()
+    await user_cache_invalidator.stop()
+    await token_revocations.stop()
+    password_executor.shutdown()
+    signing_executor.shutdown()
     if database:
         database.client.close()
 
@@ -33,6 +84,7 @@ app = FastAPI(
     title="eSignedOnline API",
     description="電子檔簽署系統 API",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -52,30 +104,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 請求數及處理時間指標
+app.add_middleware(MetricsMiddleware)
+
+# 請求 ID（最外層，其他中介軟體及處理程序的日誌都帶有請求 ID）
+app.add_middleware(RequestIdMiddleware)
+
 # 安全設定
 security = HTTPBearer()
 
 # 異常處理器
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    logger.error(f"驗證錯誤在 {request.method} {request.url}: {exc.errors()}")
-    logger.error(f"請求體: {await request.body()}")
+    # 使用 FastAPI 已解析的請求體，不重新讀取（大型上傳不會被載入記憶體或寫入日誌）
+    errors = sanitize_errors(exc.errors())
+    log_validation_error(request, errors, body=exc.body)
     return JSONResponse(
         status_code=422,
         content={
             "detail": "請求資料驗證失敗",
-            "errors": exc.errors()
+            "errors": errors
         }
     )
 
 @app.exception_handler(ValidationError)
 async def pydantic_validation_exception_handler(request: Request, exc: ValidationError):
-    logger.error(f"Pydantic 驗證錯誤在 {request.method} {request.url}: {exc.errors()}")
+    errors = sanitize_errors(exc.errors())
+    log_validation_error(request, errors, kind="model")
     return JSONResponse(
         status_code=422,
         content={
             "detail": "資料驗證失敗",
-            "errors": exc.errors()
+            "errors": errors
         }
     )
 
@@ -83,6 +143,8 @@ async def pydantic_validation_exception_handler(request: Request, exc: Validatio
 app.include_router(auth.router, prefix="/api/auth", tags=["認證"])
 app.include_router(users.router, prefix="/api/users", tags=["使用者"])
 app.include_router(documents.router, prefix="/api/documents", tags=["文件"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["簽署工作"])
+app.include_router(admin.router, prefix="/api/admin", tags=["管理"])
 
 @app.get("/")
 async def root():
@@ -90,7 +152,42 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "database": "connected"}
+    database_check = await database_status()
+    return {
+        "status": "healthy" if database_check["status"] == "ok" else "degraded",
+        "database": database_check,
+        "executors": {
+            "password_hash": password_executor.stats(),
+            "pdf_sign": signing_executor.stats()
+        },
+        "admission": admission_stats(),
+        "rate_limit": rate_limiter.stats(),
+        "smtp": {pool.name: pool.stats() for pool in smtp_pools}
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus 指標（多 worker 時匯總所有 worker）"""
+    return Response(generate_metrics(), headers={"Content-Type": METRICS_CONTENT_TYPE})
+
+@app.get("/health/live")
+async def liveness_check():
+    """存活檢查：只確認程序及事件迴圈可回應，不檢查外部依賴（依賴異常時不應重啟容器）"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """
+    就緒檢查：MongoDB、磁碟空間、簽署執行緒池、郵件佇列均在門檻內才接受流量
+
+    啟動預熱在 lifespan 中完成後 worker 才開始處理請求，結果中的 warmup 只供參考
+
+    門檻請參考 app/core/config.py 中的 health_* 設定
+    """
+    ready, result = await readiness()
+    if not ready:
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=result)
+    return result
 
 if __name__ == "__main__":
     # 檢查是否有 SSL 證書
@@ -105,7 +202,7 @@ if __name__ == "__main__":
             port=7443,
             ssl_keyfile=ssl_keyfile,
             ssl_certfile=ssl_certfile,
-            reload=True
+            reload=settings.server_reload
         )
     else:
         # 使用 HTTP
@@ -113,5 +210,5 @@ if __name__ == "__main__":
             "main:app",
             host="0.0.0.0",
             port=7443,
-            reload=True
+            reload=settings.server_reload
         )
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Optional, List
 from datetime import datetime
 from enum import Enum
 
@@ -7,6 +7,20 @@ class DocumentStatus(str, Enum):
     UPLOADED = "uploaded"
     SIGNED = "signed"
 
+class SignatureField(BaseModel):
+    """簽名欄位位置（PDF 座標，單位為點，原點在左下角）"""
+    page: int = -1                  # 頁碼從 0 開始，負數由最後一頁倒數
+    x: Optional[float] = None       # 未指定時依簽署順序排列在頁面右下角
+    y: Optional[float] = None
+    width: float = Field(200, gt=0)
+    height: float = Field(80, gt=0)
+
+class DocumentSigner(BaseModel):
+    username: str
+    field: SignatureField = SignatureField()
+    status: str = "pending"         # pending / signed
+    signed_at: Optional[datetime] = None
+
 class DocumentBase(BaseModel):
     filename: str
     original_filename: str
@@ -29,6 +43,8 @@ class DocumentInDB(DocumentBase):
     signed_filename: Optional[str] = None
     signed_file_path: Optional[str] = None
     signature_data: Optional[str] = None
+    signers: Optional[List[DocumentSigner]] = None
+    next_signer: Optional[str] = None
     created_at: datetime
     updated_at: datetime
 
@@ -37,5 +53,33 @@ class Document(DocumentBase):
     uploaded_by: str
     signed_by: Optional[str] = None
     signed_filename: Optional[str] = None
+    signers: Optional[List[DocumentSigner]] = None  # 多人簽署文件的簽署者（依簽署順序）
+    next_signer: Optional[str] = None
     created_at: datetime
     updated_at: datetime
+
+# 列表回應只讀取 Document 模型的欄位（不載入搜尋索引、簽名圖片等大型欄位）
+DOCUMENT_LIST_PROJECTION = {
+    "filename": 1,
+    "original_filename": 1,
+    "file_path": 1,
+    "file_size": 1,
+    "status": 1,
+    "uploaded_by": 1,
+    "signed_by": 1,
+    "signed_filename": 1,
+    "signers.username": 1,
+    "signers.field": 1,
+    "signers.status": 1,
+    "signers.signed_at": 1,
+    "next_signer": 1,
+    "created_at": 1,
+    "updated_at": 1
+}
+
+class DocumentSearchResult(BaseModel):
+    items: List[Document]
+    has_more: bool
+    total: Optional[int] = None  # 只有 include_total=true 時才計算
+    page: int
+    page_size: int
@@ -94,6 +94,12 @@ class User(UserBase):
     created_at: datetime
     updated_at: datetime
 
+class UserProfileUpdated(User):
+    """更新自己的資料後的回應；用戶名或密碼變更時舊令牌失效，附上新令牌"""
+    access_token: Optional[str] = None
+    token_type: Optional[str] = None
+    refresh_token: Optional[str] = None
+
 class UserLogin(BaseModel):
     username: str
     password: str
@@ -101,6 +107,21 @@ class UserLogin(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class TokenRefresh(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     username: Optional[str] = None
+    user_id: Optional[str] = None
+    role: Optional[str] = None
+    is_active: Optional[bool] = None
+    version: Optional[int] = None
+    jti: Optional[str] = None
+    expires_at: Optional[datetime] = None
+    
+    @property
+    def has_claims(self) -> bool:
+        """令牌是否包含授權所需的聲明（舊版令牌只有 sub）"""
+        return self.user_id is not None and self.role is not None and self.is_active is not None
@@ -0,0 +1,70 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import Optional
+from app.core.security import get_authorized_admin
+from app.core.outbox import email_outbox
+from app.database import get_database
+from bson import ObjectId
+from datetime import datetime
+
+router = APIRouter()
+
+def _serialize_outbox_message(message: dict) -> dict:
+    """郵件佇列項目（不回傳包含啟用碼或重設令牌的 payload）"""
+    return {
+        "id": str(message["_id"]),
+        "kind": message["kind"],
+        "to": message["to"],
+        "language": message.get("language"),
+        "status": message["status"],
+        "attempts": message.get("attempts", 0),
+        "last_error": message.get("last_error"),
+        "next_attempt_at": message.get("next_attempt_at"),
+        "sent_at": message.get("sent_at"),
+        "created_at": message["created_at"],
+        "updated_at": message["updated_at"]
+    }
+
+@router.get("/email-outbox/stats")
+async def get_email_outbox_stats(current_user = Depends(get_authorized_admin)):
+    """郵件發送佇列各狀態數量（僅管理員）"""
+    return await email_outbox.stats()
+
+@router.get("/email-outbox")
+async def get_email_outbox(
+    status_filter: Optional[str] = Query("dead", alias="status"),
+    limit: int = Query(50, ge=1, le=200),
+    current_user = Depends(get_authorized_admin)
+):
+    """列出郵件發送佇列，預設為發送失敗的郵件（僅管理員）"""
+    db = await get_database()
+
+    query = {"status": status_filter} if status_filter else {}
+    messages = []
+    async for message in db.email_outbox.find(query, {"payload": 0}).sort("updated_at", -1).limit(limit):
+        messages.append(_serialize_outbox_message(message))
+
+    return messages
+
+@router.post("/email-outbox/{message_id}/retry")
+async def retry_email(message_id: str, current_user = Depends(get_authorized_admin)):
+    """重新發送發送失敗的郵件（僅管理員）"""
+    if not ObjectId.is_valid(message_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="郵件不存在"
+        )
+
+    db = await get_database()
+    now = datetime.utcnow()
+    result = await db.email_outbox.update_one(
+        {"_id": ObjectId(message_id), "status": "dead"},
+        {"$set": {"status": "pending", "attempts": 0, "next_attempt_at": now, "updated_at": now}}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="郵件不存在或不是發送失敗狀態"
+        )
+
+    email_outbox.notify()
+    return {"message": "郵件已重新加入發送佇列"}
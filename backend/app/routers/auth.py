@@ -1,25 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import HTTPBearer, OAuth2PasswordRequestForm
+from fastapi import APIRouter, Depends, HTTPException, status, Body, BackgroundTasks
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials, OAuth2PasswordRequestForm
 from datetime import datetime, timedelta
-from app.models.user import UserCreate, UserLogin, Token, User
+from app.models.user import UserCreate, UserLogin, Token, TokenRefresh, User
 from app.core.security import (
-    verify_password, 
-    get_password_hash, 
-    create_access_token,
+    verify_password_async,
+    get_password_hash_async,
+    password_needs_update,
+    create_user_access_token,
+    verify_token,
     generate_activation_code,
-    get_current_active_user
+    get_current_user,
+    get_current_active_user,
+    get_user_by_username
 )
-from app.core.email import send_activation_email
+from app.core.cache import invalidate_user
+from app.core.revocation import token_revocations
+from app.core.rate_limit import rate_limit
+from app.core.refresh_tokens import (
+    InvalidRefreshToken,
+    issue_refresh_token,
+    rotate_refresh_token,
+    revoke_refresh_token
+)
+from app.core.outbox import enqueue_email
 from app.core.config import settings
 from app.database import get_database
 from bson import ObjectId
+from typing import Optional
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 security = HTTPBearer()
+# 登出時訪問令牌可能已過期，不強制要求
+optional_security = HTTPBearer(auto_error=False)
 
-@router.post("/register", response_model=dict)
+@router.post("/register", response_model=dict, dependencies=[Depends(rate_limit("register", "username"))])
 async def register(user_data: UserCreate):
     """用戶註冊"""
     try:
@@ -53,7 +69,7 @@ async def register(user_data: UserCreate):
             "email": user_data.email,
             "full_name": user_data.full_name,
             "role": user_data.role,
-            "password": get_password_hash(user_data.password),
+            "password": await get_password_hash_async(user_data.password),
             "is_active": False,
             "activation_code": activation_code,
             "created_at": datetime.utcnow(),
@@ -63,12 +79,9 @@ async def register(user_data: UserCreate):
         result = await db.users.insert_one(user_doc)
         logger.info(f"用戶 {user_data.username} 創建成功，ID: {result.inserted_id}")
         
-        # 發送啟用郵件
-        email_sent = await send_activation_email(user_data.email, activation_code)
-        if email_sent:
-            logger.info(f"啟用郵件已發送到 {user_data.email}")
-        else:
-            logger.warning(f"啟用郵件發送失敗，但用戶已創建。啟用碼: {activation_code}")
+        # 啟用郵件由背景工作者發送
+        await enqueue_email("activation", user_data.email, {"activation_code": activation_code})
+        logger.info(f"啟用郵件已加入發送佇列: {user_data.email}")
         
         return {
             "message": "註冊成功，請檢查您的郵箱以獲取啟用碼",
@@ -121,11 +134,15 @@ async def activate_account(activation_data: dict):
             }
         }
     )
+    invalidate_user(username=user["username"])
     
     return {"message": "帳號啟用成功"}
 
-@router.post("/login", response_model=Token)
-async def login(user_credentials: OAuth2PasswordRequestForm = Depends()):
+@router.post("/login", response_model=Token, dependencies=[Depends(rate_limit("login", "username"))])
+async def login(
+    background_tasks: BackgroundTasks,
+    user_credentials: OAuth2PasswordRequestForm = Depends()
+):
     """用戶登入"""
     db = await get_database()
     
@@ -138,7 +155,7 @@ async def login(user_credentials: OAuth2PasswordRequestForm = Depends()):
         )
     
     # 驗證密碼
-    if not verify_password(user_credentials.password, user["password"]):
+    if not await verify_password_async(user_credentials.password, user["password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用戶名或密碼錯誤"
@@ -151,32 +168,108 @@ async def login(user_credentials: OAuth2PasswordRequestForm = Depends()):
             detail="帳號未啟用，請先啟用您的帳號"
         )
     
+    # 密碼雜湊成本與目前設定不同時，回應後於背景重新雜湊
+    if password_needs_update(user["password"]):
+        background_tasks.add_task(rehash_password, user["_id"], user["password"], user_credentials.password)
+    
     # 創建訪問令牌
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
-    access_token = create_access_token(
-        data={"sub": user["username"]}, 
-        expires_delta=access_token_expires
-    )
+    access_token = create_user_access_token(user, expires_delta=access_token_expires)
+    refresh_token = await issue_refresh_token(user)
     
     return {
         "access_token": access_token,
-        "token_type": "bearer"
+        "token_type": "bearer",
+        "refresh_token": refresh_token
     }
 
-async def get_current_user(credentials = Depends(security)):
-    """獲取當前用戶（用於依賴注入）"""
-    from app.core.security import verify_token
-    token = credentials.credentials
-    token_data = verify_token(token)
+async def rehash_password(user_id, old_hash: str, password: str):
+    """以目前的 bcrypt 成本重新雜湊密碼"""
+    try:
+        new_hash = await get_password_hash_async(password)
+        db = await get_database()
+        # 只在密碼未被修改時更新
+        result = await db.users.update_one(
+            {"_id": user_id, "password": old_hash},
+            {"$set": {"password": new_hash}}
+        )
+        if result.modified_count:
+            invalidate_user(user_id=user_id)
+            logger.info(f"已以 bcrypt 成本 {settings.bcrypt_rounds} 重新雜湊用戶 {user_id} 的密碼")
+    except Exception as e:
+        logger.warning(f"重新雜湊密碼失敗: {e}")
+
+@router.post("/refresh", response_model=Token)
+async def refresh_access_token(refresh_data: TokenRefresh):
+    """使用刷新令牌取得新的訪問令牌（刷新令牌同時輪替）"""
+    invalid_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="刷新令牌無效或已過期"
+    )
     
-    db = await get_database()
-    user = await db.users.find_one({"username": token_data.username})
-    if user is None:
+    try:
+        record = await rotate_refresh_token(refresh_data.refresh_token)
+    except InvalidRefreshToken:
+        raise invalid_exception
+    
+    user = await get_user_by_username(record["username"])
+    if user is None or str(user["_id"]) != record["user_id"]:
+        raise invalid_exception
+    
+    # 修改密碼或權限變更後，舊的登入階段失效
+    if user.get("token_version", 0) > record.get("token_version", 0):
+        raise invalid_exception
+    
+    if not user.get("is_active", False):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="帳號未啟用，請先啟用您的帳號"
+        )
+    
+    return {
+        "access_token": create_user_access_token(user),
+        "token_type": "bearer",
+        "refresh_token": await issue_refresh_token(
+            user,
+            family_id=record["family_id"],
+            family_expires_at=record["family_expires_at"]
+        )
+    }
+
+@router.post("/logout", response_model=dict)
+async def logout(
+    logout_data: dict = Body(default={}),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+):
+    """
+    登出 - 撤銷當前令牌及刷新令牌
+
+    訪問令牌過期或缺少時仍撤銷請求中的刷新令牌，避免登入階段在登出後繼續有效
+    """
+    # 先撤銷刷新令牌：持有刷新令牌即可結束該登入階段，不需要有效的訪問令牌
+    refresh_token = logout_data.get("refresh_token")
+    if refresh_token:
+        await revoke_refresh_token(refresh_token)
+    
+    token_data = None
+    if credentials is not None:
+        try:
+            token_data = verify_token(credentials.credentials)
+        except HTTPException:
+            # 訪問令牌已過期或無效，本身已無法使用
+            pass
+    
+    if token_data is not None and token_data.jti and token_data.expires_at:
+        await token_revocations.revoke_token(token_data.jti, token_data.expires_at)
+    
+    if token_data is None and not refresh_token:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="用戶不存在"
+            detail="無法驗證憑證",
+            headers={"WWW-Authenticate": "Bearer"}
         )
-    return user
+    
+    return {"message": "已登出"}
 
 @router.get("/me", response_model=User)
 async def get_current_user_info(current_user = Depends(get_current_user)):
@@ -197,7 +290,12 @@ async def change_password(
     password_data: dict,
     current_user = Depends(get_current_active_user)
 ):
-    """修改密碼"""
+    """
+    修改密碼
+
+    所有已發出的訪問令牌及刷新令牌隨即失效，用戶端必須以回應中的
+    access_token、refresh_token 取代儲存的令牌
+    """
     try:
         old_password = password_data.get("old_password")
         new_password = password_data.get("new_password")
@@ -209,7 +307,7 @@ async def change_password(
             )
         
         # 驗證舊密碼
-        if not verify_password(old_password, current_user["password"]):
+        if not await verify_password_async(old_password, current_user["password"]):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="舊密碼錯誤"
@@ -228,14 +326,25 @@ async def change_password(
             {"_id": current_user["_id"]},
             {
                 "$set": {
-                    "password": get_password_hash(new_password),
+                    "password": await get_password_hash_async(new_password),
                     "updated_at": datetime.utcnow()
                 }
             }
         )
+        invalidate_user(username=current_user["username"])
+        
+        # 使其他已發出的令牌失效，並為當前用戶發出新令牌
+        current_user["token_version"] = await token_revocations.bump_user_version(current_user["_id"])
+        access_token = create_user_access_token(current_user)
+        refresh_token = await issue_refresh_token(current_user)
         
         logger.info(f"用戶 {current_user['username']} 成功修改密碼")
-        return {"message": "密碼修改成功"}
+        return {
+            "message": "密碼修改成功",
+            "access_token": access_token,
+            "token_type": "bearer",
+            "refresh_token": refresh_token
+        }
         
     except HTTPException:
         raise
@@ -246,7 +355,7 @@ async def change_password(
             detail="修改密碼時發生錯誤"
         )
 
-@router.post("/forgot-password", response_model=dict)
+@router.post("/forgot-password", response_model=dict, dependencies=[Depends(rate_limit("forgot_password", "email"))])
 async def forgot_password(request_data: dict):
     """忘記密碼 - 發送重設密碼郵件"""
     try:
@@ -281,14 +390,9 @@ async def forgot_password(request_data: dict):
             }
         )
         
-        # 發送重設密碼郵件
-        from app.core.email import send_password_reset_email
-        email_sent = await send_password_reset_email(user["email"], reset_token)
-        
-        if email_sent:
-            logger.info(f"重設密碼郵件已發送到 {email}")
-        else:
-            logger.warning(f"重設密碼郵件發送失敗到 {email}, 重設令牌: {reset_token}")
+        # 重設密碼郵件由背景工作者發送
+        await enqueue_email("password_reset", user["email"], {"reset_token": reset_token})
+        logger.info(f"重設密碼郵件已加入發送佇列: {email}")
         
         return {"message": "如果該郵箱地址存在於系統中，重設密碼連結已發送"}
         
@@ -301,7 +405,7 @@ async def forgot_password(request_data: dict):
             detail="處理請求時發生錯誤"
         )
 
-@router.post("/reset-password", response_model=dict)
+@router.post("/reset-password", response_model=dict, dependencies=[Depends(rate_limit("reset_password"))])
 async def reset_password(reset_data: dict):
     """重設密碼"""
     try:
@@ -338,7 +442,7 @@ async def reset_password(reset_data: dict):
             {"_id": user["_id"]},
             {
                 "$set": {
-                    "password": get_password_hash(new_password),
+                    "password": await get_password_hash_async(new_password),
                     "updated_at": datetime.utcnow()
                 },
                 "$unset": {
@@ -347,6 +451,8 @@ async def reset_password(reset_data: dict):
                 }
             }
         )
+        invalidate_user(username=user["username"])
+        await token_revocations.bump_user_version(user["_id"])
         
         logger.info(f"用戶 {user['username']} 成功重設密碼")
         return {"message": "密碼重設成功"}
@@ -1,26 +1,135 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from fastapi.responses import FileResponse
-from app.models.document import Document, DocumentCreate, DocumentSign
-from app.core.security import get_current_active_user, get_admin_user
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, BackgroundTasks, Query, Request
+from fastapi.responses import FileResponse, StreamingResponse, Response
+from app.models.document import Document, DocumentCreate, DocumentSign, DocumentSigner, DocumentStatus, DocumentSearchResult, DOCUMENT_LIST_PROJECTION
+from app.core.security import get_authorized_user, get_authorized_admin, get_user_from_token, can_view_document, is_document_signer
+from app.core.search import build_search_tokens, build_prefix_query, index_document_text
+from app.core.events import document_events, format_sse, record_document_deletion
+from app.core.notifications import record_document_event, AUDIENCE_USERS
 from app.database import get_database
 from app.core.config import settings
+from app.core.signing import get_signable_document, sign_document_as
+from app.core.sign_jobs import sign_jobs
+from app.core.admission import admission
+from app.core.tracing import start_server_timing, format_server_timing
+from app.core.responses import ORJSONResponse
 from bson import ObjectId
+from pydantic import TypeAdapter, ValidationError
 from datetime import datetime
+import asyncio
+import json
 import os
-import shutil
 import uuid
-from typing import List
+from typing import List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-@router.post("/upload", response_model=Document)
+_signers_adapter = TypeAdapter(List[DocumentSigner])
+
+def document_list_item(doc: dict) -> dict:
+    """將投影後的文件轉為列表項目（欄位與 Document 模型相同，不再逐筆驗證）"""
+    return {
+        "id": str(doc["_id"]),
+        "filename": doc["filename"],
+        "original_filename": doc["original_filename"],
+        "file_path": doc["file_path"],
+        "file_size": doc["file_size"],
+        "status": doc["status"],
+        "uploaded_by": doc["uploaded_by"],
+        "signed_by": doc.get("signed_by"),
+        "signed_filename": doc.get("signed_filename"),
+        "signers": doc.get("signers"),
+        "next_signer": doc.get("next_signer"),
+        "created_at": doc["created_at"],
+        "updated_at": doc["updated_at"]
+    }
+
+def signed_by_user_query(username: str) -> dict:
+    """用戶簽署過的文件（單人簽署的已簽署記錄或參與簽署的多人簽署文件）"""
+    return {"$or": [{"signed_by": username}, {"signers.username": username}]}
+
+def visible_to_user_query(username: str) -> dict:
+    """一般用戶可查看的文件，條件與 can_view_document 相同"""
+    return {
+        "$or": [
+            {"status": "uploaded", "signers": {"$exists": False}},
+            {"status": "signed", "signed_by": username},
+            {"signers.username": username}
+        ]
+    }
+
+async def parse_signers(raw: str) -> List[dict]:
+    """
+    解析上傳時指定的簽署者（JSON 陣列，依簽署順序）
+
+    每項可以是用戶名，或包含 username 及 field（簽名欄位位置）的物件
+    """
+    try:
+        items = json.loads(raw)
+        if not isinstance(items, list):
+            raise ValueError("signers 必須是陣列")
+        signers = _signers_adapter.validate_python(
+            [{"username": item} if isinstance(item, str) else item for item in items]
+        )
+    except (ValueError, ValidationError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"簽署者格式錯誤: {e}"
+        )
+    
+    if not signers:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="至少需要一位簽署者"
+        )
+    if len(signers) > settings.max_signers_per_document:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"簽署者不可超過 {settings.max_signers_per_document} 位"
+        )
+    
+    usernames = [signer.username for signer in signers]
+    if len(set(usernames)) != len(usernames):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="簽署者不可重複"
+        )
+    
+    db = await get_database()
+    existing = {user["username"] async for user in db.users.find(
+        {"username": {"$in": usernames}, "is_active": True}, {"username": 1}
+    )}
+    missing = [username for username in usernames if username not in existing]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"簽署者不存在或未啟用: {', '.join(missing)}"
+        )
+    
+    return [
+        {"username": signer.username, "field": signer.field.model_dump(), "status": "pending", "signed_at": None}
+        for signer in signers
+    ]
+
+async def _list_documents(query: dict) -> ORJSONResponse:
+    db = await get_database()
+    cursor = db.documents.find(query, DOCUMENT_LIST_PROJECTION).sort("created_at", -1)
+    return ORJSONResponse([document_list_item(doc) async for doc in cursor])
+
+@router.post("/upload", response_model=Document, dependencies=[Depends(admission("upload"))])
 async def upload_document(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    current_user = Depends(get_admin_user)
+    signers: Optional[str] = Form(None),
+    current_user = Depends(get_authorized_admin)
 ):
-    """上傳 PDF 文件（僅管理員）"""
+    """
+    上傳 PDF 文件（僅管理員）
+
+    signers 為 JSON 陣列時建立多人簽署文件：依陣列順序簽署，每項為用戶名或
+    {"username": ..., "field": {"page": -1, "x": ..., "y": ..., "width": 200, "height": 80}}
+    """
     db = await get_database()
     
     # 檢查檔案類型
@@ -30,6 +139,8 @@ async def upload_document(
             detail="只允許上傳 PDF 檔案"
         )
     
+    document_signers = await parse_signers(signers) if signers else None
+    
     # 檢查檔案大小
     file_size = 0
     content = await file.read()
@@ -61,12 +172,34 @@ async def upload_document(
         "file_size": file_size,
         "status": "uploaded",
         "uploaded_by": current_user["username"],
+        "search_tokens": build_search_tokens(file.filename),
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow()
     }
+    if document_signers:
+        document_doc.update({
+            "signers": document_signers,
+            "signed_count": 0,
+            "next_signer": document_signers[0]["username"]
+        })
     
     result = await db.documents.insert_one(document_doc)
     
+    # 背景擷取 PDF 文字建立搜尋索引
+    background_tasks.add_task(index_document_text, file_path, file.filename)
+    
+    # 通知可簽署的用戶（定期彙整為摘要郵件）；多人簽署文件只通知第一位簽署者
+    if document_signers:
+        await record_document_event(
+            "uploaded", {**document_doc, "_id": result.inserted_id},
+            actor=current_user["username"], recipients=[document_signers[0]["username"]]
+        )
+    else:
+        await record_document_event(
+            "uploaded", {**document_doc, "_id": result.inserted_id},
+            actor=current_user["username"], audience=AUDIENCE_USERS
+        )
+    
     return {
         "id": str(result.inserted_id),
         "filename": filename,
@@ -75,130 +208,176 @@ async def upload_document(
         "file_size": file_size,
         "status": "uploaded",
         "uploaded_by": current_user["username"],
+        "signers": document_signers,
+        "next_signer": document_doc.get("next_signer"),
         "created_at": document_doc["created_at"],
         "updated_at": document_doc["updated_at"]
     }
 
 @router.get("/", response_model=List[Document])
-async def get_documents(current_user = Depends(get_current_active_user)):
+async def get_documents(current_user = Depends(get_authorized_user)):
     """獲取所有文件列表（包括已簽署和未簽署的文件）"""
-    db = await get_database()
-    
     # 顯示所有文件
     query = {}
     
-    documents = []
-    async for doc in db.documents.find(query).sort("created_at", -1):
-        documents.append({
-            "id": str(doc["_id"]),
-            "filename": doc["filename"],
-            "original_filename": doc["original_filename"],
-            "file_path": doc["file_path"],
-            "file_size": doc["file_size"],
-            "status": doc["status"],
-            "uploaded_by": doc["uploaded_by"],
-            "signed_by": doc.get("signed_by"),
-            "signed_at": doc.get("signed_at"),
-            "signed_filename": doc.get("signed_filename"),
-            "created_at": doc["created_at"],
-            "updated_at": doc["updated_at"]
-        })
-    
-    return documents
+    return await _list_documents(query)
 
 @router.get("/available", response_model=List[Document])
-async def get_available_documents(current_user = Depends(get_current_active_user)):
+async def get_available_documents(current_user = Depends(get_authorized_user)):
     """獲取可簽署文件列表（未簽署的文件）"""
-    db = await get_database()
-    
-    # 只顯示未簽署的文件
+    # 只顯示未簽署的文件；多人簽署文件只顯示給管理員及目前輪到的簽署者
     query = {"status": "uploaded"}
+    if current_user["role"] != "admin":
+        query["$or"] = [{"signers": {"$exists": False}}, {"next_signer": current_user["username"]}]
     
-    documents = []
-    async for doc in db.documents.find(query).sort("created_at", -1):
-        documents.append({
-            "id": str(doc["_id"]),
-            "filename": doc["filename"],
-            "original_filename": doc["original_filename"],
-            "file_path": doc["file_path"],
-            "file_size": doc["file_size"],
-            "status": doc["status"],
-            "uploaded_by": doc["uploaded_by"],
-            "signed_by": doc.get("signed_by"),
-            "signed_at": doc.get("signed_at"),
-            "signed_filename": doc.get("signed_filename"),
-            "created_at": doc["created_at"],
-            "updated_at": doc["updated_at"]
-        })
-    
-    return documents
+    return await _list_documents(query)
 
 @router.get("/signed", response_model=List[Document])
-async def get_signed_documents(current_user = Depends(get_current_active_user)):
+async def get_signed_documents(current_user = Depends(get_authorized_user)):
     """獲取已簽署文件列表"""
-    db = await get_database()
-    
     # 管理員可以看到所有已簽署文件，一般用戶只能看到自己簽署的文件
     if current_user["role"] == "admin":
         query = {"status": "signed"}
     else:
-        query = {"status": "signed", "signed_by": current_user["username"]}
-    
-    documents = []
-    async for doc in db.documents.find(query).sort("created_at", -1):
-        documents.append({
-            "id": str(doc["_id"]),
-            "filename": doc["filename"],
-            "original_filename": doc["original_filename"],
-            "file_path": doc["file_path"],
-            "file_size": doc["file_size"],
-            "status": doc["status"],
-            "uploaded_by": doc["uploaded_by"],
-            "signed_by": doc.get("signed_by"),
-            "signed_at": doc.get("signed_at"),
-            "signed_filename": doc.get("signed_filename"),
-            "signed_file_path": doc.get("signed_file_path"),
-            "signature_data": doc.get("signature_data"),
-            "created_at": doc["created_at"],
-            "updated_at": doc["updated_at"]
-        })
+        query = {"status": "signed", **signed_by_user_query(current_user["username"])}
     
-    return documents
+    return await _list_documents(query)
 
 @router.get("/all-signed", response_model=List[Document])
-async def get_all_signed_documents(current_user = Depends(get_current_active_user)):
+async def get_all_signed_documents(current_user = Depends(get_authorized_user)):
     """獲取所有已簽署文件列表（管理員和一般用戶都可以看到所有已簽署文件）"""
-    db = await get_database()
-    
     # 用戶只能看到自己簽過的檔, 管理者可以看到所有已簽署文件
     if current_user["role"] == "admin":
         query = {"status": "signed"}
     else:
-        query = {"status": "signed", "signed_by": current_user["username"]}
-    
-    documents = []
-    async for doc in db.documents.find(query).sort("created_at", -1):
-        documents.append({
-            "id": str(doc["_id"]),
-            "filename": doc["filename"],
-            "original_filename": doc["original_filename"],
-            "file_path": doc["file_path"],
-            "file_size": doc["file_size"],
-            "status": doc["status"],
-            "uploaded_by": doc["uploaded_by"],
-            "signed_by": doc.get("signed_by"),
-            "signed_at": doc.get("signed_at"),
-            "signed_filename": doc.get("signed_filename"),
-            "signed_file_path": doc.get("signed_file_path"),
-            "signature_data": doc.get("signature_data"),
-            "created_at": doc["created_at"],
-            "updated_at": doc["updated_at"]
-        })
+        query = {"status": "signed", **signed_by_user_query(current_user["username"])}
     
-    return documents
+    return await _list_documents(query)
+
+@router.get("/search", response_model=DocumentSearchResult)
+async def search_documents(
+    q: str = Query(..., min_length=1, max_length=100),
+    status_filter: Optional[DocumentStatus] = Query(None, alias="status"),
+    signer: Optional[str] = None,
+    prefix: bool = True,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1),
+    include_total: bool = False,
+    current_user = Depends(get_authorized_user)
+):
+    """
+    搜尋文件（檔名及 PDF 內容，支援前綴比對、狀態與簽署者篩選及分頁）
+
+    多取一筆判斷是否有下一頁；符合的總數需要再掃描一次，只有 include_total=true 時才計算
+    """
+    db = await get_database()
+    page_size = min(page_size, settings.search_page_size_max)
+    
+    if prefix:
+        # 前綴搜尋：使用 search_tokens 多鍵索引
+        search_query = build_prefix_query(q)
+        if search_query is None:
+            return {"items": [], "has_more": False, "total": 0 if include_total else None, "page": page, "page_size": page_size}
+    else:
+        # 全詞搜尋：使用全文檢索索引並依相關度排序
+        search_query = {"$text": {"$search": q}}
+    
+    conditions = [search_query]
+    if status_filter is not None:
+        conditions.append({"status": status_filter.value})
+    if signer:
+        conditions.append(signed_by_user_query(signer))
+    
+    # 與文件列表相同的權限：一般用戶只能看到可簽署文件或自己簽署的文件
+    if current_user["role"] != "admin":
+        conditions.append(visible_to_user_query(current_user["username"]))
+    
+    query = {"$and": conditions}
+    projection = dict(DOCUMENT_LIST_PROJECTION)
+    
+    if prefix:
+        cursor = db.documents.find(query, projection).sort("created_at", -1)
+    else:
+        projection["score"] = {"$meta": "textScore"}
+        cursor = db.documents.find(query, projection).sort([("score", {"$meta": "textScore"})])
+    
+    cursor = cursor.skip((page - 1) * page_size).limit(page_size + 1)
+    documents = [document_list_item(doc) async for doc in cursor]
+    total = await db.documents.count_documents(query) if include_total else None
+    
+    return ORJSONResponse({
+        "items": documents[:page_size],
+        "has_more": len(documents) > page_size,
+        "total": total,
+        "page": page,
+        "page_size": page_size
+    })
+
+@router.get("/events")
+async def document_event_stream(request: Request, token: str = None):
+    """文件變更事件串流（Server-Sent Events），只推送用戶有權限查看的文件"""
+    db = await get_database()
+    
+    # EventSource 無法設定 Authorization 標頭，與預覽相同使用查詢參數傳遞 token
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="需要認證令牌"
+        )
+    
+    try:
+        current_user = await get_user_from_token(token)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="無效的認證令牌"
+        )
+    
+    if not current_user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="用戶不存在"
+        )
+    if not current_user.get("is_active"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="用戶帳號未啟用"
+        )
+    
+    subscription = document_events.subscribe({
+        "username": current_user["username"],
+        "role": current_user["role"]
+    })
+    
+    async def event_generator():
+        try:
+            # 告知用戶端是否有即時推送；無法推送時用戶端維持原本重新載入的方式
+            yield format_sse("ready", {"live": document_events.available})
+            while not await request.is_disconnected():
+                try:
+                    event, data = await asyncio.wait_for(
+                        subscription.queue.get(),
+                        timeout=settings.document_events_heartbeat_seconds
+                    )
+                except asyncio.TimeoutError:
+                    # 保持連線，避免被代理伺服器逾時關閉
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event, data)
+        finally:
+            document_events.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # 停用 nginx 緩衝
+        }
+    )
 
 @router.get("/{document_id}")
-async def get_document(document_id: str, current_user = Depends(get_current_active_user)):
+async def get_document(document_id: str, current_user = Depends(get_authorized_user)):
     """獲取單個文件信息"""
     db = await get_database()
     
@@ -209,20 +388,12 @@ async def get_document(document_id: str, current_user = Depends(get_current_acti
             detail="文件不存在"
         )
     
-    # 檢查權限
-    if current_user["role"] != "admin":
-        # 一般用戶只能查看可簽署文件或自己簽署的文件
-        if document["status"] == "uploaded":
-            # 可以查看可簽署文件
-            pass
-        elif document["status"] == "signed" and document.get("signed_by") == current_user["username"]:
-            # 可以查看自己簽署的文件
-            pass
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="無權限查看此文件"
-            )
+    # 檢查權限：一般用戶只能查看可簽署文件或自己簽署的文件
+    if not can_view_document(current_user, document):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="無權限查看此文件"
+        )
     
     return {
         "id": str(document["_id"]),
@@ -236,6 +407,8 @@ async def get_document(document_id: str, current_user = Depends(get_current_acti
         "signed_filename": document.get("signed_filename"),
         "signed_file_path": document.get("signed_file_path"),
         "signature_data": document.get("signature_data"),
+        "signers": document.get("signers"),
+        "next_signer": document.get("next_signer"),
         "created_at": document["created_at"],
         "updated_at": document["updated_at"]
     }
@@ -252,10 +425,8 @@ async def preview_document(document_id: str, token: str = None):
             detail="需要認證令牌"
         )
     
-    from app.core.security import verify_token
     try:
-        token_data = verify_token(token)
-        current_user = await db.users.find_one({"username": token_data.username})
+        current_user = await get_user_from_token(token)
         if not current_user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -274,20 +445,12 @@ async def preview_document(document_id: str, token: str = None):
             detail="文件不存在"
         )
     
-    # 檢查權限
-    if current_user["role"] != "admin":
-        # 一般用戶只能預覽可簽署文件或自己簽署的文件
-        if document["status"] == "uploaded":
-            # 可以預覽可簽署文件
-            pass
-        elif document["status"] == "signed" and document.get("signed_by") == current_user["username"]:
-            # 可以預覽自己簽署的文件
-            pass
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="無權限預覽此文件"
-            )
+    # 檢查權限：一般用戶只能預覽可簽署文件或自己簽署的文件
+    if not can_view_document(current_user, document):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="無權限預覽此文件"
+        )
     
     # 根據文件狀態選擇預覽文件
     if document["status"] == "signed" and document.get("signed_file_path"):
@@ -312,146 +475,44 @@ async def preview_document(document_id: str, token: str = None):
         headers={"Content-Disposition": "inline"}  # 設置為 inline 以支持 iframe 預覽
     )
 
-@router.post("/{document_id}/sign", response_model=Document)
+@router.post("/{document_id}/sign", response_model=Document, dependencies=[Depends(admission("sign"))])
 async def sign_document(
     document_id: str,
     request_data: dict,
-    current_user = Depends(get_current_active_user)
+    response: Response,
+    run_async: bool = Query(False, alias="async"),
+    current_user = Depends(get_authorized_user)
 ):
-    """簽署文件"""
-    db = await get_database()
-    
-    document = await db.documents.find_one({"_id": ObjectId(document_id)})
-    if not document:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="文件不存在"
-        )
-    
-    # 檢查文件狀態
-    if document["status"] != "uploaded":
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="文件已被簽署"
+    """
+    簽署文件（回應的 Server-Timing 標頭包含 PDF 處理各階段耗時）
+
+    async=true 時建立簽署工作並立即回傳 202，以 /api/jobs/{job_id} 查詢進度及結果
+    """
+    if run_async:
+        # 先檢查文件，無法簽署時直接回傳錯誤而不建立工作
+        await get_signable_document(document_id, current_user["username"])
+        job_id = await sign_jobs.enqueue(document_id, current_user["username"], request_data.get("signature_data"))
+        return ORJSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={
+                "job_id": job_id,
+                "status": "queued",
+                "status_url": f"/api/jobs/{job_id}",
+                "events_url": f"/api/jobs/{job_id}/events"
+            },
+            headers={"Location": f"/api/jobs/{job_id}"}
         )
     
-    # 生成簽署後的檔名
-    signed_filename = f"{current_user['username']}-{document['original_filename']}"
-    signed_file_path = os.path.join(settings.signed_doc_path, signed_filename)
+    server_timings = start_server_timing()
+    new_document = await sign_document_as(document_id, current_user["username"], request_data.get("signature_data"))
     
-    # 確保目錄存在
-    os.makedirs(settings.signed_doc_path, exist_ok=True)
-    
-    # 解析簽名數據
-    import json
-    signature_data = json.loads(request_data.get("signature_data", "{}"))
-    signature_image = signature_data.get("signature_image")
+    if server_timings:
+        response.headers["Server-Timing"] = format_server_timing(server_timings)
     
-    if signature_image:
-        # 使用 PDF 工具添加簽名
-        from app.utils.pdf_utils import add_signature_to_pdf
-        
-        try:
-            logger.info(f"Processing PDF signature for document {document_id}")
-            logger.info(f"Original filename: {document['original_filename']}")
-            
-            success = add_signature_to_pdf(
-                original_pdf_path=document["file_path"],
-                signature_image_data=signature_image,
-                signature_info=signature_data,
-                output_path=signed_file_path
-            )
-            
-            if not success:
-                logger.error(f"PDF signature processing failed for document {document_id}")
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="PDF 簽名處理失敗"
-                )
-            
-            logger.info(f"PDF signature processing completed successfully for document {document_id}")
-            
-            # 檢查輸出文件是否存在
-            if not os.path.exists(signed_file_path):
-                logger.error(f"Signed PDF file was not created: {signed_file_path}")
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="簽名文件創建失敗"
-                )
-            
-            logger.info(f"Signed PDF file size: {os.path.getsize(signed_file_path)} bytes")
-            
-        except HTTPException:
-            # 重新拋出 HTTP 異常
-            raise
-        except Exception as e:
-            logger.error(f"PDF signature processing exception for document {document_id}: {str(e)}")
-            logger.error(f"Original PDF path: {document['file_path']}")
-            logger.error(f"Original file exists: {os.path.exists(document['file_path'])}")
-            logger.error(f"Output path: {signed_file_path}")
-            
-            # 如果是 PyPDF2 錯誤，提供更友好的錯誤信息
-            if "startxref not found" in str(e) or "PyPDF2" in str(e):
-                # 檢查是否成功創建了fallback文件
-                if os.path.exists(signed_file_path):
-                    logger.info(f"Enhanced fallback PDF was created successfully at: {signed_file_path}")
-                    # 不拋出異常，因為系統已成功創建了包含提取內容和簽名的PDF
-                else:
-                    raise HTTPException(
-                        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                        detail="PDF 文件格式嚴重損壞，無法處理。請聯繫技術支持檢查原始文件。"
-                    )
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"PDF 簽名處理錯誤: {str(e)}"
-                )
-    else:
-        # 如果沒有簽名圖像，只複製文件
-        shutil.copy2(document["file_path"], signed_file_path)
-    
-    # 創建新的已簽署文件記錄
-    signed_document_data = {
-        "filename": document["filename"],  # 保持原始文件名
-        "original_filename": document["original_filename"],
-        "file_path": document["file_path"],  # 原始文件路徑
-        "file_size": document["file_size"],
-        "status": "signed",
-        "uploaded_by": document["uploaded_by"],
-        "signed_by": current_user["username"],
-        "signed_at": datetime.utcnow(),
-        "signed_filename": signed_filename,
-        "signed_file_path": signed_file_path,
-        "signature_data": request_data.get("signature_data"),
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow()
-    }
-    
-    doc_exists = await db.documents.find_one({"signed_filename": signed_filename})
-    new_document = None
-    if doc_exists:
-        _ = await db.documents.update_one({"_id": doc_exists["_id"]}, {"$set": signed_document_data})
-        new_document = await db.documents.find_one({"_id": doc_exists["_id"]})
-    else:
-        result = await db.documents.insert_one(signed_document_data)
-        new_document = await db.documents.find_one({"_id": result.inserted_id})
-    
-    return {
-        "id": str(new_document["_id"]),
-        "filename": new_document["filename"],
-        "original_filename": new_document["original_filename"],
-        "file_path": new_document["file_path"],
-        "file_size": new_document["file_size"],
-        "status": new_document["status"],
-        "uploaded_by": new_document["uploaded_by"],
-        "signed_by": new_document.get("signed_by"),
-        "signed_filename": new_document.get("signed_filename"),
-        "created_at": new_document["created_at"],
-        "updated_at": new_document["updated_at"]
-    }
+    return document_list_item(new_document)
 
 @router.get("/{document_id}/download")
-async def download_signed_document(document_id: str, current_user = Depends(get_current_active_user)):
+async def download_signed_document(document_id: str, current_user = Depends(get_authorized_user)):
     """下載簽署後的文件"""
     db = await get_database()
     
@@ -463,7 +524,8 @@ async def download_signed_document(document_id: str, current_user = Depends(get_
         )
     
     # 檢查權限
-    if (document.get("signed_by","") != current_user["username"] and current_user["role"] != "admin"):
+    if (document.get("signed_by","") != current_user["username"] and current_user["role"] != "admin"
+            and not is_document_signer(current_user, document)):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="無權限下載此文件"
@@ -490,7 +552,7 @@ async def download_signed_document(document_id: str, current_user = Depends(get_
     )
 
 @router.delete("/{document_id}")
-async def delete_document(document_id: str, current_user = Depends(get_current_active_user)):
+async def delete_document(document_id: str, current_user = Depends(get_authorized_user)):
     """刪除文件（管理員可刪除所有文件，一般用戶只能刪除自己簽署的文件）"""
     db = await get_database()
     
@@ -501,8 +563,13 @@ async def delete_document(document_id: str, current_user = Depends(get_current_a
             detail="文件不存在"
         )
     
-    # 權限檢查：管理員可以刪除所有文件，一般用戶只能刪除自己簽署的文件
+    # 權限檢查：管理員可以刪除所有文件，一般用戶只能刪除自己簽署的文件（多人簽署文件只能由管理員刪除）
     if current_user["role"] != "admin":
+        if document.get("signers"):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="多人簽署文件只能由管理員刪除"
+            )
         if not document.get("signed_by") or document["signed_by"] != current_user["username"]:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -510,7 +577,17 @@ async def delete_document(document_id: str, current_user = Depends(get_current_a
             )
     
     try:
-        if document["status"] == "signed":
+        if document.get("signers"):
+            # 多人簽署文件：刪除原始檔案、合成後的檔案及所有簽名圖層
+            for file_path in (document["file_path"], document.get("signed_file_path")):
+                if file_path and os.path.exists(file_path):
+                    os.remove(file_path)
+            await db.signature_layers.delete_many({"document_id": document["_id"]})
+            await db.documents.delete_one({"_id": document["_id"]})
+            await record_document_deletion(document)
+            logger.info(f"管理員 {current_user['username']} 已刪除多人簽署文件: {document['original_filename']} (ID: {document_id})")
+            return {"message": "文件已刪除"}
+        elif document["status"] == "signed":
             # 已簽署文件：只刪除已簽署檔案，保留原始文件
             if document.get("signed_file_path") and os.path.exists(document["signed_file_path"]):
                 os.remove(document["signed_file_path"])
@@ -519,6 +596,7 @@ async def delete_document(document_id: str, current_user = Depends(get_current_a
             result = await db.documents.delete_one({"_id": ObjectId(document_id)})
             
             if result.deleted_count > 0:
+                await record_document_deletion(document)
                 user_type = "管理員" if current_user["role"] == "admin" else "用戶"
                 logger.info(f"{user_type} {current_user['username']} 已刪除已簽署文件: {document['original_filename']} (ID: {document_id})，文件狀態已恢復為可簽署")
                 return {"message": "已簽署文件已刪除，文件恢復為可簽署狀態"}
@@ -537,6 +615,7 @@ async def delete_document(document_id: str, current_user = Depends(get_current_a
             result = await db.documents.delete_one({"_id": ObjectId(document_id)})
             
             if result.deleted_count > 0:
+                await record_document_deletion(document)
                 user_type = "管理員" if current_user["role"] == "admin" else "用戶"
                 logger.info(f"{user_type} {current_user['username']} 已刪除文件: {document['original_filename']} (ID: {document_id})")
                 return {"message": "文件已刪除"}
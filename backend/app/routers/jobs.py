@@ -0,0 +1,98 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.responses import StreamingResponse
+from app.core.security import get_authorized_user, get_user_from_token
+from app.core.sign_jobs import sign_jobs, job_view, TERMINAL_STATUSES
+from app.core.events import format_sse
+from app.core.config import settings
+from app.core.responses import ORJSONResponse
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+async def get_visible_job(job_id: str, user: dict) -> dict:
+    """取得用戶可查看的工作（管理員可查看全部，一般用戶只能查看自己建立的工作）"""
+    job = await sign_jobs.get(job_id)
+    # 無權限時同樣回傳 404，不透露工作是否存在
+    if job is None or (user.get("role") != "admin" and job["username"] != user.get("username")):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="簽署工作不存在"
+        )
+    return job
+
+@router.get("/{job_id}")
+async def get_job(job_id: str, current_user = Depends(get_authorized_user)):
+    """查詢簽署工作的狀態、進度及結果"""
+    job = await get_visible_job(job_id, current_user)
+    return ORJSONResponse(job_view(job))
+
+@router.get("/{job_id}/events")
+async def job_event_stream(job_id: str, request: Request, token: str = None):
+    """簽署工作進度串流（Server-Sent Events），工作完成或失敗後送出 done 事件並結束"""
+    # EventSource 無法設定 Authorization 標頭，與文件事件串流相同使用查詢參數傳遞 token
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="需要認證令牌"
+        )
+
+    try:
+        current_user = await get_user_from_token(token)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="無效的認證令牌"
+        )
+
+    if not current_user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="用戶不存在"
+        )
+    if not current_user.get("is_active"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="用戶帳號未啟用"
+        )
+
+    job = await get_visible_job(job_id, current_user)
+
+    async def event_generator():
+        # 工作可能在任何 worker 執行，定期查詢資料庫，只在狀態或進度改變時推送
+        current = job
+        last = None
+        last_sent = time.monotonic()
+        while True:
+            view = job_view(current)
+            if view["status"] in TERMINAL_STATUSES:
+                yield format_sse("done", view)
+                return
+
+            state = (view["status"], view["stage"], view["progress"])
+            if state != last:
+                yield format_sse("progress", view)
+                last, last_sent = state, time.monotonic()
+            elif time.monotonic() - last_sent >= settings.document_events_heartbeat_seconds:
+                # 保持連線，避免被代理伺服器逾時關閉
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+
+            await asyncio.sleep(settings.sign_job_events_poll_seconds)
+            if await request.is_disconnected():
+                return
+            current = await sign_jobs.get(job_id)
+            if current is None:
+                # 工作已過保留期限被刪除
+                return
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # 停用 nginx 緩衝
+        }
+    )
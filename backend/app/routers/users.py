@@ -1,19 +1,34 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from app.models.user import User, UserUpdate
-from app.core.security import get_current_active_user, get_admin_user
+from app.models.user import User, UserProfileUpdated, UserUpdate
+from app.core.security import get_current_active_user, get_authorized_admin, create_user_access_token
+from app.core.revocation import token_revocations
+from app.core.refresh_tokens import issue_refresh_token, revoke_user_refresh_tokens
+from app.core.cache import invalidate_user
+from app.core.responses import ORJSONResponse
 from app.database import get_database
 from bson import ObjectId
 from datetime import datetime
 
 router = APIRouter()
 
+# 用戶列表只讀取 User 模型的欄位（不載入密碼雜湊等欄位）
+USER_LIST_PROJECTION = {
+    "username": 1,
+    "email": 1,
+    "full_name": 1,
+    "role": 1,
+    "is_active": 1,
+    "created_at": 1,
+    "updated_at": 1
+}
+
 @router.get("/", response_model=list[User])
-async def get_users(current_user = Depends(get_admin_user)):
+async def get_users(current_user = Depends(get_authorized_admin)):
     """獲取所有用戶（僅管理員）"""
     db = await get_database()
     
     users = []
-    async for user in db.users.find():
+    async for user in db.users.find({}, USER_LIST_PROJECTION):
         users.append({
             "id": str(user["_id"]),
             "username": user["username"],
@@ -25,7 +40,7 @@ async def get_users(current_user = Depends(get_admin_user)):
             "updated_at": user["updated_at"]
         })
     
-    return users
+    return ORJSONResponse(users)
 
 @router.get("/me", response_model=User)
 async def get_my_profile(current_user = Depends(get_current_active_user)):
@@ -41,12 +56,18 @@ async def get_my_profile(current_user = Depends(get_current_active_user)):
         "updated_at": current_user["updated_at"]
     }
 
-@router.put("/me", response_model=User)
+@router.put("/me", response_model=UserProfileUpdated)
 async def update_my_profile(
     user_update: UserUpdate,
     current_user = Depends(get_current_active_user)
 ):
-    """更新自己的資料"""
+    """
+    更新自己的資料
+
+    用戶名或密碼變更時，所有已發出的訪問令牌及刷新令牌失效，回應附上新令牌
+    （與修改密碼相同）；回應含 access_token 時，用戶端必須以回應中的
+    access_token、refresh_token 取代儲存的令牌
+    """
     db = await get_database()
     
     update_data = {"updated_at": datetime.utcnow()}
@@ -81,18 +102,37 @@ async def update_my_profile(
         update_data["full_name"] = user_update.full_name
     
     if user_update.password is not None:
-        from app.core.security import get_password_hash
-        update_data["password"] = get_password_hash(user_update.password)
+        from app.core.security import get_password_hash_async
+        update_data["password"] = await get_password_hash_async(user_update.password)
     
     await db.users.update_one(
         {"_id": current_user["_id"]},
         {"$set": update_data}
     )
+    invalidate_user(username=current_user["username"], user_id=current_user["_id"])
+    
+    # 令牌以用戶名識別用戶：用戶名或密碼變更後，舊令牌及登入階段都必須失效
+    identity_changed = (
+        ("username" in update_data and update_data["username"] != current_user["username"])
+        or "password" in update_data
+    )
+    tokens = {}
+    if identity_changed:
+        await token_revocations.bump_user_version(current_user["_id"])
+        await revoke_user_refresh_tokens(current_user["_id"])
     
     # 獲取更新後的用戶資料
     updated_user = await db.users.find_one({"_id": current_user["_id"]})
     
+    if identity_changed:
+        tokens = {
+            "access_token": create_user_access_token(updated_user),
+            "token_type": "bearer",
+            "refresh_token": await issue_refresh_token(updated_user)
+        }
+    
     return {
+        **tokens,
         "id": str(updated_user["_id"]),
         "username": updated_user["username"],
         "email": updated_user["email"],
@@ -104,7 +144,7 @@ async def update_my_profile(
     }
 
 @router.delete("/{user_id}")
-async def delete_user(user_id: str, current_user = Depends(get_admin_user)):
+async def delete_user(user_id: str, current_user = Depends(get_authorized_admin)):
     """刪除用戶（僅管理員）"""
     db = await get_database()
     
@@ -124,5 +164,8 @@ async def delete_user(user_id: str, current_user = Depends(get_admin_user)):
         )
     
     await db.users.delete_one({"_id": ObjectId(user_id)})
+    invalidate_user(username=user["username"])
+    # 已發出的令牌立即失效
+    await token_revocations.revoke_user(str(user["_id"]))
     
     return {"message": "用戶已刪除"}
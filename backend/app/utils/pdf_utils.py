@@ -7,10 +7,14 @@ from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.utils import ImageReader
 import tempfile
+import time
 import logging
 import traceback
 from PyPDF2.errors import PdfReadError, PdfReadWarning
 from contextlib import suppress
+from typing import Callable, Optional
+from app.core.metrics import observe_pdf_stage
+from app.core.tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -24,17 +28,18 @@ SIGNATURE_CONFIG = {
     'line_spacing': 20      # 簽名信息行間距
 }
 
-def calculate_signature_position(page_width, page_height=None):
+def calculate_signature_position(page_width, page_height=None, slot: int = 0):
     """
     計算統一的簽名位置
     Args:
         page_width: 頁面寬度
         page_height: 頁面高度（可選，用於fallback PDF）
+        slot: 同一頁的第幾個簽名（多人簽署時由下往上排列）
     Returns:
         tuple: (signature_x, signature_y)
     """
     signature_x = page_width - SIGNATURE_CONFIG['width'] - SIGNATURE_CONFIG['margin_right']
-    signature_y = SIGNATURE_CONFIG['margin_bottom']
+    signature_y = SIGNATURE_CONFIG['margin_bottom'] + slot * (SIGNATURE_CONFIG['height'] + 3 * SIGNATURE_CONFIG['line_spacing'])
     return signature_x, signature_y
 
 def validate_pdf_file(pdf_path: str) -> bool:
@@ -46,55 +51,55 @@ def validate_pdf_file(pdf_path: str) -> bool:
             # 檢查文件頭
             header = f.read(8)
             if not header.startswith(b'%PDF-'):
-                logger.error(f"Invalid PDF header in file: {pdf_path}")
+                logger.error("Invalid PDF header in file: %s", pdf_path)
                 return False
             
             # 檢查文件尾部是否包含 %%EOF
             f.seek(-1024, 2)  # 從文件尾部向前讀取1024字節
             tail = f.read()
             if b'%%EOF' not in tail:
-                logger.warning(f"PDF file may be incomplete (no %%EOF): {pdf_path}")
+                logger.warning("PDF file may be incomplete (no %%EOF): %s", pdf_path)
                 # 不直接返回 False，因為有些 PDF 可能沒有標準結尾
             
         return True
     except Exception as e:
-        logger.error(f"Error validating PDF file {pdf_path}: {e}")
+        logger.error("Error validating PDF file %s: %s", pdf_path, e)
         return False
 
 def read_pdf_safely(pdf_path: str):
     """
     安全地讀取 PDF 文件，使用多種策略處理損壞的 PDF
     """
-    logger.info(f"Attempting to read PDF: {pdf_path}")
+    logger.debug("Attempting to read PDF: %s", pdf_path)
     
     # 策略 1: 正常讀取
     try:
         reader = PdfReader(pdf_path)
-        logger.info(f"Successfully read PDF with {len(reader.pages)} pages")
+        logger.debug("Successfully read PDF with %s pages", len(reader.pages))
         return reader
     except PdfReadError as e:
-        logger.warning(f"PyPDF2 read error: {e}")
+        logger.warning("PyPDF2 read error: %s", e)
         
     # 策略 2: 忽略警告的嚴格模式讀取
     try:
         reader = PdfReader(pdf_path, strict=False)
-        logger.info(f"Successfully read PDF in non-strict mode with {len(reader.pages)} pages")
+        logger.info("Successfully read PDF in non-strict mode with %s pages", len(reader.pages))
         return reader
     except Exception as e:
-        logger.warning(f"Non-strict mode also failed: {e}")
+        logger.warning("Non-strict mode also failed: %s", e)
     
     # 策略 3: 嘗試修復 PDF
     try:
         repaired_path = repair_pdf(pdf_path)
         if repaired_path:
             reader = PdfReader(repaired_path)
-            logger.info(f"Successfully read repaired PDF with {len(reader.pages)} pages")
+            logger.info("Successfully read repaired PDF with %s pages", len(reader.pages))
             return reader
     except Exception as e:
-        logger.warning(f"Repaired PDF reading failed: {e}")
+        logger.warning("Repaired PDF reading failed: %s", e)
     
     # 所有策略都失敗
-    logger.error(f"All PDF reading strategies failed for: {pdf_path}")
+    logger.error("All PDF reading strategies failed for: %s", pdf_path)
     raise PdfReadError(f"Cannot read PDF file: {pdf_path}")
 
 def repair_pdf(pdf_path: str) -> str:
@@ -120,11 +125,11 @@ def repair_pdf(pdf_path: str) -> str:
         with open(repaired_path, 'wb') as f:
             f.write(content)
         
-        logger.info(f"Created repaired PDF: {repaired_path}")
+        logger.info("Created repaired PDF: %s", repaired_path)
         return repaired_path
         
     except Exception as e:
-        logger.error(f"PDF repair failed: {e}")
+        logger.error("PDF repair failed: %s", e)
         return None
 
 def create_signature_only_pdf(signature_image_data: str, signature_info: dict, output_path: str, original_filename: str = ""):
@@ -132,7 +137,7 @@ def create_signature_only_pdf(signature_image_data: str, signature_info: dict, o
     當原始 PDF 無法讀取時，創建一個只包含簽名的新 PDF
     """
     try:
-        logger.info(f"Creating signature-only PDF: {output_path}")
+        logger.info("Creating signature-only PDF: %s", output_path)
         
         # 創建新的 PDF 文件
         c = canvas.Canvas(output_path, pagesize=letter)
@@ -190,11 +195,11 @@ def create_signature_only_pdf(signature_image_data: str, signature_info: dict, o
         # 清理臨時文件
         os.unlink(temp_image_file.name)
         
-        logger.info(f"Successfully created signature-only PDF: {output_path}")
+        logger.info("Successfully created signature-only PDF: %s", output_path)
         return True
         
     except Exception as e:
-        logger.error(f"Error creating signature-only PDF: {e}")
+        logger.error("Error creating signature-only PDF: %s", e)
         return False
 
 def extract_pdf_raw_content(pdf_path: str):
@@ -235,7 +240,7 @@ def extract_pdf_raw_content(pdf_path: str):
         return info
         
     except Exception as e:
-        logger.error(f"Failed to extract raw PDF content: {e}")
+        logger.error("Failed to extract raw PDF content: %s", e)
         return None
 
 def create_enhanced_fallback_pdf(signature_image_data: str, signature_info: dict, output_path: str, original_pdf_path: str):
@@ -243,7 +248,7 @@ def create_enhanced_fallback_pdf(signature_image_data: str, signature_info: dict
     創建增強的fallback PDF，包含更多原始文件信息
     """
     try:
-        logger.info(f"Creating enhanced fallback PDF: {output_path}")
+        logger.info("Creating enhanced fallback PDF: %s", output_path)
         
         # 嘗試提取原始PDF的內容
         raw_content = extract_pdf_raw_content(original_pdf_path)
@@ -349,19 +354,19 @@ def create_enhanced_fallback_pdf(signature_image_data: str, signature_info: dict
         # 清理臨時文件
         os.unlink(temp_image_file.name)
         
-        logger.info(f"Successfully created enhanced fallback PDF: {output_path}")
+        logger.info("Successfully created enhanced fallback PDF: %s", output_path)
         return True
         
     except Exception as e:
-        logger.error(f"Error creating enhanced fallback PDF: {e}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.error("Error creating enhanced fallback PDF: %s", e)
+        logger.error("Traceback: %s", traceback.format_exc())
         return False
 
 def create_repaired_pdf_reader(pdf_path: str):
     """
     使用更寬鬆的策略創建PDF讀取器，專門處理有問題的PDF文件
     """
-    logger.info(f"Attempting to create repaired PDF reader for: {pdf_path}")
+    logger.info("Attempting to create repaired PDF reader for: %s", pdf_path)
     
     try:
         # 策略1: 使用PyPDF2的忽略錯誤模式
@@ -372,10 +377,10 @@ def create_repaired_pdf_reader(pdf_path: str):
             # 嘗試訪問頁面來驗證可用性
             _ = len(reader.pages)
             if len(reader.pages) > 0:
-                logger.info(f"Strategy 1 successful: loaded {len(reader.pages)} pages")
+                logger.info("Strategy 1 successful: loaded %s pages", len(reader.pages))
                 return reader
     except Exception as e:
-        logger.warning(f"Strategy 1 failed: {e}")
+        logger.warning("Strategy 1 failed: %s", e)
     
     try:
         # 策略2: 讀取原始數據並嘗試修復
@@ -398,11 +403,11 @@ def create_repaired_pdf_reader(pdf_path: str):
         reader = PdfReader(temp_repaired.name, strict=False)
         _ = len(reader.pages)
         if len(reader.pages) > 0:
-            logger.info(f"Strategy 2 successful: repaired and loaded {len(reader.pages)} pages")
+            logger.info("Strategy 2 successful: repaired and loaded %s pages", len(reader.pages))
             return reader
             
     except Exception as e:
-        logger.warning(f"Strategy 2 failed: {e}")
+        logger.warning("Strategy 2 failed: %s", e)
     
     try:
         # 策略3: 嘗試跳過損壞的部分
@@ -426,11 +431,11 @@ def create_repaired_pdf_reader(pdf_path: str):
         reader = PdfReader(temp_clean.name, strict=False)
         _ = len(reader.pages)
         if len(reader.pages) > 0:
-            logger.info(f"Strategy 3 successful: cleaned and loaded {len(reader.pages)} pages")
+            logger.info("Strategy 3 successful: cleaned and loaded %s pages", len(reader.pages))
             return reader
             
     except Exception as e:
-        logger.warning(f"Strategy 3 failed: {e}")
+        logger.warning("Strategy 3 failed: %s", e)
     
     # 如果所有策略都失敗，拋出異常
     raise PdfReadError(f"All repair strategies failed for PDF: {pdf_path}")
@@ -443,22 +448,22 @@ def analyze_pdf_structure(pdf_path: str):
         with open(pdf_path, 'rb') as f:
             content = f.read(2048)  # 讀取前 2KB
             
-        logger.info(f"PDF file size: {os.path.getsize(pdf_path)} bytes")
-        logger.info(f"PDF header: {content[:50]}")
+        logger.debug("PDF file size: %s bytes", os.path.getsize(pdf_path))
+        logger.debug("PDF header: %s", content[:50])
         
         # 檢查是否包含標準 PDF 元素
         has_xref = b'xref' in content
         has_trailer = b'trailer' in content
         has_startxref = b'startxref' in content
         
-        logger.info(f"Has xref table: {has_xref}")
-        logger.info(f"Has trailer: {has_trailer}")  
-        logger.info(f"Has startxref: {has_startxref}")
+        logger.debug("Has xref table: %s", has_xref)
+        logger.debug("Has trailer: %s", has_trailer)  
+        logger.debug("Has startxref: %s", has_startxref)
         
         # 尋找 PDF 版本
         if content.startswith(b'%PDF-'):
             version_line = content[:20].decode('ascii', errors='ignore')
-            logger.info(f"PDF version: {version_line}")
+            logger.debug("PDF version: %s", version_line)
         else:
             logger.warning("File does not start with PDF header")
             
@@ -470,55 +475,136 @@ def analyze_pdf_structure(pdf_path: str):
         }
         
     except Exception as e:
-        logger.error(f"Error analyzing PDF structure: {e}")
+        logger.error("Error analyzing PDF structure: %s", e)
         return None
 
-def add_signature_to_pdf(original_pdf_path: str, signature_image_data: str, signature_info: dict, output_path: str):
+def extract_pdf_text(pdf_path: str, max_chars: int = 200000) -> str:
+    """
+    擷取 PDF 文字內容（供搜尋索引使用）
+    
+    Args:
+        pdf_path: PDF 文件路徑
+        max_chars: 最多擷取的字元數，超過後不再解析後續頁面
+    Returns:
+        str: 擷取到的文字，無法讀取時回傳空字串
+    """
+    try:
+        import warnings
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            reader = PdfReader(pdf_path, strict=False)
+            
+            parts = []
+            total = 0
+            for page in reader.pages:
+                try:
+                    text = page.extract_text() or ""
+                except Exception as e:
+                    logger.debug("Failed to extract text from page: %s", e)
+                    continue
+                
+                parts.append(text)
+                total += len(text)
+                if total >= max_chars:
+                    break
+        
+        return "\n".join(parts)[:max_chars]
+        
+    except Exception as e:
+        logger.warning("Failed to extract text from PDF %s: %s", pdf_path, e)
+        return ""
+
+def _report_progress(progress_callback: Optional[Callable[[str, float], None]], stage: str, fraction: float):
+    if progress_callback is not None:
+        try:
+            progress_callback(stage, fraction)
+        except Exception as e:
+            logger.debug("Progress callback failed: %s", e)
+
+def add_signature_to_pdf(
+    original_pdf_path: str,
+    signature_image_data: str,
+    signature_info: dict,
+    output_path: str,
+    progress_callback: Optional[Callable[[str, float], None]] = None
+):
     """
     將簽名以透明背景的方式合成到PDF文件的最後一頁
     
+    各處理階段記錄追蹤 span（pdf.sign 之下的 pdf.analyze、pdf.load、pdf.image、
+    pdf.overlay、pdf.merge、pdf.write）及階段耗時指標
+    
     Args:
         original_pdf_path: 原始 PDF 文件路徑
         signature_image_data: Base64 編碼的簽名圖像數據
         signature_info: 簽名信息字典，包含 name, title, reason, timestamp
         output_path: 輸出文件路徑
+        progress_callback: 進度回呼 (階段, 0~1 的進度)，在執行簽署的執行緒中呼叫
     """
+    file_size = os.path.getsize(original_pdf_path) if os.path.exists(original_pdf_path) else 0
+    with span("pdf.sign", file_size=file_size) as sign_span:
+        success = _add_signature_to_pdf(
+            original_pdf_path, signature_image_data, signature_info, output_path, sign_span, progress_callback
+        )
+        sign_span.set_attribute("success", bool(success))
+        if success and os.path.exists(output_path):
+            sign_span.set_attribute("output_size", os.path.getsize(output_path))
+        return success
+
+def _add_signature_to_pdf(original_pdf_path: str, signature_image_data: str, signature_info: dict, output_path: str,
+                          sign_span, progress_callback: Optional[Callable[[str, float], None]] = None):
     temp_file = None
     temp_image_file = None
     repaired_pdf_path = None
     
     try:
-        logger.info(f"Starting PDF signature process for: {original_pdf_path}")
+        logger.debug("Starting PDF signature process for: %s", original_pdf_path)
+        stage_start = time.perf_counter()
         
         # 分析 PDF 文件結構（僅用於診斷，不決定是否失敗）
-        pdf_analysis = analyze_pdf_structure(original_pdf_path)
+        with span("pdf.analyze"):
+            pdf_analysis = analyze_pdf_structure(original_pdf_path)
         
         # 嘗試讀取原始 PDF（主要策略）
         reader = None
         writer = None
         
-        try:
-            # 首先嘗試安全讀取
-            reader = read_pdf_safely(original_pdf_path)
-            writer = PdfWriter()
-            logger.info(f"Successfully loaded PDF with {len(reader.pages)} pages")
-            
-        except Exception as read_error:
-            logger.error(f"Failed to read PDF normally: {read_error}")
-            
-            # 嘗試更寬鬆的讀取策略
+        with span("pdf.load") as load_span:
             try:
-                logger.info("Attempting alternative PDF processing...")
-                reader = create_repaired_pdf_reader(original_pdf_path)
+                # 首先嘗試安全讀取
+                reader = read_pdf_safely(original_pdf_path)
                 writer = PdfWriter()
-                logger.info(f"Successfully loaded PDF using alternative method with {len(reader.pages)} pages")
+                strategy = "standard"
+                logger.debug("Successfully loaded PDF with %s pages", len(reader.pages))
                 
-            except Exception as alt_error:
-                logger.error(f"Alternative PDF processing also failed: {alt_error}")
-                logger.info("Using enhanced fallback strategy - extracting available content")
+            except Exception as read_error:
+                logger.error("Failed to read PDF normally: %s", read_error)
                 
-                # 只有在所有策略都失敗時才使用增強的 fallback
-                logger.info("All PDF repair strategies failed, using enhanced fallback")
+                # 嘗試更寬鬆的讀取策略
+                try:
+                    logger.info("Attempting alternative PDF processing...")
+                    with span("pdf.repair"):
+                        reader = create_repaired_pdf_reader(original_pdf_path)
+                    writer = PdfWriter()
+                    strategy = "repaired"
+                    logger.info("Successfully loaded PDF using alternative method with %s pages", len(reader.pages))
+                    
+                except Exception as alt_error:
+                    logger.error("Alternative PDF processing also failed: %s", alt_error)
+                    logger.info("Using enhanced fallback strategy - extracting available content")
+                    strategy = "fallback"
+            
+            load_span.set_attribute("strategy", strategy)
+            sign_span.set_attribute("strategy", strategy)
+            if reader is not None:
+                load_span.set_attribute("page_count", len(reader.pages))
+                sign_span.set_attribute("page_count", len(reader.pages))
+        
+        if strategy == "fallback":
+            # 只有在所有策略都失敗時才使用增強的 fallback
+            logger.info("All PDF repair strategies failed, using enhanced fallback")
+            _report_progress(progress_callback, "fallback", 0.5)
+            with span("pdf.fallback"):
                 return create_enhanced_fallback_pdf(
                     signature_image_data=signature_image_data,
                     signature_info=signature_info,
@@ -528,6 +614,8 @@ def add_signature_to_pdf(original_pdf_path: str, signature_image_data: str, sign
         
         # 獲取最後一頁
         last_page = reader.pages[-1]
+        stage_start = observe_pdf_stage("load", stage_start)
+        _report_progress(progress_callback, "load", 0.2)
         
         # 創建臨時文件來繪製透明簽名
         temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
@@ -537,96 +625,240 @@ def add_signature_to_pdf(original_pdf_path: str, signature_image_data: str, sign
         page_width = float(last_page.mediabox.width)
         page_height = float(last_page.mediabox.height)
         
-        # 創建 PDF 畫布，使用與最後一頁相同的尺寸
-        c = canvas.Canvas(temp_file.name, pagesize=(page_width, page_height))
-        
-        # 解析簽名圖像數據
-        if signature_image_data.startswith('data:image'):
-            # 移除 data:image/png;base64, 前綴
-            signature_image_data = signature_image_data.split(',')[1]
-        
-        # 解碼 Base64 圖像
-        image_data = base64.b64decode(signature_image_data)
-        image = Image.open(BytesIO(image_data))
-        
-        # 確保圖像是 RGBA 模式以支持透明度
-        if image.mode != 'RGBA':
-            image = image.convert('RGBA')
-        
-        # 使用統一的簽名標準調整圖像大小
-        image.thumbnail((SIGNATURE_CONFIG['width'], SIGNATURE_CONFIG['height']), Image.Resampling.LANCZOS)
-        
-        # 保存調整後的圖像到臨時文件（保持透明度）
-        temp_image_file = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-        image.save(temp_image_file.name, 'PNG')
-        temp_image_file.close()
-        
-        # 使用統一的簽名位置計算
-        signature_x, signature_y = calculate_signature_position(page_width, page_height)
-        
-        # 繪製簽名圖像（保持透明度）- 統一大小
-        c.drawImage(temp_image_file.name, signature_x, signature_y, 
-                   width=SIGNATURE_CONFIG['width'], height=SIGNATURE_CONFIG['height'], mask='auto')
-        
-        # 繪製簽名信息（使用半透明文字）- 統一字體和間距
-        c.setFillColorRGB(0, 0, 0, 0.8)  # 半透明黑色文字
-        c.setFont("Helvetica", SIGNATURE_CONFIG['font_size'])
-        
-        info_y = signature_y - SIGNATURE_CONFIG['line_spacing']
-        c.drawString(signature_x, info_y, f"Signer: {signature_info.get('name', '')}")
-        
-        info_y -= SIGNATURE_CONFIG['line_spacing']
-        c.drawString(signature_x, info_y, f"Signature Time: {signature_info.get('timestamp', '')}")
-        
-        
-        c.save()
-        
-        # 讀取簽名頁面
-        signature_reader = PdfReader(temp_file.name)
-        signature_page = signature_reader.pages[0]
-        
-        # 將簽名頁面合併到最後一頁（透明合成）
-        last_page.merge_page(signature_page)
-        
-        # 保留完整的多頁PDF內容並添加電子簽名
-        total_pages = len(reader.pages)
-        logger.info(f"Processing {total_pages} page(s) PDF")
-        
-        if total_pages == 1:
-            # 單頁PDF：直接添加已簽名的頁面
-            logger.info("Single page PDF: adding signed page")
-            writer.add_page(last_page)
-        else:
-            # 多頁PDF：保留所有前面的頁面，最後一頁添加簽名
-            logger.info(f"Multi-page PDF: preserving {total_pages - 1} original pages + 1 signed page")
+        with span("pdf.image") as image_span:
+            # 解析簽名圖像數據
+            if signature_image_data.startswith('data:image'):
+                # 移除 data:image/png;base64, 前綴
+                signature_image_data = signature_image_data.split(',')[1]
+            
+            # 解碼 Base64 圖像
+            image_data = base64.b64decode(signature_image_data)
+            image = Image.open(BytesIO(image_data))
+            image_span.set_attribute("image_size", len(image_data))
+            
+            # 確保圖像是 RGBA 模式以支持透明度
+            if image.mode != 'RGBA':
+                image = image.convert('RGBA')
             
-            # 添加除最後一頁外的所有原始頁面
-            for page_num in range(total_pages - 1):
-                writer.add_page(reader.pages[page_num])
-                logger.debug(f"Added original page {page_num + 1}")
+            # 使用統一的簽名標準調整圖像大小
+            image.thumbnail((SIGNATURE_CONFIG['width'], SIGNATURE_CONFIG['height']), Image.Resampling.LANCZOS)
             
-            # 添加帶簽名的最後一頁
-            writer.add_page(last_page)
-            logger.info(f"Added signed final page ({total_pages})")
+            # 保存調整後的圖像到臨時文件（保持透明度）
+            temp_image_file = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
+            image.save(temp_image_file.name, 'PNG')
+            temp_image_file.close()
+        
+        with span("pdf.overlay"):
+            # 創建 PDF 畫布，使用與最後一頁相同的尺寸
+            c = canvas.Canvas(temp_file.name, pagesize=(page_width, page_height))
+            
+            # 使用統一的簽名位置計算
+            signature_x, signature_y = calculate_signature_position(page_width, page_height)
+            
+            # 繪製簽名圖像（保持透明度）- 統一大小
+            c.drawImage(temp_image_file.name, signature_x, signature_y, 
+                       width=SIGNATURE_CONFIG['width'], height=SIGNATURE_CONFIG['height'], mask='auto')
+            
+            # 繪製簽名信息（使用半透明文字）- 統一字體和間距
+            c.setFillColorRGB(0, 0, 0, 0.8)  # 半透明黑色文字
+            c.setFont("Helvetica", SIGNATURE_CONFIG['font_size'])
+            
+            info_y = signature_y - SIGNATURE_CONFIG['line_spacing']
+            c.drawString(signature_x, info_y, f"Signer: {signature_info.get('name', '')}")
+            
+            info_y -= SIGNATURE_CONFIG['line_spacing']
+            c.drawString(signature_x, info_y, f"Signature Time: {signature_info.get('timestamp', '')}")
+            
+            c.save()
+        stage_start = observe_pdf_stage("overlay", stage_start)
+        _report_progress(progress_callback, "overlay", 0.4)
+        
+        with span("pdf.merge"):
+            # 讀取簽名頁面
+            signature_reader = PdfReader(temp_file.name)
+            signature_page = signature_reader.pages[0]
+            
+            # 將簽名頁面合併到最後一頁（透明合成）
+            last_page.merge_page(signature_page)
+            
+            # 保留完整的多頁PDF內容並添加電子簽名
+            total_pages = len(reader.pages)
+            logger.debug("Processing %s page(s) PDF", total_pages)
+            
+            if total_pages == 1:
+                # 單頁PDF：直接添加已簽名的頁面
+                logger.debug("Single page PDF: adding signed page")
+                writer.add_page(last_page)
+            else:
+                # 多頁PDF：保留所有前面的頁面，最後一頁添加簽名
+                logger.debug("Multi-page PDF: preserving %s original pages + 1 signed page", total_pages - 1)
+                
+                # 添加除最後一頁外的所有原始頁面
+                report_every = max(1, total_pages // 20)
+                for page_num in range(total_pages - 1):
+                    writer.add_page(reader.pages[page_num])
+                    logger.debug("Added original page %s", page_num + 1)
+                    if page_num % report_every == 0:
+                        _report_progress(progress_callback, "merge", 0.4 + 0.3 * page_num / total_pages)
+                
+                # 添加帶簽名的最後一頁
+                writer.add_page(last_page)
+                logger.debug("Added signed final page (%s)", total_pages)
+        stage_start = observe_pdf_stage("merge", stage_start)
+        _report_progress(progress_callback, "write", 0.7)
         
         # 寫入輸出文件
-        with open(output_path, 'wb') as output_file:
-            writer.write(output_file)
+        with span("pdf.write") as write_span:
+            with open(output_path, 'wb') as output_file:
+                writer.write(output_file)
+            write_span.set_attribute("output_size", os.path.getsize(output_path))
+        observe_pdf_stage("write", stage_start)
+        _report_progress(progress_callback, "write", 1.0)
         
         # 清理臨時文件
         cleanup_temp_files(temp_file, temp_image_file, repaired_pdf_path)
         
-        logger.info(f"Successfully created signed PDF: {output_path}")
+        logger.info("Successfully created signed PDF: %s", output_path)
         return True
         
     except Exception as e:
-        logger.error(f"PDF 簽名處理錯誤: {e}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.error("PDF 簽名處理錯誤: %s", e)
+        logger.error("Traceback: %s", traceback.format_exc())
         
         # 清理臨時文件
         cleanup_temp_files(temp_file, temp_image_file, repaired_pdf_path)
         return False
 
+def prepare_signature_layer(signature_image_data: str) -> bytes:
+    """
+    將簽名圖像轉為簽名圖層（縮放到簽名大小的透明背景 PNG）
+
+    多人簽署時每個簽名只保存圖層，全部簽署完成後由 apply_signature_layers 一次合成
+    """
+    if signature_image_data.startswith('data:image'):
+        signature_image_data = signature_image_data.split(',')[1]
+
+    image = Image.open(BytesIO(base64.b64decode(signature_image_data)))
+    if image.mode != 'RGBA':
+        image = image.convert('RGBA')
+    image.thumbnail((SIGNATURE_CONFIG['width'], SIGNATURE_CONFIG['height']), Image.Resampling.LANCZOS)
+
+    buffer = BytesIO()
+    image.save(buffer, 'PNG', optimize=True)
+    return buffer.getvalue()
+
+def apply_signature_layers(
+    original_pdf_path: str,
+    layers: list,
+    output_path: str,
+    progress_callback: Optional[Callable[[str, float], None]] = None
+) -> bool:
+    """
+    將多個簽名圖層一次合成到 PDF
+
+    所有簽名繪製在同一份覆蓋 PDF（每個有簽名的頁面一頁），每頁只合併一次，
+    原始文件只讀取及寫出一次，處理時間不隨簽署者人數倍增
+
+    Args:
+        original_pdf_path: 原始 PDF 文件路徑
+        layers: 簽名圖層，每項包含 image (PNG bytes)、field (SignatureField 欄位)、name、timestamp
+        output_path: 輸出文件路徑
+        progress_callback: 進度回呼 (階段, 0~1 的進度)
+    """
+    file_size = os.path.getsize(original_pdf_path) if os.path.exists(original_pdf_path) else 0
+    with span("pdf.sign_layers", file_size=file_size, layer_count=len(layers)) as sign_span:
+        stage_start = time.perf_counter()
+        try:
+            try:
+                reader = read_pdf_safely(original_pdf_path)
+                strategy = "standard"
+            except Exception as read_error:
+                logger.warning("Failed to read PDF normally, trying repair: %s", read_error)
+                with span("pdf.repair"):
+                    reader = create_repaired_pdf_reader(original_pdf_path)
+                strategy = "repaired"
+            total_pages = len(reader.pages)
+            sign_span.set_attribute("strategy", strategy)
+            sign_span.set_attribute("page_count", total_pages)
+            stage_start = observe_pdf_stage("load", stage_start)
+            _report_progress(progress_callback, "load", 0.2)
+
+            # 依頁面分組；超出範圍的頁碼改為最後一頁
+            layers_by_page = {}
+            for layer in layers:
+                page = layer["field"].get("page", -1)
+                page = page + total_pages if page < 0 else page
+                if not 0 <= page < total_pages:
+                    logger.warning("Signature field page %s out of range (%s pages), using last page", page, total_pages)
+                    page = total_pages - 1
+                layers_by_page.setdefault(page, []).append(layer)
+
+            with span("pdf.overlay"):
+                overlay_buffer = BytesIO()
+                c = canvas.Canvas(overlay_buffer)
+                overlay_pages = sorted(layers_by_page)
+                for page in overlay_pages:
+                    mediabox = reader.pages[page].mediabox
+                    page_width, page_height = float(mediabox.width), float(mediabox.height)
+                    c.setPageSize((page_width, page_height))
+                    slot = 0
+                    for layer in layers_by_page[page]:
+                        field = layer["field"]
+                        if field.get("x") is None or field.get("y") is None:
+                            x, y = calculate_signature_position(page_width, page_height, slot)
+                            slot += 1
+                        else:
+                            x, y = field["x"], field["y"]
+                        # 座標相對於頁面原點（mediabox 可能不是從 0 開始）
+                        x += float(mediabox.left)
+                        y += float(mediabox.bottom)
+                        width = field.get("width", SIGNATURE_CONFIG['width'])
+                        height = field.get("height", SIGNATURE_CONFIG['height'])
+                        c.drawImage(ImageReader(BytesIO(layer["image"])), x, y, width=width, height=height,
+                                    mask='auto', preserveAspectRatio=True, anchor='sw')
+
+                        c.setFillColorRGB(0, 0, 0, 0.8)
+                        c.setFont("Helvetica", SIGNATURE_CONFIG['font_size'])
+                        info_y = y - SIGNATURE_CONFIG['line_spacing']
+                        c.drawString(x, info_y, f"Signer: {layer.get('name', '')}")
+                        info_y -= SIGNATURE_CONFIG['line_spacing']
+                        c.drawString(x, info_y, f"Signature Time: {layer.get('timestamp', '')}")
+                    c.showPage()
+                c.save()
+                overlay_buffer.seek(0)
+                overlay_reader = PdfReader(overlay_buffer)
+            stage_start = observe_pdf_stage("overlay", stage_start)
+            _report_progress(progress_callback, "overlay", 0.4)
+
+            with span("pdf.merge"):
+                for index, page in enumerate(overlay_pages):
+                    reader.pages[page].merge_page(overlay_reader.pages[index])
+                writer = PdfWriter()
+                report_every = max(1, total_pages // 20)
+                for page_num in range(total_pages):
+                    writer.add_page(reader.pages[page_num])
+                    if page_num % report_every == 0:
+                        _report_progress(progress_callback, "merge", 0.4 + 0.3 * page_num / total_pages)
+            stage_start = observe_pdf_stage("merge", stage_start)
+            _report_progress(progress_callback, "write", 0.7)
+
+            with span("pdf.write") as write_span:
+                with open(output_path, 'wb') as output_file:
+                    writer.write(output_file)
+                write_span.set_attribute("output_size", os.path.getsize(output_path))
+            observe_pdf_stage("write", stage_start)
+            _report_progress(progress_callback, "write", 1.0)
+
+            sign_span.set_attribute("success", True)
+            logger.info("Applied %s signature layer(s) to %s", len(layers), output_path)
+            return True
+
+        except Exception as e:
+            logger.error("Failed to apply signature layers to %s: %s", original_pdf_path, e)
+            logger.debug("Traceback: %s", traceback.format_exc())
+            sign_span.set_attribute("success", False)
+            return False
+
 def get_pdf_content_for_fallback(original_pdf_path: str):
     """
     嘗試從損壞的PDF中提取一些基本信息用於fallback
@@ -644,7 +876,7 @@ def get_pdf_content_for_fallback(original_pdf_path: str):
         
         return info
     except Exception as e:
-        logger.error(f"Failed to extract PDF info: {e}")
+        logger.error("Failed to extract PDF info: %s", e)
         return {'filename': os.path.basename(original_pdf_path)}
 
 def cleanup_temp_files(*file_paths):
@@ -659,7 +891,7 @@ def cleanup_temp_files(*file_paths):
                 elif isinstance(file_path, str) and os.path.exists(file_path):
                     os.unlink(file_path)
             except Exception as e:
-                logger.warning(f"Failed to cleanup file {file_path}: {e}")
+                logger.warning("Failed to cleanup file %s: %s", file_path, e)
 
 def create_signature_page(signature_image_data: str, signature_info: dict):
     """
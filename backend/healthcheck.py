@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+容器健康檢查
+
+依 start_server.py 相同的設定（SERVER_HTTP_ENABLED、SERVER_HTTP_PORT、
+SERVER_HTTPS_PORT 及 SSL 證書）選擇已啟動的監聽端口，查詢 /health/live。
+任一服務器結束時 start_server.py 會停止所有服務器，檢查其中一個即可。
+"""
+import os
+import ssl
+import sys
+import urllib.request
+from app.core.config import settings
+
+def live_url() -> str:
+    if settings.server_http_enabled:
+        return f"http://127.0.0.1:{settings.server_http_port}/health/live"
+    return f"https://127.0.0.1:{settings.server_https_port}/health/live"
+
+def main():
+    if not settings.server_http_enabled and not (
+        os.path.exists(settings.server_ssl_keyfile) and os.path.exists(settings.server_ssl_certfile)
+    ):
+        print("沒有啟動的服務器", file=sys.stderr)
+        sys.exit(1)
+
+    # 連線本機，證書通常為自簽證書，不驗證主機名稱及證書鏈
+    context = ssl._create_unverified_context()
+    try:
+        urllib.request.urlopen(live_url(), timeout=5, context=context)
+    except Exception as e:
+        print(f"健康檢查失敗: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+bcrypt 成本基準測試
+
+測量各 bcrypt 成本下每個 CPU 核心每秒可計算的雜湊數，以及使用所有核心時的總量，
+用於評估登入容量並選擇 BCRYPT_ROUNDS。
+
+用法:
+    python scripts/benchmark_bcrypt.py
+    python scripts/benchmark_bcrypt.py --rounds 10 11 12 13 --duration 3 --processes 4
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passlib.hash import bcrypt
+
+PASSWORD = "benchmark-password"
+
+def measure(rounds: int, duration: float) -> dict:
+    """在單一程序中重複計算雜湊，回傳次數與耗時"""
+    handler = bcrypt.using(rounds=rounds)
+    count = 0
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    while time.perf_counter() - start < duration:
+        handler.hash(PASSWORD)
+        count += 1
+    return {
+        "count": count,
+        "wall": time.perf_counter() - start,
+        "cpu": time.process_time() - cpu_start
+    }
+
+def _measure_args(args):
+    return measure(*args)
+
+def benchmark(rounds: int, duration: float, processes: int) -> dict:
+    single = measure(rounds, duration)
+    per_core = single["count"] / single["wall"]
+
+    with Pool(processes) as pool:
+        results = pool.map(_measure_args, [(rounds, duration)] * processes)
+    total = sum(r["count"] / r["wall"] for r in results)
+
+    return {
+        "rounds": rounds,
+        "ms_per_hash": 1000 * single["wall"] / single["count"],
+        "hashes_per_sec_per_core": per_core,
+        "processes": processes,
+        "hashes_per_sec_total": total,
+        "scaling_efficiency": total / (per_core * processes)
+    }
+
+def main():
+    from app.core.config import settings
+
+    parser = argparse.ArgumentParser(description="bcrypt 成本基準測試")
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12, 13],
+                        help="要測試的 bcrypt 成本")
+    parser.add_argument("--duration", type=float, default=2.0,
+                        help="每個成本的測試秒數")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                        help="並行測試的程序數（預設為 CPU 核心數）")
+    parser.add_argument("--json", action="store_true", help="以 JSON 輸出結果")
+    args = parser.parse_args()
+
+    results = [benchmark(r, args.duration, args.processes) for r in args.rounds]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"目前設定 BCRYPT_ROUNDS={settings.bcrypt_rounds}，CPU 核心數 {os.cpu_count()}")
+    print(f"{'成本':>4} {'毫秒/次':>10} {'每核心/秒':>10} {'總計/秒':>10} {'擴展效率':>8}")
+    for r in results:
+        marker = " *" if r["rounds"] == settings.bcrypt_rounds else ""
+        print(f"{r['rounds']:>4} {r['ms_per_hash']:>10.1f} {r['hashes_per_sec_per_core']:>10.1f} "
+              f"{r['hashes_per_sec_total']:>10.1f} {r['scaling_efficiency']:>8.0%}{marker}")
+    print("每次登入需要一次 bcrypt 驗證；總計/秒約為可承受的登入次數上限")
+
+if __name__ == "__main__":
+    main()
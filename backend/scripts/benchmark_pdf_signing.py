@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+PDF 簽署基準測試
+
+在本機產生合成 PDF（1、10、100、1000 頁，純文字及大量圖片，以及缺少 %%EOF、
+檔頭前有雜訊、檔案被截斷等損壞版本），以 add_signature_to_pdf 完整簽署，
+記錄耗時、CPU 時間、最高記憶體用量及輸出大小。損壞的檔案會走修復或 fallback 流程。
+
+每個測試案例在獨立的子程序中執行，記憶體用量不受其他案例影響；
+產生的 PDF 內容固定（reportlab invariant 模式及固定亂數種子），結果可重現。
+
+用法:
+    python scripts/benchmark_pdf_signing.py
+    python scripts/benchmark_pdf_signing.py --pages 1 10 100 --variants text image --output baseline.json
+    python scripts/benchmark_pdf_signing.py --compare baseline.json --threshold 0.15
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from io import BytesIO
+from multiprocessing import get_context
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PAGE_COUNTS = [1, 10, 100, 1000]
+VARIANTS = ["text", "image"]
+DAMAGES = ["missing_eof", "junk_header", "truncated"]
+
+# 比較時忽略小於此值的差異（秒 / MB），避免短案例的測量誤差被當成退步
+MIN_TIME_DELTA = 0.005
+MIN_RSS_DELTA = 2.0
+
+def build_pdf(path: str, pages: int, variant: str):
+    """產生合成 PDF（純文字或每頁一張不同的圖片）"""
+    from PIL import Image
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+
+    rng = random.Random(pages)
+    c = canvas.Canvas(path, pagesize=A4, invariant=1)
+    width, height = A4
+
+    for page in range(pages):
+        c.setFont("Helvetica", 10)
+        y = height - 60
+        for line in range(45):
+            words = " ".join(rng.choice(["contract", "party", "agreement", "signature", "clause", "term"])
+                             for _ in range(12))
+            c.drawString(50, y, f"{page + 1}.{line + 1} {words}")
+            y -= 15
+
+        if variant == "image":
+            image = Image.frombytes("RGB", (320, 240), rng.randbytes(320 * 240 * 3))
+            buffer = BytesIO()
+            image.save(buffer, "JPEG", quality=85)
+            buffer.seek(0)
+            c.drawImage(ImageReader(buffer), 50, 80, width=320, height=240)
+
+        c.showPage()
+    c.save()
+
+def damage_pdf(path: str, damage: str):
+    """產生損壞版本"""
+    with open(path, "rb") as f:
+        content = f.read()
+
+    if damage == "missing_eof":
+        content = content.rstrip()
+        if content.endswith(b"%%EOF"):
+            content = content[:-len(b"%%EOF")]
+    elif damage == "junk_header":
+        content = b"\x00garbage-before-header\r\n" * 64 + content
+    elif damage == "truncated":
+        content = content[:int(len(content) * 0.7)]
+
+    with open(path, "wb") as f:
+        f.write(content)
+
+def build_signature() -> str:
+    """產生簽名圖片（透明背景的手寫線條）"""
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(0)
+    image = Image.new("RGBA", (400, 150), (255, 255, 255, 0))
+    draw = ImageDraw.Draw(image)
+    points = [(20 + i * 12, 75 + rng.randint(-40, 40)) for i in range(31)]
+    draw.line(points, fill=(0, 0, 0, 255), width=4, joint="curve")
+
+    buffer = BytesIO()
+    image.save(buffer, "PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+def build_cases(pages_list, variants, damage_pages: int) -> list:
+    cases = [{"name": f"{variant}-{pages}p", "pages": pages, "variant": variant, "damage": None}
+             for variant in variants for pages in pages_list]
+    cases += [{"name": f"text-{damage_pages}p-{damage}", "pages": damage_pages, "variant": "text", "damage": damage}
+              for damage in DAMAGES]
+    return cases
+
+def generate_input(case: dict, work_dir: str) -> str:
+    """產生測試案例的輸入 PDF（在另一個子程序中執行，不計入簽署的記憶體用量）"""
+    input_path = os.path.join(work_dir, f"{case['name']}.pdf")
+    build_pdf(input_path, case["pages"], case["variant"])
+    if case["damage"]:
+        damage_pdf(input_path, case["damage"])
+    return input_path
+
+def run_case(case: dict, input_path: str, repeat: int, work_dir: str) -> dict:
+    """在子程序中執行：預熱後重複簽署並測量"""
+    import logging
+    # 損壞版本預期會走修復流程並記錄警告，測試時不輸出日誌
+    logging.disable(logging.CRITICAL)
+
+    from PyPDF2 import PdfReader
+    from app.core.warmup import sign_sample_pdf
+    from app.utils.pdf_utils import add_signature_to_pdf
+
+    output_path = os.path.join(work_dir, f"{case['name']}-signed.pdf")
+    signature = build_signature()
+    signature_info = {"name": "Benchmark Signer", "timestamp": "2024-01-01 00:00:00"}
+
+    # 預熱後的記憶體作為基準，峰值扣除基準即為簽署所需的記憶體
+    sign_sample_pdf()
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    walls, cpus = [], []
+    success = True
+    for _ in range(repeat):
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        success = add_signature_to_pdf(input_path, signature, signature_info, output_path) and success
+        cpus.append(time.process_time() - cpu_start)
+        walls.append(time.perf_counter() - wall_start)
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    output_size = os.path.getsize(output_path) if os.path.exists(output_path) else 0
+    try:
+        output_pages = len(PdfReader(output_path).pages) if output_size else 0
+    except Exception:
+        output_pages = 0
+
+    return {
+        **case,
+        "success": success,
+        "input_size": os.path.getsize(input_path),
+        "output_size": output_size,
+        "output_pages": output_pages,
+        "wall_s": round(statistics.median(walls), 4),
+        "wall_min_s": round(min(walls), 4),
+        "cpu_s": round(statistics.median(cpus), 4),
+        # Linux 的 ru_maxrss 單位為 KB
+        "peak_rss_mb": round(peak_rss / 1024, 1),
+        "sign_rss_mb": round((peak_rss - baseline_rss) / 1024, 1),
+        "repeat": repeat
+    }
+
+def _run_in_child(func, *args):
+    # 以 spawn 啟動乾淨的子程序；Linux 的峰值記憶體會繼承自建立子程序的程序，
+    # 因此主程序本身不產生大型資料，保持很小的記憶體用量
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        return pool.submit(func, *args).result()
+
+def run_isolated(case: dict, repeat: int, work_dir: str) -> dict:
+    input_path = _run_in_child(generate_input, case, work_dir)
+    result = _run_in_child(run_case, case, input_path, repeat, work_dir)
+    os.remove(input_path)
+    if os.path.exists(os.path.join(work_dir, f"{case['name']}-signed.pdf")):
+        os.remove(os.path.join(work_dir, f"{case['name']}-signed.pdf"))
+    return result
+
+def environment() -> dict:
+    import PyPDF2
+    import reportlab
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pypdf2": PyPDF2.__version__,
+        "reportlab": reportlab.Version
+    }
+
+def compare(results: list, baseline: dict, threshold: float) -> list:
+    """與基準結果比較，回傳退步的項目"""
+    baseline_cases = {r["name"]: r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        base = baseline_cases.get(result["name"])
+        if base is None:
+            continue
+        if base["success"] and not result["success"]:
+            regressions.append({"name": result["name"], "metric": "success", "baseline": True, "current": False})
+        for metric, min_delta in (("wall_s", MIN_TIME_DELTA), ("cpu_s", MIN_TIME_DELTA), ("sign_rss_mb", MIN_RSS_DELTA)):
+            old, new = base[metric], result[metric]
+            if new - old > min_delta and new > old * (1 + threshold):
+                regressions.append({
+                    "name": result["name"],
+                    "metric": metric,
+                    "baseline": old,
+                    "current": new,
+                    "change": f"{(new / old - 1) if old else float('inf'):+.0%}"
+                })
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF 簽署基準測試")
+    parser.add_argument("--pages", type=int, nargs="+", default=PAGE_COUNTS, help="頁數")
+    parser.add_argument("--variants", nargs="+", choices=VARIANTS, default=VARIANTS, help="內容類型")
+    parser.add_argument("--damage-pages", type=int, default=10, help="損壞版本的頁數，0 表示不測試損壞版本")
+    parser.add_argument("--repeat", type=int, default=3, help="每個案例重複簽署的次數（取中位數）")
+    parser.add_argument("--output", help="將結果寫入 JSON 檔案")
+    parser.add_argument("--compare", help="與先前輸出的 JSON 結果比較")
+    parser.add_argument("--threshold", type=float, default=0.10, help="超過基準此比例即視為退步")
+    args = parser.parse_args()
+
+    cases = build_cases(args.pages, args.variants, args.damage_pages)
+    if not args.damage_pages:
+        cases = [case for case in cases if case["damage"] is None]
+
+    results = []
+    print(f"{'案例':<26} {'成功':>4} {'耗時 s':>9} {'CPU s':>9} {'簽署 MB':>8} {'峰值 MB':>8} {'輸出 KB':>10} {'頁數':>5}")
+    with tempfile.TemporaryDirectory(prefix="esigned-bench-") as work_dir:
+        for case in cases:
+            r = run_isolated(case, args.repeat, work_dir)
+            results.append(r)
+            print(f"{r['name']:<26} {'是' if r['success'] else '否':>4} {r['wall_s']:>9.3f} {r['cpu_s']:>9.3f} "
+                  f"{r['sign_rss_mb']:>8.1f} {r['peak_rss_mb']:>8.1f} {r['output_size'] / 1024:>10.1f} {r['output_pages']:>5}")
+
+    report = {"environment": environment(), "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"結果已寫入 {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n與 {args.compare} 比較，發現 {len(regressions)} 項退步（門檻 {args.threshold:.0%}）:")
+            for item in regressions:
+                print(f"  {item['name']:<26} {item['metric']:<12} {item['baseline']} -> {item['current']} {item.get('change', '')}")
+            sys.exit(1)
+        print(f"\n與 {args.compare} 比較，沒有超過 {args.threshold:.0%} 的退步")
+
+if __name__ == "__main__":
+    main()
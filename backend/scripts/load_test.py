@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+API 負載測試
+
+serve: 啟動 app.main:app 並建立測試資料（N 個用戶、M 份待簽署文件）。
+       預設使用程序內的 mongomock-motor 代替 MongoDB，不需要網路或資料庫即可執行；
+       指定 --mongodb-url 時使用本機的 mongod。頻率限制及郵件發送會關閉。
+
+run:   以指定的並行數模擬用戶操作（登入、瀏覽列表、預覽、上傳、簽署），
+       輸出各端點的請求數、每秒請求數及 p50/p95/p99 延遲。
+
+開發依賴請參考 requirements-dev.txt。
+
+用法:
+    python scripts/load_test.py serve --users 50 --documents 500
+    python scripts/load_test.py run --users 50 --concurrency 20 --duration 60
+    python scripts/load_test.py run --mix login=5,browse=50,preview=25,sign=15,upload=5 --output report.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+USERNAME_PREFIX = "loaduser"
+ADMIN_USERNAME = "loadadmin"
+DEFAULT_MIX = "login=5,browse=50,preview=25,sign=15,upload=5"
+
+# 1x1 PNG 簽名圖片
+SIGNATURE_IMAGE = (
+    "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=="
+)
+
+def build_pdf(pages: int) -> bytes:
+    from reportlab.pdfgen import canvas
+
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, invariant=1)
+    for page in range(pages):
+        c.setFont("Helvetica", 11)
+        for line in range(40):
+            c.drawString(60, 780 - line * 18, f"Load test document page {page + 1} line {line + 1}")
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+# ---------------------------------------------------------------- serve
+
+def configure_environment(args):
+    """在載入應用程式前設定環境變數（Settings 於載入時讀取）"""
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="esigned-load-")
+    os.environ["UPLOAD_PATH"] = data_dir
+    os.environ["DOC_TO_SIGN_PATH"] = os.path.join(data_dir, "DocToSign")
+    os.environ["SIGNED_DOC_PATH"] = os.path.join(data_dir, "SignedDoc")
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ["NOTIFICATIONS_ENABLED"] = "false"
+    os.environ["EMAIL_OUTBOX_WORKERS"] = "0"
+    os.environ["LOG_LEVEL"] = args.log_level
+    if args.mongodb_url:
+        os.environ["MONGODB_URL"] = args.mongodb_url
+    else:
+        # mongomock 不支援 change stream，不輸出重試時的錯誤日誌
+        os.environ.setdefault("LOG_LEVELS", "app.core.change_streams=CRITICAL")
+    return data_dir
+
+async def seed(users: int, documents: int, pages: int, password: str):
+    from app.core.config import settings
+    from app.core.search import build_search_tokens
+    from app.core.security import get_password_hash
+    from app.database import get_database
+
+    db = await get_database()
+    now = datetime.utcnow()
+    password_hash = get_password_hash(password)
+
+    # 重複執行時先清除上次的測試資料
+    await db.users.delete_many({"username": {"$regex": f"^({USERNAME_PREFIX}\\d+|{ADMIN_USERNAME})$"}})
+    await db.documents.delete_many({"load_test": True})
+
+    accounts = [(ADMIN_USERNAME, "admin")] + [(f"{USERNAME_PREFIX}{i}", "user") for i in range(users)]
+    await db.users.insert_many([{
+        "username": username,
+        "email": f"{username}@loadtest.local",
+        "full_name": username,
+        "password": password_hash,
+        "role": role,
+        "is_active": True,
+        "created_at": now,
+        "updated_at": now
+    } for username, role in accounts])
+
+    os.makedirs(settings.doc_to_sign_path, exist_ok=True)
+    content = build_pdf(pages)
+    docs = []
+    for i in range(documents):
+        original_filename = f"load-{i:06d}.pdf"
+        filename = f"{uuid.uuid4()}_{original_filename}"
+        file_path = os.path.join(settings.doc_to_sign_path, filename)
+        with open(file_path, "wb") as f:
+            f.write(content)
+        docs.append({
+            "filename": filename,
+            "original_filename": original_filename,
+            "file_path": file_path,
+            "file_size": len(content),
+            "status": "uploaded",
+            "uploaded_by": ADMIN_USERNAME,
+            "search_tokens": build_search_tokens(original_filename),
+            "load_test": True,
+            "created_at": now,
+            "updated_at": now
+        })
+    if docs:
+        await db.documents.insert_many(docs)
+
+async def serve(args):
+    import uvicorn
+
+    if not args.mongodb_url:
+        try:
+            import mongomock_motor
+        except ImportError:
+            sys.exit("未安裝 mongomock-motor（pip install -r requirements-dev.txt），或以 --mongodb-url 指定 MongoDB")
+        import app.database
+        app.database.AsyncIOMotorClient = mongomock_motor.AsyncMongoMockClient
+
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        start = time.perf_counter()
+        await seed(args.users, args.documents, args.pages, args.password)
+        print(f"已建立 {args.users} 個用戶（{USERNAME_PREFIX}0..{USERNAME_PREFIX}{args.users - 1}、{ADMIN_USERNAME}，"
+              f"密碼 {args.password}）及 {args.documents} 份文件，耗時 {time.perf_counter() - start:.1f} 秒")
+        print(f"資料目錄: {os.environ['UPLOAD_PATH']}")
+        print(f"服務位址: http://{args.host}:{args.port}")
+        config = uvicorn.Config(app, host=args.host, port=args.port, lifespan="off",
+                                access_log=False, log_level="warning")
+        await uvicorn.Server(config).serve()
+
+# ---------------------------------------------------------------- run
+
+class Recorder:
+    """依端點記錄延遲及結果"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint: str, latency: float, status_code: int, ok: bool):
+        self.latencies[endpoint].append(latency)
+        self.statuses[endpoint][status_code] += 1
+        if not ok:
+            self.errors[endpoint] += 1
+
+    @staticmethod
+    def percentile(values, p: float) -> float:
+        ordered = sorted(values)
+        index = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))
+        return ordered[index]
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            endpoints[endpoint] = {
+                "requests": len(values),
+                "errors": self.errors[endpoint],
+                "rps": round(len(values) / elapsed, 2),
+                "p50_ms": round(self.percentile(values, 50) * 1000, 1),
+                "p95_ms": round(self.percentile(values, 95) * 1000, 1),
+                "p99_ms": round(self.percentile(values, 99) * 1000, 1),
+                "max_ms": round(max(values) * 1000, 1),
+                "statuses": dict(self.statuses[endpoint])
+            }
+        total = sum(len(values) for values in self.latencies.values())
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "requests": total,
+            "errors": sum(self.errors.values()),
+            "rps": round(total / elapsed, 2) if elapsed else 0,
+            "endpoints": endpoints
+        }
+
+class LoadTest:
+    def __init__(self, client, args):
+        self.client = client
+        self.args = args
+        self.recorder = Recorder()
+        self.available_ids = []
+        self.upload_content = build_pdf(args.pages)
+        self.admin_token = None
+        self.deadline = 0.0
+
+    async def request(self, endpoint: str, method: str, url: str, expected=(200,), **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except Exception:
+            self.recorder.record(endpoint, time.perf_counter() - start, 0, False)
+            return None
+        self.recorder.record(endpoint, time.perf_counter() - start, response.status_code,
+                             response.status_code in expected)
+        return response
+
+    async def login(self, username: str):
+        response = await self.request("login", "POST", "/api/auth/login",
+                                      data={"username": username, "password": self.args.password})
+        if response is not None and response.status_code == 200:
+            return response.json()["access_token"]
+        return None
+
+    def headers(self, token: str) -> dict:
+        return {"Authorization": f"Bearer {token}"}
+
+    async def refresh_available(self, token: str):
+        response = await self.request("list_available", "GET", "/api/documents/available",
+                                      headers=self.headers(token))
+        if response is not None and response.status_code == 200:
+            self.available_ids = [doc["id"] for doc in response.json()]
+
+    async def browse(self, token: str):
+        await self.refresh_available(token)
+        await self.request("list_signed", "GET", "/api/documents/signed", headers=self.headers(token))
+
+    async def preview(self, token: str):
+        if not self.available_ids:
+            await self.refresh_available(token)
+        if self.available_ids:
+            document_id = random.choice(self.available_ids)
+            # 文件可能剛被其他用戶簽署
+            await self.request("preview", "GET", f"/api/documents/{document_id}/preview",
+                               expected=(200, 403, 404), params={"token": token})
+
+    async def sign(self, token: str, username: str):
+        if not self.available_ids:
+            await self.refresh_available(token)
+        if not self.available_ids:
+            return
+        # 從共用清單取出，避免多個用戶簽署同一份文件
+        document_id = self.available_ids.pop(random.randrange(len(self.available_ids)))
+        signature_data = json.dumps({"signature_image": SIGNATURE_IMAGE, "name": username,
+                                     "timestamp": datetime.utcnow().isoformat()})
+        await self.request("sign", "POST", f"/api/documents/{document_id}/sign",
+                           expected=(200, 400), headers=self.headers(token),
+                           json={"signature_data": signature_data})
+
+    async def upload(self):
+        files = {"file": (f"upload-{uuid.uuid4().hex}.pdf", self.upload_content, "application/pdf")}
+        response = await self.request("upload", "POST", "/api/documents/upload",
+                                      headers=self.headers(self.admin_token), files=files)
+        if response is not None and response.status_code == 200:
+            self.available_ids.append(response.json()["id"])
+
+    async def virtual_user(self, index: int, journeys: list, weights: list):
+        username = f"{USERNAME_PREFIX}{index % self.args.users}"
+        token = await self.login(username)
+        while token and time.perf_counter() < self.deadline:
+            journey = random.choices(journeys, weights)[0]
+            if journey == "login":
+                token = await self.login(username) or token
+            elif journey == "browse":
+                await self.browse(token)
+            elif journey == "preview":
+                await self.preview(token)
+            elif journey == "sign":
+                await self.sign(token, username)
+            elif journey == "upload":
+                await self.upload()
+
+    async def run(self) -> dict:
+        mix = parse_mix(self.args.mix)
+        journeys, weights = list(mix), list(mix.values())
+
+        self.admin_token = await self.login(ADMIN_USERNAME)
+        if self.admin_token is None:
+            sys.exit(f"無法以 {ADMIN_USERNAME} 登入，請先執行 serve 建立測試資料")
+        await self.refresh_available(self.admin_token)
+        # 準備階段的請求不計入結果
+        self.recorder = Recorder()
+
+        start = time.perf_counter()
+        self.deadline = start + self.args.duration
+        await asyncio.gather(*(self.virtual_user(i, journeys, weights) for i in range(self.args.concurrency)))
+        return self.recorder.report(time.perf_counter() - start)
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for item in value.split(","):
+        name, weight = item.split("=")
+        if name not in ("login", "browse", "preview", "sign", "upload"):
+            raise argparse.ArgumentTypeError(f"未知的操作: {name}")
+        mix[name] = float(weight)
+    return mix
+
+async def wait_until_ready(client, timeout: float):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if (await client.get("/health/ready")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.5)
+    sys.exit("服務未就緒")
+
+async def run(args):
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout, verify=False) as client:
+        await wait_until_ready(client, 60)
+        report = await LoadTest(client, args).run()
+
+    report["config"] = {
+        "base_url": args.base_url,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "mix": parse_mix(args.mix)
+    }
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"結果已寫入 {args.output}")
+
+def print_report(report: dict):
+    print(f"{'端點':<16} {'請求數':>8} {'錯誤':>6} {'每秒':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'最大 ms':>9}")
+    for endpoint, r in report["endpoints"].items():
+        print(f"{endpoint:<16} {r['requests']:>8} {r['errors']:>6} {r['rps']:>8.1f} {r['p50_ms']:>9.1f} "
+              f"{r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['max_ms']:>9.1f}")
+    print(f"{'總計':<16} {report['requests']:>8} {report['errors']:>6} {report['rps']:>8.1f}"
+          f"（{report['elapsed_s']} 秒）")
+
+def main():
+    parser = argparse.ArgumentParser(description="API 負載測試")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="啟動服務並建立測試資料")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=7090)
+    serve_parser.add_argument("--mongodb-url", help="使用 MongoDB（預設使用程序內的 mongomock-motor）")
+    serve_parser.add_argument("--users", type=int, default=50, help="一般用戶數")
+    serve_parser.add_argument("--documents", type=int, default=500, help="待簽署文件數")
+    serve_parser.add_argument("--pages", type=int, default=3, help="每份文件的頁數")
+    serve_parser.add_argument("--password", default="loadtest-password")
+    serve_parser.add_argument("--data-dir", help="上傳檔案目錄（預設為暫存目錄）")
+    serve_parser.add_argument("--log-level", default="WARNING")
+
+    run_parser = subparsers.add_parser("run", help="執行負載測試")
+    run_parser.add_argument("--base-url", default="http://127.0.0.1:7090")
+    run_parser.add_argument("--users", type=int, default=50, help="serve 建立的一般用戶數")
+    run_parser.add_argument("--password", default="loadtest-password")
+    run_parser.add_argument("--concurrency", type=int, default=20, help="同時操作的虛擬用戶數")
+    run_parser.add_argument("--duration", type=float, default=60, help="測試秒數")
+    run_parser.add_argument("--mix", default=DEFAULT_MIX, help=f"各操作的權重（預設 {DEFAULT_MIX}）")
+    run_parser.add_argument("--pages", type=int, default=3, help="上傳文件的頁數")
+    run_parser.add_argument("--timeout", type=float, default=60)
+    run_parser.add_argument("--output", help="將結果寫入 JSON 檔案")
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        configure_environment(args)
+        asyncio.run(serve(args))
+    else:
+        parse_mix(args.mix)
+        asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,128 @@
 #!/usr/bin/env python3
-import asyncio
-import uvicorn
+"""
+生產環境服務器啟動程式
+
+HTTP 與 HTTPS 各由一個 gunicorn master 管理，每個 master 預先 fork 多個
+uvicorn worker 共用同一個監聽 socket。worker 處理一定數量的請求後重啟，
+重啟門檻加上隨機值，避免所有 worker 同時重啟。
+
+平滑重啟（逐步以新 worker 取代舊 worker，進行中的請求會完成）:
+    kill -HUP <start_server.py 的 PID>
+
+調整 worker 數量:
+    kill -TTIN / -TTOU <start_server.py 的 PID>
+
+設定請參考 app/core/config.py 中的 server_* 項目（環境變數 SERVER_WORKERS 等）
+"""
+import logging
+import multiprocessing
 import os
-from multiprocessing import Process
-
-def start_http_server():
-    """啟動 HTTP 服務器"""
-    uvicorn.run(
-        "app.main:app",
-        host="0.0.0.0",
-        port=7080,
-        reload=False,
-        limit_max_requests=1000,
-        timeout_keep_alive=60,
-        timeout_graceful_shutdown=30
+import signal
+import sys
+import tempfile
+from multiprocessing.connection import wait
+from gunicorn.app.base import BaseApplication
+from app.core.config import settings
+
+logger = logging.getLogger("start_server")
+
+class ServerApplication(BaseApplication):
+    """以程式設定啟動的 gunicorn 應用程式"""
+
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        # 每個 worker fork 後才載入應用程式，HUP 重啟時會載入新的程式碼
+        from app.main import app
+        return app
+
+def child_exit(server, worker):
+    from app.core.metrics import mark_worker_dead
+    mark_worker_dead(worker.pid)
+
+def prepare_metrics_dir():
+    """建立各 worker 共用的 Prometheus 指標目錄，並清除上次執行留下的檔案"""
+    directory = os.environ.setdefault(
+        "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "esigned-metrics")
     )
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith(".db"):
+            os.remove(os.path.join(directory, name))
+
+def build_options(name: str, port: int, ssl: bool = False) -> dict:
+    options = {
+        "bind": [f"0.0.0.0:{port}"],
+        "workers": settings.server_workers or multiprocessing.cpu_count(),
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "max_requests": settings.server_max_requests,
+        "max_requests_jitter": settings.server_max_requests_jitter,
+        "timeout": settings.server_timeout,
+        "graceful_timeout": settings.server_graceful_timeout,
+        "keepalive": settings.server_keepalive,
+        "proc_name": f"esigned-{name}",
+        "accesslog": "-",
+        "errorlog": "-",
+        "child_exit": child_exit,
+    }
+    if ssl:
+        options["keyfile"] = settings.server_ssl_keyfile
+        options["certfile"] = settings.server_ssl_certfile
+    return options
+
+def run_server(options: dict):
+    ServerApplication(options).run()
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s] [%(name)s] %(message)s")
+
+    # 必須在 fork worker 前設定，HTTP 與 HTTPS 的 worker 共用同一個目錄
+    prepare_metrics_dir()
+
+    servers = []
+    if settings.server_http_enabled:
+        servers.append(("http", build_options("http", settings.server_http_port)))
+    if os.path.exists(settings.server_ssl_keyfile) and os.path.exists(settings.server_ssl_certfile):
+        servers.append(("https", build_options("https", settings.server_https_port, ssl=True)))
+    else:
+        logger.warning("找不到 SSL 證書，不啟動 HTTPS 服務器")
+
+    if not servers:
+        logger.error("沒有可啟動的服務器")
+        sys.exit(1)
+
+    processes = []
+    for name, options in servers:
+        process = multiprocessing.Process(target=run_server, args=(options,), name=name)
+        process.start()
+        logger.info(f"{name} 服務器已啟動: {options['bind'][0]}，{options['workers']} 個 worker (PID {process.pid})")
+        processes.append(process)
+
+    def forward_signal(signum, frame):
+        """將信號轉送給各個 gunicorn master"""
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signum)
+
+    for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGTTIN, signal.SIGTTOU):
+        signal.signal(signum, forward_signal)
+
+    # 任一服務器結束時停止其他服務器，由容器重新啟動
+    wait([process.sentinel for process in processes])
+    exit_code = 0
+    for process in processes:
+        if process.is_alive():
+            os.kill(process.pid, signal.SIGTERM)
+        process.join()
+        exit_code = exit_code or process.exitcode or 0
 
-def start_https_server():
-    """啟動 HTTPS 服務器"""
-    ssl_keyfile = "/app/certs/key.pem"
-    ssl_certfile = "/app/certs/cert.pem"
-    
-    if os.path.exists(ssl_keyfile) and os.path.exists(ssl_certfile):
-        uvicorn.run(
-            "app.main:app",
-            host="0.0.0.0",
-            port=7443,
-            ssl_keyfile=ssl_keyfile,
-            ssl_certfile=ssl_certfile,
-            reload=False,
-            limit_max_requests=1000,
-            timeout_keep_alive=60,
-            timeout_graceful_shutdown=30
-        )
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
-    # 啟動 HTTP 服務器
-    http_process = Process(target=start_http_server)
-    http_process.start()
-    
-    # 啟動 HTTPS 服務器
-    https_process = Process(target=start_https_server)
-    https_process.start()
-    
-    try:
-        # 等待兩個進程
-        http_process.join()
-        https_process.join()
-    except KeyboardInterrupt:
-        # 終止進程
-        http_process.terminate()
-        https_process.terminate()
-        http_process.join()
-        https_process.join()
+    main()
@@ -0,0 +1,136 @@
+"""
+API 行為測試的共用設定
+
+以 mongomock-motor 取代 MongoDB，應用程式在整個測試階段只啟動一次（lifespan），
+每個測試開始前清空資料庫及各程序內的狀態（用戶快取、撤銷清單、頻率限制）。
+不啟動郵件發送工作者，不連線 SMTP 伺服器
+"""
+import io
+import json
+import os
+import tempfile
+from datetime import datetime
+
+# 必須在匯入 app 之前設定，Settings 於匯入時讀取環境變數
+_upload_path = tempfile.mkdtemp(prefix="esigned-test-")
+os.environ.update({
+    "UPLOAD_PATH": _upload_path,
+    "DOC_TO_SIGN_PATH": os.path.join(_upload_path, "DocToSign"),
+    "SIGNED_DOC_PATH": os.path.join(_upload_path, "SignedDoc"),
+    "WARMUP_ENABLED": "false",
+    "BCRYPT_ROUNDS": "4",
+    "LOG_FORMAT": "text",
+    "LOG_LEVEL": "WARNING",
+    "NOTIFICATIONS_ENABLED": "false",
+    "EMAIL_OUTBOX_WORKERS": "0",
+    "SIGN_JOB_POLL_SECONDS": "0.1",
+    "SIGN_JOB_PROGRESS_SECONDS": "0.1",
+    "SIGN_JOB_EVENTS_POLL_SECONDS": "0.05",
+    "TRACING_JSONL_PATH": os.path.join(_upload_path, "traces.jsonl"),
+})
+
+import httpx
+import mongomock_motor
+import pytest
+
+import app.database as database
+database.AsyncIOMotorClient = mongomock_motor.AsyncMongoMockClient
+
+from app.main import app
+from app.core.cache import user_cache
+from app.core.config import settings
+from app.core.rate_limit import MemoryTokenBucketStore, rate_limiter
+from app.core.revocation import token_revocations
+from app.core.security import get_password_hash
+
+PASSWORD = "pw1234"
+
+# 1x1 PNG 簽名圖片
+SIGNATURE_IMAGE = (
+    "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=="
+)
+
+def make_pdf(pages: int = 2, text: str = "Hello invoice") -> bytes:
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer)
+    for page in range(pages):
+        pdf.drawString(100, 700, f"{text} page {page}")
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+def signature_payload(name: str) -> dict:
+    return {"signature_data": json.dumps({"signature_image": SIGNATURE_IMAGE, "name": name, "timestamp": "now"})}
+
+def auth_header(tokens: dict) -> dict:
+    return {"Authorization": f"Bearer {tokens['access_token']}"}
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture(scope="session")
+async def started_app(anyio_backend):
+    async with app.router.lifespan_context(app):
+        yield app
+
+@pytest.fixture
+async def db(started_app):
+    database_ = await database.get_database()
+    for name in await database_.list_collection_names():
+        await database_[name].delete_many({})
+
+    user_cache.clear()
+    token_revocations.revoked_jtis.clear()
+    token_revocations.revoked_users.clear()
+    token_revocations.user_versions.clear()
+    rate_limiter.store = MemoryTokenBucketStore(settings.rate_limit_max_keys)
+    return database_
+
+@pytest.fixture
+async def client(db):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        yield client
+
+@pytest.fixture
+def create_user(db):
+    async def create(username: str, role: str = "user", is_active: bool = True) -> dict:
+        now = datetime.utcnow()
+        user = {
+            "username": username,
+            "email": f"{username}@example.com",
+            "password": get_password_hash(PASSWORD),
+            "role": role,
+            "is_active": is_active,
+            "created_at": now,
+            "updated_at": now
+        }
+        result = await db.users.insert_one(user)
+        user["_id"] = result.inserted_id
+        return user
+    return create
+
+@pytest.fixture
+def login(client):
+    async def login(username: str, password: str = PASSWORD) -> dict:
+        response = await client.post("/api/auth/login", data={"username": username, "password": password})
+        assert response.status_code == 200, response.text
+        return response.json()
+    return login
+
+@pytest.fixture
+def upload(client):
+    async def upload(tokens: dict, filename: str = "invoice.pdf", signers=None) -> dict:
+        data = {"signers": json.dumps(signers)} if signers is not None else None
+        response = await client.post(
+            "/api/documents/upload",
+            files={"file": (filename, make_pdf(), "application/pdf")},
+            data=data,
+            headers=auth_header(tokens)
+        )
+        assert response.status_code == 200, response.text
+        return response.json()
+    return upload
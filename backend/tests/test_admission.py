@@ -0,0 +1,64 @@
+from contextlib import asynccontextmanager
+
+import pytest
+
+from app.core.admission import admission_limiters, admission_stats
+from conftest import auth_header, make_pdf, signature_payload
+
+pytestmark = pytest.mark.anyio
+
+@asynccontextmanager
+async def saturated(name: str):
+    """佔用准入限制的所有名額"""
+    limiter = admission_limiters[name]
+    for _ in range(limiter.max_concurrency):
+        await limiter.acquire()
+    try:
+        yield limiter
+    finally:
+        for _ in range(limiter.max_concurrency):
+            limiter.release()
+
+async def sign(client, document_id: str, tokens: dict):
+    return await client.post(
+        f"/api/documents/{document_id}/sign",
+        json=signature_payload("alice"),
+        headers=auth_header(tokens)
+    )
+
+async def test_sign_queue_timeout_returns_503(client, create_user, login, upload, monkeypatch):
+    await create_user("admin", role="admin")
+    await create_user("alice")
+    document = await upload(await login("admin"))
+    alice = await login("alice")
+    monkeypatch.setattr(admission_limiters["sign"], "queue_timeout", 0.05)
+
+    async with saturated("sign") as limiter:
+        rejected = limiter.rejected
+        response = await sign(client, document["id"], alice)
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert limiter.rejected == rejected + 1
+        assert limiter.queued == 0
+
+    # 名額釋放後同一份文件可以正常簽署，且處理完成後釋放名額
+    response = await sign(client, document["id"], alice)
+    assert response.status_code == 200, response.text
+    assert admission_stats()["sign"]["in_flight"] == 0
+
+async def test_upload_queue_full_returns_429(client, create_user, login, monkeypatch):
+    await create_user("admin", role="admin")
+    admin = await login("admin")
+    monkeypatch.setattr(admission_limiters["upload"], "max_queue", 0)
+
+    async with saturated("upload"):
+        response = await client.post(
+            "/api/documents/upload",
+            files={"file": ("invoice.pdf", make_pdf(), "application/pdf")},
+            headers=auth_header(admin)
+        )
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert admission_stats()["upload"]["in_flight"] == 0
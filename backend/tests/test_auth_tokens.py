@@ -0,0 +1,117 @@
+import pytest
+
+from conftest import auth_header
+
+pytestmark = pytest.mark.anyio
+
+# /api/documents/ 只依令牌 claims 授權，/api/auth/me 從資料庫載入用戶
+CLAIMS_ENDPOINT = "/api/documents/"
+DATABASE_ENDPOINT = "/api/auth/me"
+
+async def assert_accepted(client, tokens):
+    for endpoint in (CLAIMS_ENDPOINT, DATABASE_ENDPOINT):
+        response = await client.get(endpoint, headers=auth_header(tokens))
+        assert response.status_code == 200, f"{endpoint}: {response.text}"
+
+async def assert_rejected(client, tokens):
+    for endpoint in (CLAIMS_ENDPOINT, DATABASE_ENDPOINT):
+        response = await client.get(endpoint, headers=auth_header(tokens))
+        assert response.status_code == 401, f"{endpoint}: {response.text}"
+
+async def test_valid_token_is_accepted(client, create_user, login):
+    await create_user("alice")
+    tokens = await login("alice")
+
+    await assert_accepted(client, tokens)
+
+    response = await client.get(DATABASE_ENDPOINT, headers=auth_header(tokens))
+    assert response.json()["username"] == "alice"
+
+async def test_tampered_token_is_rejected(client, create_user, login):
+    await create_user("alice")
+    tokens = await login("alice")
+
+    await assert_rejected(client, {"access_token": tokens["access_token"][:-2] + "xx"})
+
+async def test_logout_revokes_access_token(client, create_user, login):
+    await create_user("alice")
+    tokens = await login("alice")
+
+    response = await client.post("/api/auth/logout", json={}, headers=auth_header(tokens))
+    assert response.status_code == 200
+
+    await assert_rejected(client, tokens)
+
+async def test_change_password_revokes_previous_tokens(client, create_user, login):
+    await create_user("alice")
+    tokens = await login("alice")
+
+    response = await client.post(
+        "/api/auth/change-password",
+        json={"old_password": "pw1234", "new_password": "pw5678"},
+        headers=auth_header(tokens)
+    )
+    assert response.status_code == 200, response.text
+
+    await assert_rejected(client, tokens)
+    await assert_accepted(client, response.json())
+
+async def test_deleted_user_token_is_rejected(client, create_user, login):
+    await create_user("admin", role="admin")
+    alice = await create_user("alice")
+    tokens = await login("alice")
+
+    response = await client.delete(f"/api/users/{alice['_id']}", headers=auth_header(await login("admin")))
+    assert response.status_code == 200, response.text
+
+    await assert_rejected(client, tokens)
+
+async def test_username_change_revokes_tokens_and_returns_new_ones(client, create_user, login):
+    await create_user("alice")
+    tokens = await login("alice")
+
+    response = await client.put("/api/users/me", json={"username": "alice2"}, headers=auth_header(tokens))
+    assert response.status_code == 200, response.text
+    updated = response.json()
+    assert updated["username"] == "alice2"
+
+    await assert_rejected(client, tokens)
+    response = await client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+
+    await assert_accepted(client, updated)
+    response = await client.post("/api/auth/refresh", json={"refresh_token": updated["refresh_token"]})
+    assert response.status_code == 200, response.text
+
+async def test_password_change_through_profile_revokes_tokens(client, create_user, login):
+    await create_user("alice")
+    tokens = await login("alice")
+
+    response = await client.put("/api/users/me", json={"password": "pw5678"}, headers=auth_header(tokens))
+    assert response.status_code == 200, response.text
+
+    await assert_rejected(client, tokens)
+    await assert_accepted(client, response.json())
+    await login("alice", "pw5678")
+
+async def test_other_profile_changes_keep_tokens(client, create_user, login):
+    await create_user("alice")
+    tokens = await login("alice")
+
+    response = await client.put("/api/users/me", json={"full_name": "Alice Chen"}, headers=auth_header(tokens))
+    assert response.status_code == 200, response.text
+    assert response.json().get("access_token") is None
+
+    await assert_accepted(client, tokens)
+
+async def test_token_for_renamed_user_does_not_match_new_owner_of_username(client, create_user, login):
+    await create_user("alice")
+    old_tokens = await login("alice")
+
+    response = await client.put("/api/users/me", json={"username": "alice2"}, headers=auth_header(old_tokens))
+    assert response.status_code == 200, response.text
+
+    # 另一位用戶註冊了釋出的用戶名，舊令牌的 sub 與其相同但 uid 不同
+    await create_user("alice")
+
+    await assert_rejected(client, old_tokens)
@@ -0,0 +1,75 @@
+import logging
+
+import pytest
+
+from scripts import benchmark_pdf_signing as benchmark
+
+def read(path) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+def result(name="text-1p", success=True, wall_s=0.1, cpu_s=0.1, sign_rss_mb=10.0) -> dict:
+    return {"name": name, "success": success, "wall_s": wall_s, "cpu_s": cpu_s, "sign_rss_mb": sign_rss_mb}
+
+@pytest.mark.parametrize("variant", ["text", "image"])
+def test_generated_pdf_is_reproducible(tmp_path, variant):
+    first, second = tmp_path / "first.pdf", tmp_path / "second.pdf"
+
+    benchmark.build_pdf(str(first), 2, variant)
+    benchmark.build_pdf(str(second), 2, variant)
+
+    assert read(first) == read(second)
+
+def test_damaged_variants(tmp_path):
+    case = {"name": "text-1p", "pages": 1, "variant": "text", "damage": None}
+    intact = read(benchmark.generate_input(case, str(tmp_path)))
+
+    for damage in benchmark.DAMAGES:
+        content = read(benchmark.generate_input({**case, "name": damage, "damage": damage}, str(tmp_path)))
+        assert content != intact, damage
+
+    assert not read(tmp_path / "missing_eof.pdf").rstrip().endswith(b"%%EOF")
+    assert read(tmp_path / "junk_header.pdf").endswith(intact)
+    assert read(tmp_path / "truncated.pdf") == intact[:int(len(intact) * 0.7)]
+
+def test_build_cases():
+    cases = benchmark.build_cases([1, 10], ["text", "image"], 10)
+
+    assert [case["name"] for case in cases] == [
+        "text-1p", "text-10p", "image-1p", "image-10p",
+        "text-10p-missing_eof", "text-10p-junk_header", "text-10p-truncated"
+    ]
+
+def test_run_case_signs_every_page(tmp_path):
+    case = {"name": "text-2p", "pages": 2, "variant": "text", "damage": None}
+    input_path = benchmark.generate_input(case, str(tmp_path))
+    try:
+        measured = benchmark.run_case(case, input_path, 2, str(tmp_path))
+    finally:
+        logging.disable(logging.NOTSET)
+
+    assert measured["success"]
+    assert measured["output_pages"] == 2
+    assert measured["output_size"] > 0
+    assert measured["repeat"] == 2
+    assert measured["wall_s"] >= measured["wall_min_s"] > 0
+
+def test_compare_reports_regressions():
+    baseline = {"results": [result(), result("image-1p")]}
+
+    regressions = benchmark.compare(
+        [result(wall_s=0.2, sign_rss_mb=30.0), result("image-1p", success=False), result("text-10p")],
+        baseline,
+        0.15
+    )
+
+    assert [(r["name"], r["metric"]) for r in regressions] == [
+        ("text-1p", "wall_s"), ("text-1p", "sign_rss_mb"), ("image-1p", "success")
+    ]
+    assert regressions[0]["change"] == "+100%"
+
+def test_compare_ignores_noise_below_minimum_delta():
+    baseline = {"results": [result(wall_s=0.001, cpu_s=0.001, sign_rss_mb=1.0)]}
+
+    # 相對變化超過門檻，但絕對差異小於 MIN_TIME_DELTA / MIN_RSS_DELTA
+    assert benchmark.compare([result(wall_s=0.004, cpu_s=0.004, sign_rss_mb=2.5)], baseline, 0.15) == []
@@ -0,0 +1,127 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.core.events import document_events, record_document_deletion
+from conftest import auth_header
+
+pytestmark = pytest.mark.anyio
+
+def make_document(**fields) -> dict:
+    now = datetime.utcnow()
+    return {
+        "_id": ObjectId(),
+        "filename": "x_invoice.pdf",
+        "original_filename": "invoice.pdf",
+        "file_path": "/tmp/x_invoice.pdf",
+        "file_size": 100,
+        "status": "uploaded",
+        "uploaded_by": "admin",
+        "created_at": now,
+        "updated_at": now,
+        **fields
+    }
+
+def change(operation: str, document: dict) -> dict:
+    event = {"operationType": operation, "documentKey": {"_id": document["_id"]}}
+    if operation != "delete":
+        event["fullDocument"] = document
+    return event
+
+def drain(subscription) -> list:
+    events = []
+    while not subscription.queue.empty():
+        events.append(subscription.queue.get_nowait())
+    return events
+
+@pytest.fixture
+async def subscribe(db):
+    subscriptions = []
+
+    def subscribe(username: str, role: str = "user"):
+        subscription = document_events.subscribe({"username": username, "role": role})
+        subscriptions.append(subscription)
+        return subscription
+
+    yield subscribe
+    for subscription in subscriptions:
+        document_events.unsubscribe(subscription)
+
+async def test_created_event_sent_only_to_users_who_can_list(subscribe):
+    alice = subscribe("alice")
+    bob = subscribe("bob")
+    admin = subscribe("admin", role="admin")
+
+    document = make_document(signers=[{"username": "alice", "status": "pending"}], next_signer="alice")
+    document_events._dispatch(change("insert", document))
+
+    [(event, data)] = drain(alice)
+    assert event == "created"
+    assert data["id"] == str(document["_id"])
+    assert drain(bob) == []
+    assert [event for event, _ in drain(admin)] == ["created"]
+
+async def test_deleted_sent_only_to_users_who_listed_document(db, subscribe):
+    alice = subscribe("alice")
+    bob = subscribe("bob")
+    admin = subscribe("admin", role="admin")
+    document = make_document(signers=[{"username": "alice", "status": "pending"}], next_signer="alice")
+
+    # 刪除事件沒有文件內容：只通知管理員，一般用戶由刪除通知判斷
+    document_events._dispatch(change("delete", document))
+    await record_document_deletion(document)
+    notice = await db.document_deletions.find_one({"document_id": str(document["_id"])})
+    document_events.dispatch_deletion(notice)
+
+    deleted = ("deleted", {"id": str(document["_id"])})
+    assert drain(alice) == [deleted]
+    assert drain(bob) == []
+    assert drain(admin) == [deleted]
+
+async def test_hidden_document_never_reaches_user(subscribe):
+    bob = subscribe("bob")
+
+    # 文件由 alice 簽署，bob 無權查看
+    document = make_document(status="signed", signed_by="alice")
+    document_events._dispatch(change("update", document))
+    document_events._dispatch(change("delete", document))
+    document_events.dispatch_deletion({"document_id": str(document["_id"]), **document})
+
+    assert drain(bob) == []
+
+async def test_document_moving_to_next_signer_removed_from_previous_signer(subscribe):
+    alice = subscribe("alice")
+    bob = subscribe("bob")
+    carol = subscribe("carol")
+
+    signers = [{"username": "alice", "status": "signed"}, {"username": "bob", "status": "pending"}]
+    document = make_document(signers=signers, next_signer="bob")
+    document_events._dispatch(change("update", document))
+
+    assert drain(alice) == [("deleted", {"id": str(document["_id"])})]
+    assert [event for event, _ in drain(bob)] == ["updated"]
+    assert drain(carol) == []
+
+async def test_deleting_document_records_notice(client, db, create_user, login, upload):
+    await create_user("admin", role="admin")
+    await create_user("alice")
+    await create_user("bob")
+    tokens = await login("admin")
+    document = await upload(tokens, "contract.pdf", signers=["alice", "bob"])
+
+    response = await client.delete(f"/api/documents/{document['id']}", headers=auth_header(tokens))
+    assert response.status_code == 200, response.text
+
+    notice = await db.document_deletions.find_one({"document_id": document["id"]})
+    assert notice["status"] == "uploaded"
+    assert notice["next_signer"] == "alice"
+    assert notice["signers"] == [{"username": "alice"}, {"username": "bob"}]
+
+async def test_slow_subscriber_is_asked_to_resync(subscribe):
+    alice = subscribe("alice")
+
+    for _ in range(alice.queue.maxsize + 1):
+        document_events._dispatch(change("insert", make_document()))
+
+    assert drain(alice) == [("resync", {})]
@@ -0,0 +1,146 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import app.core.outbox as outbox
+from app.core.config import settings
+from app.core.outbox import email_outbox, enqueue_email
+from conftest import auth_header
+
+pytestmark = pytest.mark.anyio
+
+class FakeSender:
+    """取代 SMTP 發送，result 控制發送結果（True、False 或要拋出的例外）"""
+
+    def __init__(self):
+        self.result = True
+        self.messages = []
+
+    async def __call__(self, to, kind, language=None, **context):
+        self.messages.append((to, kind, context))
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+@pytest.fixture
+def sent(monkeypatch):
+    sender = FakeSender()
+    monkeypatch.setattr(outbox, "send_templated_email", sender)
+    return sender
+
+async def deliver_next():
+    message = await email_outbox._claim()
+    assert message is not None
+    await email_outbox._deliver(message)
+    return message["_id"]
+
+async def test_unknown_kind_rejected(db):
+    with pytest.raises(ValueError):
+        await enqueue_email("no_such_template", "alice@example.com", {})
+
+async def test_message_delivered_and_payload_dropped(db, sent):
+    await enqueue_email("activation", "alice@example.com", {"activation_code": "ABC123"})
+
+    message_id = await deliver_next()
+
+    assert sent.messages == [("alice@example.com", "activation", {"activation_code": "ABC123"})]
+    message = await db.email_outbox.find_one({"_id": message_id})
+    assert message["status"] == "sent"
+    assert "payload" not in message
+    assert message["purge_at"] > datetime.utcnow()
+    assert await email_outbox._claim() is None
+
+async def test_failed_delivery_retried_with_backoff(db, sent):
+    sent.result = False
+    await enqueue_email("activation", "alice@example.com", {"activation_code": "ABC123"})
+
+    before = datetime.utcnow()
+    message_id = await deliver_next()
+
+    message = await db.email_outbox.find_one({"_id": message_id})
+    assert message["status"] == "pending"
+    assert message["attempts"] == 1
+    assert message["last_error"]
+    delay = (message["next_attempt_at"] - before).total_seconds()
+    assert settings.email_outbox_backoff_base_seconds * 0.8 <= delay <= settings.email_outbox_backoff_base_seconds * 1.2 + 1
+    # 退避期間不會被取得
+    assert await email_outbox._claim() is None
+
+async def test_exception_counts_as_failure(db, sent):
+    sent.result = ConnectionError("refused")
+    await enqueue_email("activation", "alice@example.com", {"activation_code": "ABC123"})
+
+    message_id = await deliver_next()
+
+    message = await db.email_outbox.find_one({"_id": message_id})
+    assert message["status"] == "pending"
+    assert message["last_error"] == "refused"
+
+async def test_message_dead_lettered_after_max_attempts(db, sent):
+    sent.result = False
+    message_id = await enqueue_email("activation", "alice@example.com", {"activation_code": "ABC123"})
+    await db.email_outbox.update_one(
+        {"_id": message_id},
+        {"$set": {"attempts": settings.email_outbox_max_attempts - 1}}
+    )
+
+    await deliver_next()
+
+    message = await db.email_outbox.find_one({"_id": message_id})
+    assert message["status"] == "dead"
+    assert message["attempts"] == settings.email_outbox_max_attempts
+    assert await email_outbox._claim() is None
+
+async def test_expired_lease_reclaimed(db, sent):
+    message_id = await enqueue_email("activation", "alice@example.com", {"activation_code": "ABC123"})
+    await db.email_outbox.update_one(
+        {"_id": message_id},
+        {"$set": {"status": "sending", "attempts": 1, "locked_until": datetime.utcnow() - timedelta(seconds=1)}}
+    )
+
+    await deliver_next()
+
+    message = await db.email_outbox.find_one({"_id": message_id})
+    assert message["status"] == "sent"
+    assert message["attempts"] == 2
+
+async def test_registration_enqueues_activation_email(client, db):
+    response = await client.post("/api/auth/register", json={
+        "username": "alice",
+        "email": "alice@example.com",
+        "password": "pw1234"
+    })
+    assert response.status_code == 200, response.text
+
+    message = await db.email_outbox.find_one({"to": "alice@example.com"})
+    user = await db.users.find_one({"username": "alice"})
+    assert message["kind"] == "activation"
+    assert message["status"] == "pending"
+    assert message["payload"] == {"activation_code": user["activation_code"]}
+
+async def test_admin_lists_and_retries_dead_messages(client, db, create_user, login, sent):
+    await create_user("admin", role="admin")
+    await create_user("alice")
+    admin = await login("admin")
+    sent.result = False
+    message_id = await enqueue_email("activation", "bob@example.com", {"activation_code": "ABC123"})
+    await db.email_outbox.update_one({"_id": message_id}, {"$set": {"attempts": settings.email_outbox_max_attempts - 1}})
+    await deliver_next()
+
+    response = await client.get("/api/admin/email-outbox", headers=auth_header(admin))
+    assert response.status_code == 200
+    [item] = response.json()
+    assert item["id"] == str(message_id)
+    assert "payload" not in item
+
+    response = await client.post(f"/api/admin/email-outbox/{message_id}/retry", headers=auth_header(await login("alice")))
+    assert response.status_code == 403
+
+    response = await client.post(f"/api/admin/email-outbox/{message_id}/retry", headers=auth_header(admin))
+    assert response.status_code == 200
+    sent.result = True
+    await deliver_next()
+    assert (await db.email_outbox.find_one({"_id": message_id}))["status"] == "sent"
+
+    response = await client.post(f"/api/admin/email-outbox/{message_id}/retry", headers=auth_header(admin))
+    assert response.status_code == 404
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+from app.core.config import settings
+from app.core.email_templates import TEMPLATE_DIR, environment, has_email_template, load_email_templates, render_email
+
+KINDS = sorted(name for name in os.listdir(TEMPLATE_DIR) if os.path.isdir(os.path.join(TEMPLATE_DIR, name)))
+
+CONTEXT = {
+    "activation_code": "ABC123",
+    "reset_token": "RESET1",
+    "name": "Alice",
+    "awaiting": [{"filename": "invoice.pdf", "uploaded_by": "admin", "document_url": "https://example.com/sign/1"}],
+    "signed": [{"filename": "contract.pdf", "signer": "bob", "signed_at": "2026-01-01 10:00"}],
+    "documents_url": "https://example.com/documents",
+    "filename": "invoice.pdf",
+    "uploaded_by": "admin",
+    "signer": "bob",
+    "signed_at": "2026-01-01 10:00",
+    "document_url": "https://example.com/sign/1"
+}
+
+def test_all_templates_precompiled():
+    count = load_email_templates()
+
+    names = environment.list_templates(extensions=["txt", "html"])
+    assert count == len(names)
+    assert f"activation/{settings.default_language}.txt" in names
+
+@pytest.mark.parametrize("kind", KINDS)
+@pytest.mark.parametrize("language", ["zh-TW", "en", "vi"])
+def test_every_kind_renders_in_every_language(kind, language):
+    rendered = render_email(kind, language, **CONTEXT)
+
+    assert rendered.subject
+    assert "\n" not in rendered.subject
+    assert rendered.text.strip()
+    assert "<html" in rendered.html.lower()
+
+def test_activation_contains_code():
+    rendered = render_email("activation", "en", activation_code="ABC123")
+
+    assert rendered.subject == "eSignedOnline Account Activation"
+    assert "ABC123" in rendered.text
+    assert "ABC123" in rendered.html
+
+def test_unknown_language_falls_back_to_default():
+    assert render_email("activation", "xx", activation_code="ABC123") == render_email(
+        "activation", settings.default_language, activation_code="ABC123"
+    )
+
+def test_html_is_escaped_and_text_is_not():
+    rendered = render_email("digest", "en", **{**CONTEXT, "name": "<b>Alice</b>"})
+
+    assert "&lt;b&gt;Alice&lt;/b&gt;" in rendered.html
+    assert "<b>Alice</b>" in rendered.text
+
+def test_has_email_template():
+    assert has_email_template("activation")
+    assert not has_email_template("no_such_template")
@@ -0,0 +1,93 @@
+from datetime import datetime
+
+import pytest
+
+import healthcheck
+from app.core.config import settings
+from app.core.health import database_check
+from app.core.signing import signing_executor
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture(autouse=True)
+def fresh_checks(monkeypatch):
+    # 每次呼叫都重新檢查，不使用前一個測試快取的結果
+    monkeypatch.setattr(settings, "health_check_cache_seconds", 0)
+    monkeypatch.setattr(settings, "health_min_free_disk_mb", 0)
+
+async def test_liveness_has_no_dependencies(client):
+    response = await client.get("/health/live")
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "alive"}
+
+async def test_ready_reports_every_check(client):
+    response = await client.get("/health/ready")
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["status"] == "ready"
+    assert set(body["checks"]) == {"database", "disk", "signing", "email_outbox"}
+    assert body["checks"]["database"]["latency_ms"] >= 0
+
+async def test_not_ready_when_disk_low(client, monkeypatch):
+    monkeypatch.setattr(settings, "health_min_free_disk_mb", 10 ** 12)
+
+    response = await client.get("/health/ready")
+
+    assert response.status_code == 503
+    body = response.json()
+    assert body["status"] == "not_ready"
+    assert body["checks"]["disk"]["status"] == "fail"
+
+async def test_not_ready_when_signing_pool_saturated(client, monkeypatch):
+    monkeypatch.setattr(settings, "health_max_signing_saturation", 0.0)
+    await signing_executor.limiter.acquire()
+    try:
+        response = await client.get("/health/ready")
+    finally:
+        signing_executor.limiter.release()
+
+    assert response.status_code == 503
+    assert response.json()["checks"]["signing"]["status"] == "fail"
+
+async def test_outbox_backlog_only_fails_above_threshold(client, db, monkeypatch):
+    await db.email_outbox.insert_many([
+        {"status": "pending", "next_attempt_at": datetime.utcnow()} for _ in range(3)
+    ])
+
+    response = await client.get("/health/ready")
+    assert response.status_code == 200
+    assert response.json()["checks"]["email_outbox"]["backlog"] == 3
+
+    monkeypatch.setattr(settings, "health_max_outbox_backlog", 2)
+    response = await client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["checks"]["email_outbox"]["status"] == "fail"
+
+async def test_database_check_result_cached(db, monkeypatch):
+    monkeypatch.setattr(settings, "health_check_cache_seconds", 60)
+    calls = []
+
+    async def check():
+        calls.append(1)
+        return {"status": "ok"}
+    monkeypatch.setattr(database_check, "_check", check)
+    monkeypatch.setattr(database_check, "_result", None)
+
+    await database_check.get()
+    await database_check.get()
+
+    assert len(calls) == 1
+
+def test_container_healthcheck_probes_http_listener(monkeypatch):
+    monkeypatch.setattr(settings, "server_http_enabled", True)
+    monkeypatch.setattr(settings, "server_http_port", 8080)
+
+    assert healthcheck.live_url() == "http://127.0.0.1:8080/health/live"
+
+def test_container_healthcheck_falls_back_to_https(monkeypatch):
+    monkeypatch.setattr(settings, "server_http_enabled", False)
+    monkeypatch.setattr(settings, "server_https_port", 9443)
+
+    assert healthcheck.live_url() == "https://127.0.0.1:9443/health/live"
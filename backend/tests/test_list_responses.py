@@ -0,0 +1,67 @@
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from pydantic import TypeAdapter
+
+from app.core.responses import ORJSONResponse
+from app.models.document import Document
+from app.models.user import User
+from conftest import auth_header, signature_payload
+
+pytestmark = pytest.mark.anyio
+
+def test_orjson_response_matches_pydantic_formats():
+    object_id = ObjectId()
+    created_at = datetime(2026, 1, 2, 3, 4, 5, 678901)
+
+    body = json.loads(ORJSONResponse({"id": object_id, "created_at": created_at, "tags": {"a"}}).body)
+
+    assert body == {
+        "id": str(object_id),
+        "created_at": TypeAdapter(datetime).dump_python(created_at, mode="json"),
+        "tags": ["a"]
+    }
+
+def test_orjson_response_rejects_unknown_types():
+    with pytest.raises(TypeError):
+        ORJSONResponse({"value": object()})
+
+async def test_document_lists_return_only_model_fields(client, create_user, login, upload):
+    await create_user("admin", role="admin")
+    await create_user("alice")
+    admin = await login("admin")
+    alice = await login("alice")
+    document = await upload(admin)
+    await upload(admin, "contract.pdf", signers=["alice"])
+    response = await client.post(
+        f"/api/documents/{document['id']}/sign",
+        json=signature_payload("alice"),
+        headers=auth_header(alice)
+    )
+    assert response.status_code == 200, response.text
+
+    for endpoint in ("/api/documents/", "/api/documents/available", "/api/documents/signed"):
+        response = await client.get(endpoint, headers=auth_header(alice))
+        assert response.status_code == 200, response.text
+        items = response.json()
+        assert items, endpoint
+
+        # 與 response_model 驗證的結果相同，不含搜尋索引、簽名資料等資料庫欄位
+        validated = TypeAdapter(list[Document]).validate_python(items)
+        assert items == TypeAdapter(list[Document]).dump_python(validated, mode="json")
+        for item in items:
+            assert set(item) == set(Document.model_fields)
+
+async def test_user_list_omits_password(client, create_user, login):
+    await create_user("admin", role="admin")
+    await create_user("alice")
+
+    response = await client.get("/api/users/", headers=auth_header(await login("admin")))
+
+    assert response.status_code == 200
+    users = response.json()
+    assert {user["username"] for user in users} == {"admin", "alice"}
+    for user in users:
+        assert set(user) == set(User.model_fields)
@@ -0,0 +1,52 @@
+import argparse
+from io import BytesIO
+
+import pytest
+from PyPDF2 import PdfReader
+
+from scripts import load_test
+
+pytestmark = pytest.mark.anyio
+
+def test_parse_mix():
+    assert load_test.parse_mix("browse=50,sign=15") == {"browse": 50.0, "sign": 15.0}
+    assert set(load_test.parse_mix(load_test.DEFAULT_MIX)) == {"login", "browse", "preview", "sign", "upload"}
+
+    with pytest.raises(argparse.ArgumentTypeError):
+        load_test.parse_mix("browse=1,delete=1")
+
+def test_build_pdf_page_count():
+    assert len(PdfReader(BytesIO(load_test.build_pdf(3))).pages) == 3
+
+def test_recorder_report():
+    recorder = load_test.Recorder()
+    for index in range(100):
+        recorder.record("browse", (index + 1) / 1000, 200, True)
+    recorder.record("sign", 0.5, 500, False)
+
+    report = recorder.report(2.0)
+
+    assert report["requests"] == 101
+    assert report["errors"] == 1
+    browse = report["endpoints"]["browse"]
+    assert (browse["p50_ms"], browse["p95_ms"], browse["p99_ms"], browse["max_ms"]) == (50.0, 95.0, 99.0, 100.0)
+    assert browse["rps"] == 50.0
+    assert report["endpoints"]["sign"]["statuses"] == {500: 1}
+
+async def test_seed_and_run_against_app(client, db):
+    await db.users.insert_one({"username": "bob", "role": "user"})
+    await load_test.seed(users=2, documents=3, pages=1, password="load-password")
+    # 重複執行時只替換測試資料
+    await load_test.seed(users=2, documents=3, pages=1, password="load-password")
+
+    assert await db.users.count_documents({}) == 4
+    assert await db.documents.count_documents({"load_test": True}) == 3
+
+    args = argparse.Namespace(users=2, password="load-password", concurrency=2, duration=0.3,
+                              mix="browse=1,preview=1,sign=1", pages=1)
+    report = await load_test.LoadTest(client, args).run()
+
+    assert report["requests"] > 0
+    assert report["errors"] == 0, report
+    # 管理員準備階段的登入不計入，只有每個虛擬用戶各登入一次
+    assert report["endpoints"]["login"]["requests"] == 2
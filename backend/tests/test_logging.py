@@ -0,0 +1,73 @@
+import json
+import logging
+import sys
+
+import pytest
+
+from app.core.logging_config import JsonFormatter, RequestIdFilter, _QueueHandler, parse_log_levels, request_id_var
+
+pytestmark = pytest.mark.anyio
+
+def make_record(msg="user %s logged in", args=("alice",), exc_info=None, **extra) -> logging.LogRecord:
+    record = logging.LogRecord("app.test", logging.WARNING, __file__, 1, msg, args, exc_info)
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+def test_json_formatter_includes_fields_and_request_id():
+    record = make_record(fields={"event": "login", "username": "alice"}, request_id="req-1")
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["message"] == "user alice logged in"
+    assert entry["level"] == "WARNING"
+    assert entry["logger"] == "app.test"
+    assert entry["request_id"] == "req-1"
+    assert entry["event"] == "login"
+    assert entry["username"] == "alice"
+
+def test_queue_handler_formats_message_and_exception_in_caller():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = make_record(exc_info=sys.exc_info())
+
+    prepared = _QueueHandler(None).prepare(record)
+
+    assert prepared.msg == "user alice logged in"
+    assert prepared.args is None
+    assert prepared.exc_info is None
+    assert "ValueError: boom" in prepared.exc_text
+    # 背景執行緒只做 JSON 編碼
+    assert "ValueError: boom" in json.loads(JsonFormatter().format(prepared))["exception"]
+
+def test_request_id_filter_reads_context():
+    token = request_id_var.set("req-2")
+    try:
+        record = make_record()
+        assert RequestIdFilter().filter(record)
+    finally:
+        request_id_var.reset(token)
+
+    assert record.request_id == "req-2"
+
+def test_parse_log_levels():
+    assert parse_log_levels("app.utils.pdf_utils=warning, pymongo=INFO,,bad") == {
+        "app.utils.pdf_utils": "WARNING",
+        "pymongo": "INFO"
+    }
+
+async def test_request_id_generated_for_each_request(client):
+    first = await client.get("/health/live")
+    second = await client.get("/health/live")
+
+    assert len(first.headers["X-Request-ID"]) == 32
+    assert first.headers["X-Request-ID"] != second.headers["X-Request-ID"]
+
+async def test_client_request_id_reused_when_safe(client):
+    response = await client.get("/health/live", headers={"X-Request-ID": "trace-abc.123"})
+    assert response.headers["X-Request-ID"] == "trace-abc.123"
+
+    response = await client.get("/health/live", headers={"X-Request-ID": "bad id\" injected"})
+    assert response.headers["X-Request-ID"] != "bad id\" injected"
+    assert len(response.headers["X-Request-ID"]) == 32
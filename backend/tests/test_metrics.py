@@ -0,0 +1,57 @@
+import pytest
+from prometheus_client import REGISTRY
+
+from conftest import auth_header, signature_payload
+
+pytestmark = pytest.mark.anyio
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+async def test_requests_labelled_by_route_template(client, create_user, login):
+    await create_user("alice")
+    tokens = await login("alice")
+    labels = {"method": "GET", "route": "/api/documents/{document_id}", "status": "404"}
+    before = sample("esigned_http_requests_total", **labels)
+
+    response = await client.get("/api/documents/000000000000000000000000", headers=auth_header(tokens))
+    assert response.status_code == 404
+
+    assert sample("esigned_http_requests_total", **labels) == before + 1
+    assert sample("esigned_http_request_duration_seconds_count", **labels) == before + 1
+    assert sample("esigned_http_requests_in_flight", method="GET") == 0
+
+async def test_unknown_paths_share_one_label(client):
+    labels = {"method": "GET", "route": "unmatched", "status": "404"}
+    before = sample("esigned_http_requests_total", **labels)
+
+    await client.get("/no/such/path/1")
+    await client.get("/no/such/path/2")
+
+    assert sample("esigned_http_requests_total", **labels) == before + 2
+
+async def test_pdf_sign_stages_observed(client, create_user, login, upload):
+    await create_user("admin", role="admin")
+    await create_user("alice")
+    document = await upload(await login("admin"))
+    before = {stage: sample("esigned_pdf_sign_stage_duration_seconds_count", stage=stage) for stage in ("load", "overlay", "write")}
+
+    response = await client.post(
+        f"/api/documents/{document['id']}/sign",
+        json=signature_payload("alice"),
+        headers=auth_header(await login("alice"))
+    )
+    assert response.status_code == 200, response.text
+
+    for stage, count in before.items():
+        assert sample("esigned_pdf_sign_stage_duration_seconds_count", stage=stage) == count + 1
+
+async def test_metrics_endpoint_exposes_prometheus_text(client):
+    await client.get("/health/live")
+
+    response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'esigned_http_requests_total{method="GET",route="/health/live",status="200"}' in response.text
+    assert "esigned_cache_requests_total" in response.text
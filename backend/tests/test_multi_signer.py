@@ -0,0 +1,125 @@
+import io
+import json
+import os
+
+import pytest
+from bson import ObjectId
+from PyPDF2 import PdfReader
+
+from app.core.config import settings
+from app.core.signing import signing_executor
+from app.utils.pdf_utils import apply_signature_layers
+from conftest import auth_header, signature_payload
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def users(create_user, login):
+    for username in ("alice", "bob", "carol"):
+        await create_user(username)
+    await create_user("admin", role="admin")
+    return {username: await login(username) for username in ("admin", "alice", "bob", "carol")}
+
+@pytest.fixture
+async def document(users, upload):
+    return await upload(users["admin"], "contract.pdf", signers=["alice", "bob"])
+
+async def sign(client, tokens, document_id, name, **params):
+    return await client.post(
+        f"/api/documents/{document_id}/sign",
+        params=params,
+        json=signature_payload(name),
+        headers=auth_header(tokens)
+    )
+
+async def available_ids(client, tokens):
+    response = await client.get("/api/documents/available", headers=auth_header(tokens))
+    assert response.status_code == 200
+    return {item["id"] for item in response.json()}
+
+async def test_upload_sets_first_signer(document):
+    assert document["next_signer"] == "alice"
+    assert [signer["username"] for signer in document["signers"]] == ["alice", "bob"]
+    assert all(signer["status"] == "pending" for signer in document["signers"])
+
+async def test_signing_out_of_turn_conflicts(client, users, document):
+    response = await sign(client, users["bob"], document["id"], "bob")
+    assert response.status_code == 409
+
+    # 非同步簽署同樣在建立工作前檢查
+    response = await sign(client, users["bob"], document["id"], "bob", **{"async": "true"})
+    assert response.status_code == 409
+
+async def test_non_signer_forbidden(client, users, document):
+    response = await sign(client, users["carol"], document["id"], "carol")
+    assert response.status_code == 403
+
+async def test_signers_sign_in_order(client, users, document, db):
+    assert document["id"] in await available_ids(client, users["alice"])
+    assert document["id"] not in await available_ids(client, users["bob"])
+    assert document["id"] not in await available_ids(client, users["carol"])
+
+    response = await sign(client, users["alice"], document["id"], "alice")
+    assert response.status_code == 200, response.text
+    assert response.json()["status"] == "uploaded"
+    assert response.json()["next_signer"] == "bob"
+
+    # 已簽署的簽署者不可再次簽署
+    response = await sign(client, users["alice"], document["id"], "alice")
+    assert response.status_code == 400
+
+    assert document["id"] not in await available_ids(client, users["alice"])
+    assert document["id"] in await available_ids(client, users["bob"])
+
+    response = await client.get(f"/api/documents/{document['id']}/download", headers=auth_header(users["alice"]))
+    assert response.status_code == 400
+
+    response = await sign(client, users["bob"], document["id"], "bob")
+    assert response.status_code == 200, response.text
+    signed = response.json()
+    assert signed["status"] == "signed"
+    assert signed["next_signer"] is None
+    assert all(signer["status"] == "signed" for signer in signed["signers"])
+
+    # 簽名圖層在最後一位簽署後才一次寫入 PDF
+    assert await db.signature_layers.count_documents({"document_id": ObjectId(document["id"])}) == 2
+    for username in ("alice", "bob", "admin"):
+        response = await client.get(f"/api/documents/{document['id']}/download", headers=auth_header(users[username]))
+        assert response.status_code == 200, response.text
+        assert len(PdfReader(io.BytesIO(response.content)).pages) == 2
+
+    response = await client.get(f"/api/documents/{document['id']}/download", headers=auth_header(users["carol"]))
+    assert response.status_code == 403
+
+async def test_invalid_signers_rejected(client, users):
+    for signers in (["alice", "alice"], ["alice", "nobody"], []):
+        response = await client.post(
+            "/api/documents/upload",
+            files={"file": ("contract.pdf", b"%PDF-1.4", "application/pdf")},
+            data={"signers": json.dumps(signers)},
+            headers=auth_header(users["admin"])
+        )
+        assert response.status_code == 400, signers
+
+async def test_failed_composition_removes_layer_and_partial_file(client, users, document, db, monkeypatch):
+    response = await sign(client, users["alice"], document["id"], "alice")
+    assert response.status_code == 200, response.text
+
+    original_run = signing_executor.run
+
+    async def run(func, *args, **kwargs):
+        if func is not apply_signature_layers:
+            return await original_run(func, *args, **kwargs)
+        with open(kwargs["output_path"], "wb") as f:
+            f.write(b"%PDF-partial")
+        raise OSError("disk full")
+    monkeypatch.setattr(signing_executor, "run", run)
+
+    with pytest.raises(OSError):
+        await sign(client, users["bob"], document["id"], "bob")
+
+    # 只剩第一位簽署者的圖層，沒有留下寫到一半的檔案
+    assert await db.signature_layers.count_documents({}) == 1
+    assert not [name for name in os.listdir(settings.signed_doc_path) if name.startswith(document["id"])]
+    stored = await db.documents.find_one({"_id": ObjectId(document["id"])})
+    assert (stored["status"], stored["signed_count"], stored["next_signer"]) == ("uploaded", 1, "bob")
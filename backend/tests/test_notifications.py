@@ -0,0 +1,104 @@
+import pytest
+
+from app.core.config import settings
+from app.core.notifications import notification_coalescer
+from conftest import auth_header, signature_payload
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def users(create_user, login, monkeypatch):
+    monkeypatch.setattr(settings, "notifications_enabled", True)
+    await create_user("admin", role="admin")
+    await create_user("alice")
+    await create_user("bob")
+    await create_user("carol", is_active=False)
+    return {"admin": await login("admin"), "alice": await login("alice")}
+
+async def digests(db) -> dict:
+    return {
+        message["to"].split("@")[0]: message["payload"]
+        async for message in db.email_outbox.find({"kind": "digest"})
+    }
+
+async def test_uploads_coalesced_into_one_digest_per_user(users, upload, db):
+    await upload(users["admin"], "invoice.pdf")
+    await upload(users["admin"], "receipt.pdf")
+
+    assert await notification_coalescer.flush() == 2
+
+    sent = await digests(db)
+    # 上傳者及未啟用的用戶不會收到通知
+    assert set(sent) == {"alice", "bob"}
+    assert [item["filename"] for item in sent["alice"]["awaiting"]] == ["invoice.pdf", "receipt.pdf"]
+    assert sent["alice"]["signed"] == []
+
+async def test_events_processed_only_once(users, upload, db):
+    await upload(users["admin"])
+
+    assert await notification_coalescer.flush() == 2
+    assert await notification_coalescer.flush() == 0
+    assert await db.notification_events.count_documents({"processed_at": None}) == 0
+
+async def test_signing_notifies_uploader(client, users, upload, db):
+    document = await upload(users["admin"])
+    await notification_coalescer.flush()
+    await db.email_outbox.delete_many({})
+
+    response = await client.post(
+        f"/api/documents/{document['id']}/sign",
+        json=signature_payload("alice"),
+        headers=auth_header(users["alice"])
+    )
+    assert response.status_code == 200, response.text
+
+    assert await notification_coalescer.flush() == 1
+    sent = await digests(db)
+    assert [item["signer"] for item in sent["admin"]["signed"]] == ["alice"]
+
+async def test_deleted_document_skipped(client, users, upload, db):
+    document = await upload(users["admin"])
+    response = await client.delete(f"/api/documents/{document['id']}", headers=auth_header(users["admin"]))
+    assert response.status_code == 200, response.text
+
+    assert await notification_coalescer.flush() == 0
+    assert await db.email_outbox.count_documents({}) == 0
+
+async def test_multi_signer_upload_notifies_first_signer_only(users, upload, db):
+    await upload(users["admin"], "contract.pdf", signers=["bob", "alice"])
+
+    assert await notification_coalescer.flush() == 1
+    assert set(await digests(db)) == {"bob"}
+
+async def test_disabled_notifications_record_nothing(users, upload, db, monkeypatch):
+    monkeypatch.setattr(settings, "notifications_enabled", False)
+    await upload(users["admin"])
+
+    assert await db.notification_events.count_documents({}) == 0
+
+async def test_only_one_worker_holds_digest_lease(db):
+    assert await notification_coalescer._acquire_lease()
+    assert not await notification_coalescer._acquire_lease()
+
+async def test_next_signer_notified_of_their_turn(client, users, upload, db):
+    document = await upload(users["admin"], "contract.pdf", signers=["alice", "bob"])
+    await notification_coalescer.flush()
+    await db.email_outbox.delete_many({})
+
+    response = await client.post(
+        f"/api/documents/{document['id']}/sign",
+        json=signature_payload("alice"),
+        headers=auth_header(users["alice"])
+    )
+    assert response.status_code == 200, response.text
+
+    assert await notification_coalescer.flush() == 2
+    sent = await digests(db)
+    assert sent["bob"]["awaiting"] == [{
+        "filename": "contract.pdf",
+        "uploaded_by": "admin",
+        "document_url": f"{settings.frontend_url}/sign/{document['id']}"
+    }]
+    assert sent["bob"]["signed"] == []
+    assert [item["signer"] for item in sent["admin"]["signed"]] == ["alice"]
+    assert sent["admin"]["awaiting"] == []
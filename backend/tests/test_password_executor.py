@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.concurrency import BoundedExecutor, ConcurrencyLimitExceeded, ConcurrencyLimiter
+from app.core.security import get_password_hash, password_executor, verify_password_async
+
+pytestmark = pytest.mark.anyio
+
+async def test_executor_runs_outside_event_loop_thread(anyio_backend):
+    executor = BoundedExecutor("test-executor", max_workers=1, max_queue=1, queue_timeout=1)
+    try:
+        name = await executor.run(lambda: threading.current_thread().name)
+    finally:
+        executor.shutdown()
+
+    assert name.startswith("test-executor")
+    assert name != threading.current_thread().name
+    assert executor.stats()["completed"] == 1
+
+async def test_limiter_rejects_when_queue_full(anyio_backend):
+    limiter = ConcurrencyLimiter("test", max_concurrency=1, max_queue=0, queue_timeout=1)
+    await limiter.acquire()
+
+    with pytest.raises(ConcurrencyLimitExceeded) as exc_info:
+        await limiter.acquire()
+    assert exc_info.value.reason == "queue_full"
+    assert limiter.stats()["rejected"] == 1
+
+    limiter.release()
+    await limiter.acquire()
+    limiter.release()
+
+async def test_limiter_rejects_after_queue_timeout(anyio_backend):
+    limiter = ConcurrencyLimiter("test", max_concurrency=1, max_queue=1, queue_timeout=0.05)
+    await limiter.acquire()
+
+    with pytest.raises(ConcurrencyLimitExceeded) as exc_info:
+        await limiter.acquire()
+    assert exc_info.value.reason == "queue_timeout"
+    assert limiter.stats()["queued"] == 0
+    limiter.release()
+
+async def test_queued_call_runs_when_slot_frees(anyio_backend):
+    limiter = ConcurrencyLimiter("test", max_concurrency=1, max_queue=1, queue_timeout=1)
+    await limiter.acquire()
+
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    assert limiter.stats()["queued"] == 1
+
+    limiter.release()
+    await waiter
+    assert limiter.stats()["in_flight"] == 1
+    limiter.release()
+
+async def test_slot_freed_at_queue_deadline_is_not_lost(anyio_backend):
+    limiter = ConcurrencyLimiter("test", max_concurrency=1, max_queue=1, queue_timeout=0.02)
+    await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+
+    # 名額釋放時等待也已逾時：等待者取得名額或逾時，兩者都不可遺失名額
+    time.sleep(0.05)
+    limiter.release()
+    try:
+        await waiter
+        limiter.release()
+    except ConcurrencyLimitExceeded:
+        pass
+
+    assert limiter.stats()["in_flight"] == 0
+    await asyncio.wait_for(limiter.acquire(), timeout=1)
+    limiter.release()
+
+async def test_verify_password_async_offloads_bcrypt(started_app):
+    hashed = get_password_hash("pw1234")
+    assert await verify_password_async("pw1234", hashed)
+    assert not await verify_password_async("wrong", hashed)
+
+async def test_login_returns_503_when_hash_pool_saturated(client, create_user, monkeypatch):
+    await create_user("alice")
+    limiter = ConcurrencyLimiter("password-hash", max_concurrency=1, max_queue=0, queue_timeout=1)
+    monkeypatch.setattr(password_executor, "limiter", limiter)
+    await limiter.acquire()
+
+    response = await client.post("/api/auth/login", data={"username": "alice", "password": "pw1234"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    limiter.release()
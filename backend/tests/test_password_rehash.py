@@ -0,0 +1,49 @@
+import bcrypt
+import pytest
+
+from app.core.config import settings
+from app.core.security import get_password_hash, password_needs_update, verify_password
+from app.routers.auth import rehash_password
+from conftest import PASSWORD
+
+pytestmark = pytest.mark.anyio
+
+def stale_hash(password: str = PASSWORD) -> str:
+    """以與設定不同的成本產生的雜湊"""
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(settings.bcrypt_rounds + 1)).decode()
+
+def rounds(hashed: str) -> int:
+    return int(hashed.split("$")[2])
+
+def test_needs_update_only_for_other_cost():
+    assert password_needs_update(stale_hash())
+    assert not password_needs_update(get_password_hash(PASSWORD))
+
+async def test_login_rehashes_stale_hash(db, create_user, login):
+    alice = await create_user("alice")
+    await db.users.update_one({"_id": alice["_id"]}, {"$set": {"password": stale_hash()}})
+
+    await login("alice")
+
+    user = await db.users.find_one({"_id": alice["_id"]})
+    assert rounds(user["password"]) == settings.bcrypt_rounds
+    assert verify_password(PASSWORD, user["password"])
+    await login("alice")
+
+async def test_login_keeps_current_hash(db, create_user, login):
+    alice = await create_user("alice")
+
+    await login("alice")
+
+    user = await db.users.find_one({"_id": alice["_id"]})
+    assert user["password"] == alice["password"]
+
+async def test_rehash_skipped_when_password_changed_meanwhile(db, create_user):
+    alice = await create_user("alice")
+    old_hash = stale_hash()
+
+    # 重新雜湊前密碼已被修改：不覆蓋新密碼
+    await rehash_password(alice["_id"], old_hash, PASSWORD)
+
+    user = await db.users.find_one({"_id": alice["_id"]})
+    assert user["password"] == alice["password"]
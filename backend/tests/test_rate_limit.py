@@ -0,0 +1,55 @@
+import pytest
+
+from app.core.config import settings
+
+pytestmark = pytest.mark.anyio
+
+async def attempt_login(client, username, password="wrong-password", ip="10.0.0.1"):
+    return await client.post(
+        "/api/auth/login",
+        data={"username": username, "password": password},
+        headers={"X-Real-IP": ip}
+    )
+
+async def test_login_throttled_per_username(client, create_user):
+    await create_user("alice")
+
+    for _ in range(settings.rate_limit_identity_capacity):
+        response = await attempt_login(client, "alice")
+        assert response.status_code == 401
+
+    # 密碼正確也被拒絕：在驗證密碼之前即回傳 429
+    response = await attempt_login(client, "alice", password="pw1234")
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+async def test_username_throttle_ignores_case_and_spacing(client, create_user):
+    await create_user("alice")
+
+    for username in ["alice", "ALICE", " Alice", "alice ", "aLiCe"][:settings.rate_limit_identity_capacity]:
+        assert (await attempt_login(client, username)).status_code == 401
+
+    assert (await attempt_login(client, "Alice")).status_code == 429
+
+async def test_other_usernames_not_affected(client, create_user):
+    await create_user("alice")
+    await create_user("bob")
+
+    for _ in range(settings.rate_limit_identity_capacity + 1):
+        await attempt_login(client, "alice")
+
+    response = await attempt_login(client, "bob", password="pw1234")
+    assert response.status_code == 200, response.text
+
+async def test_login_throttled_per_ip(client):
+    for index in range(settings.rate_limit_ip_capacity):
+        response = await attempt_login(client, f"user{index}")
+        assert response.status_code == 401
+
+    response = await attempt_login(client, "someone-else")
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+
+    # 其他 IP 不受影響
+    response = await attempt_login(client, "someone-else", ip="10.0.0.2")
+    assert response.status_code == 401
@@ -0,0 +1,84 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import auth_header
+
+pytestmark = pytest.mark.anyio
+
+async def refresh(client, refresh_token):
+    return await client.post("/api/auth/refresh", json={"refresh_token": refresh_token})
+
+async def expire_grace_window(db):
+    """將已使用令牌的使用時間提前，超過同時刷新的寬限時間"""
+    await db.refresh_tokens.update_many(
+        {"used_at": {"$ne": None}},
+        {"$set": {"used_at": datetime.utcnow() - timedelta(hours=1)}}
+    )
+
+async def test_refresh_rotates_token(client, create_user, login):
+    await create_user("alice")
+    tokens = await login("alice")
+
+    response = await refresh(client, tokens["refresh_token"])
+    assert response.status_code == 200, response.text
+    rotated = response.json()
+    assert rotated["refresh_token"] != tokens["refresh_token"]
+
+    response = await client.get("/api/auth/me", headers=auth_header(rotated))
+    assert response.status_code == 200
+
+    response = await refresh(client, rotated["refresh_token"])
+    assert response.status_code == 200, response.text
+
+async def test_unknown_refresh_token_rejected(client, db):
+    response = await refresh(client, "not-a-refresh-token")
+    assert response.status_code == 401
+
+async def test_reuse_revokes_whole_family(client, create_user, login, db):
+    await create_user("alice")
+    tokens = await login("alice")
+    other_session = await login("alice")
+
+    rotated = (await refresh(client, tokens["refresh_token"])).json()
+    await expire_grace_window(db)
+
+    # 已輪替的令牌再次使用：視為外洩，同一次登入輪替出的令牌全部失效
+    response = await refresh(client, tokens["refresh_token"])
+    assert response.status_code == 401
+    response = await refresh(client, rotated["refresh_token"])
+    assert response.status_code == 401
+
+    # 其他登入階段不受影響
+    response = await refresh(client, other_session["refresh_token"])
+    assert response.status_code == 200, response.text
+
+async def test_concurrent_refresh_within_grace_window(client, create_user, login):
+    await create_user("alice")
+    tokens = await login("alice")
+
+    responses = await asyncio.gather(*[refresh(client, tokens["refresh_token"]) for _ in range(3)])
+    assert [response.status_code for response in responses] == [200, 200, 200]
+
+    # 每個並行請求取得的新令牌都屬於同一個有效的登入階段
+    for response in responses:
+        assert (await refresh(client, response.json()["refresh_token"])).status_code == 200
+
+async def test_logout_revokes_refresh_token_without_valid_access_token(client, create_user, login):
+    await create_user("alice")
+    tokens = await login("alice")
+
+    response = await client.post(
+        "/api/auth/logout",
+        json={"refresh_token": tokens["refresh_token"]},
+        headers={"Authorization": "Bearer expired-or-invalid"}
+    )
+    assert response.status_code == 200, response.text
+
+    response = await refresh(client, tokens["refresh_token"])
+    assert response.status_code == 401
+
+async def test_logout_without_credentials_rejected(client, db):
+    response = await client.post("/api/auth/logout", json={})
+    assert response.status_code == 401
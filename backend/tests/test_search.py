@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core import search as search_module
+from app.core.search import TEXT_INDEX_FAILED, backfill_search_index
+from conftest import auth_header, signature_payload
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def documents(client, create_user, login, upload):
+    """
+    三份單人簽署文件及一份 bob 的多人簽署文件；alice 與 bob 各簽署一份，
+    單人簽署文件簽署後另存已簽署的副本，原文件仍可供其他用戶簽署
+    """
+    await create_user("admin", role="admin")
+    await create_user("alice")
+    await create_user("bob")
+    admin, alice, bob = await login("admin"), await login("alice"), await login("bob")
+
+    open_doc = await upload(admin, "invoice open.pdf")
+    alice_doc = await upload(admin, "invoice alice.pdf")
+    bob_doc = await upload(admin, "invoice bob.pdf")
+    multi_doc = await upload(admin, "invoice multi.pdf", signers=["bob"])
+
+    signed = {}
+    for tokens, doc, name in [(alice, alice_doc, "alice"), (bob, bob_doc, "bob")]:
+        response = await client.post(f"/api/documents/{doc['id']}/sign", json=signature_payload(name), headers=auth_header(tokens))
+        assert response.status_code == 200, response.text
+        signed[name] = response.json()["id"]
+
+    return {
+        "tokens": {"admin": admin, "alice": alice, "bob": bob},
+        "uploaded": {open_doc["id"], alice_doc["id"], bob_doc["id"]},
+        "alice_signed": signed["alice"], "bob_signed": signed["bob"], "multi": multi_doc["id"]
+    }
+
+async def search(client, tokens, **params):
+    response = await client.get("/api/documents/search", params=params, headers=auth_header(tokens))
+    assert response.status_code == 200, response.text
+    return response.json()
+
+async def test_admin_sees_all_matches(client, documents):
+    result = await search(client, documents["tokens"]["admin"], q="invo", include_total=True)
+
+    assert result["total"] == 6
+    assert not result["has_more"]
+    assert {item["id"] for item in result["items"]} == (
+        documents["uploaded"] | {documents["alice_signed"], documents["bob_signed"], documents["multi"]}
+    )
+
+async def test_user_sees_only_signable_and_own_signed_documents(client, documents):
+    result = await search(client, documents["tokens"]["alice"], q="invo")
+
+    # 其他用戶簽署的文件及未被指定為簽署者的多人簽署文件不可見
+    assert {item["id"] for item in result["items"]} == documents["uploaded"] | {documents["alice_signed"]}
+
+async def test_multi_signer_document_visible_to_its_signer(client, documents):
+    result = await search(client, documents["tokens"]["bob"], q="invoice multi")
+
+    assert [item["id"] for item in result["items"]] == [documents["multi"]]
+
+async def test_filters_cannot_widen_visibility(client, documents):
+    alice = documents["tokens"]["alice"]
+
+    result = await search(client, alice, q="invo", status="signed")
+    assert [item["id"] for item in result["items"]] == [documents["alice_signed"]]
+
+    result = await search(client, alice, q="invo", signer="bob")
+    assert result["items"] == []
+    assert not result["has_more"]
+
+async def test_pages_report_has_more_without_counting(client, documents):
+    admin = documents["tokens"]["admin"]
+
+    first = await search(client, admin, q="invo", page_size=4)
+    second = await search(client, admin, q="invo", page=2, page_size=4)
+
+    assert (len(first["items"]), first["has_more"], first["total"]) == (4, True, None)
+    assert (len(second["items"]), second["has_more"]) == (2, False)
+    assert {item["id"] for item in first["items"]}.isdisjoint(item["id"] for item in second["items"])
+
+async def test_backfill_marks_unreadable_files_and_skips_them_afterwards(db, monkeypatch, tmp_path):
+    await db.documents.insert_many([
+        {"file_path": str(tmp_path / "missing.pdf"), "original_filename": "missing.pdf"},
+        {"file_path": str(tmp_path / "indexed.pdf"), "original_filename": "indexed.pdf", "text_indexed": True}
+    ])
+    extracted = []
+
+    def extract(file_path, max_chars):
+        extracted.append(file_path)
+        raise OSError("no such file")
+    monkeypatch.setattr("app.utils.pdf_utils.extract_pdf_text", extract)
+
+    await backfill_search_index()
+    await backfill_search_index()
+
+    assert extracted == [str(tmp_path / "missing.pdf")]
+    assert (await db.documents.find_one({"original_filename": "missing.pdf"}))["text_indexed"] == TEXT_INDEX_FAILED
+
+async def test_backfill_skipped_while_another_worker_holds_lease(db, monkeypatch):
+    await db.documents.insert_one({"file_path": "/tmp/a.pdf", "original_filename": "a.pdf"})
+    await db.locks.insert_one({"_id": "search_backfill", "owner": "other", "locked_until": datetime.utcnow() + timedelta(minutes=1)})
+    indexed = []
+
+    async def index(file_path, original_filename):
+        indexed.append(file_path)
+    monkeypatch.setattr(search_module, "index_document_text", index)
+
+    await backfill_search_index()
+    assert indexed == []
+
+    await db.locks.update_one({"_id": "search_backfill"}, {"$set": {"locked_until": datetime.utcnow()}})
+    await backfill_search_index()
+    assert indexed == ["/tmp/a.pdf"]
@@ -0,0 +1,222 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import AutoReconnect
+
+import app.core.sign_jobs as sign_jobs_module
+from app.core.config import settings
+from app.core.sign_jobs import JobProgress, sign_jobs
+from conftest import auth_header, signature_payload
+
+pytestmark = pytest.mark.anyio
+
+async def wait_for_job(client, tokens, job_id, timeout=10.0):
+    """輪詢工作狀態直到完成或失敗"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        response = await client.get(f"/api/jobs/{job_id}", headers=auth_header(tokens))
+        assert response.status_code == 200, response.text
+        job = response.json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        assert asyncio.get_running_loop().time() < deadline, f"工作未完成: {job}"
+        await asyncio.sleep(0.05)
+
+@pytest.fixture
+async def users(create_user, login):
+    await create_user("admin", role="admin")
+    await create_user("alice")
+    await create_user("bob")
+    return {"admin": await login("admin"), "alice": await login("alice"), "bob": await login("bob")}
+
+async def enqueue(client, tokens, document_id, payload):
+    response = await client.post(f"/api/documents/{document_id}/sign?async=true", json=payload, headers=auth_header(tokens))
+    assert response.status_code == 202, response.text
+    body = response.json()
+    assert response.headers["Location"] == body["status_url"] == f"/api/jobs/{body['job_id']}"
+    return body
+
+async def test_async_sign_job_succeeds(client, users, upload):
+    document = await upload(users["admin"])
+
+    queued = await enqueue(client, users["alice"], document["id"], signature_payload("alice"))
+    job = await wait_for_job(client, users["alice"], queued["job_id"])
+
+    assert job["status"] == "succeeded"
+    assert job["progress"] == 1.0
+    assert job["attempts"] == 1
+    result = job["result"]
+    assert result["document_status"] == "signed"
+
+    response = await client.get(result["download_url"], headers=auth_header(users["alice"]))
+    assert response.status_code == 200
+    assert response.content.startswith(b"%PDF")
+
+async def test_job_with_expired_lease_is_reclaimed(client, users, upload, db):
+    document = await upload(users["admin"])
+
+    # 執行中的 worker 中斷後留下的工作：租約已逾期
+    now = datetime.utcnow()
+    result = await db.sign_jobs.insert_one({
+        "document_id": document["id"],
+        "username": "alice",
+        "signature_data": signature_payload("alice")["signature_data"],
+        "status": "running",
+        "stage": "overlay",
+        "progress": 0.4,
+        "attempts": 1,
+        "available_at": now - timedelta(minutes=5),
+        "lease_id": "stale-lease",
+        "locked_until": now - timedelta(minutes=1),
+        "result": None,
+        "error": None,
+        "created_at": now - timedelta(minutes=5),
+        "updated_at": now - timedelta(minutes=5)
+    })
+    sign_jobs.notify()
+
+    job = await wait_for_job(client, users["alice"], str(result.inserted_id))
+    assert job["status"] == "succeeded"
+    assert job["attempts"] == 2
+
+async def test_reclaimed_job_whose_signature_was_applied_succeeds(client, users, upload, db):
+    document = await upload(users["admin"], "contract.pdf", signers=["alice", "bob"])
+
+    # 前一次執行已寫入 alice 的簽名圖層，但在標記完成前租約逾期
+    response = await client.post(
+        f"/api/documents/{document['id']}/sign",
+        json=signature_payload("alice"),
+        headers=auth_header(users["alice"])
+    )
+    assert response.status_code == 200, response.text
+
+    now = datetime.utcnow()
+    result = await db.sign_jobs.insert_one({
+        "document_id": document["id"],
+        "username": "alice",
+        "signature_data": signature_payload("alice")["signature_data"],
+        "status": "running",
+        "stage": "write",
+        "progress": 0.9,
+        "attempts": 1,
+        "available_at": now - timedelta(minutes=5),
+        "lease_id": "stale-lease",
+        "locked_until": now - timedelta(minutes=1),
+        "result": None,
+        "error": None,
+        "created_at": now - timedelta(minutes=5),
+        "updated_at": now - timedelta(minutes=5)
+    })
+    sign_jobs.notify()
+
+    job = await wait_for_job(client, users["alice"], str(result.inserted_id))
+    assert job["status"] == "succeeded"
+    assert job["result"]["next_signer"] == "bob"
+    assert job["result"]["download_url"] is None
+    layers = await db.signature_layers.count_documents({"document_id": ObjectId(document["id"])})
+    assert layers == 1
+
+async def test_job_visible_only_to_owner_and_admin(client, users, upload):
+    document = await upload(users["admin"])
+    queued = await enqueue(client, users["alice"], document["id"], signature_payload("alice"))
+    await wait_for_job(client, users["alice"], queued["job_id"])
+
+    response = await client.get(f"/api/jobs/{queued['job_id']}", headers=auth_header(users["bob"]))
+    assert response.status_code == 404
+    response = await client.get(f"/api/jobs/{queued['job_id']}", headers=auth_header(users["admin"]))
+    assert response.status_code == 200
+
+async def test_unsignable_document_rejected_before_enqueue(client, users, db):
+    response = await client.post(
+        "/api/documents/000000000000000000000000/sign?async=true",
+        json=signature_payload("alice"),
+        headers=auth_header(users["alice"])
+    )
+    assert response.status_code == 404
+    assert await db.sign_jobs.count_documents({}) == 0
+
+async def test_failed_job_reports_error(client, users, upload):
+    document = await upload(users["admin"])
+
+    queued = await enqueue(client, users["alice"], document["id"], {"signature_data": "not json"})
+    job = await wait_for_job(client, users["alice"], queued["job_id"])
+
+    assert job["status"] == "failed"
+    assert job["error"]
+    assert job["error_status"] >= 400
+    assert "result" not in job
+
+async def test_job_events_stream_ends_with_done(client, users, upload):
+    document = await upload(users["admin"])
+    queued = await enqueue(client, users["alice"], document["id"], signature_payload("alice"))
+
+    response = await client.get(f"{queued['events_url']}?token={users['alice']['access_token']}")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = [
+        (lines[0].removeprefix("event: "), json.loads(lines[1].removeprefix("data: ")))
+        for lines in (block.split("\n") for block in response.text.strip().split("\n\n"))
+        if lines[0].startswith("event: ")
+    ]
+    name, view = events[-1]
+    assert name == "done"
+    assert view["status"] == "succeeded"
+    assert all(name == "progress" for name, _ in events[:-1])
+
+async def test_job_events_require_owner(client, users, upload):
+    document = await upload(users["admin"])
+    queued = await enqueue(client, users["alice"], document["id"], signature_payload("alice"))
+
+    response = await client.get(f"{queued['events_url']}?token={users['bob']['access_token']}")
+    assert response.status_code == 404
+    response = await client.get(queued["events_url"])
+    assert response.status_code == 401
+
+async def test_heartbeat_survives_transient_errors_and_stops_when_lease_lost(monkeypatch):
+    monkeypatch.setattr(settings, "sign_job_progress_seconds", 0)
+    results = [AutoReconnect("primary stepped down"), 1, 0]
+
+    class FakeJobs:
+        async def update_one(self, *args, **kwargs):
+            result = results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return type("Result", (), {"matched_count": result})()
+
+    class FakeDatabase:
+        sign_jobs = FakeJobs()
+
+    async def get_database():
+        return FakeDatabase()
+    monkeypatch.setattr(sign_jobs_module, "get_database", get_database)
+
+    await asyncio.wait_for(sign_jobs._heartbeat({"_id": "job", "lease_id": "lease"}, JobProgress()), timeout=1)
+
+    assert results == []
+
+async def test_job_stops_signing_when_lease_lost(db, monkeypatch):
+    cancelled = asyncio.Event()
+
+    async def sign_document_as(*args):
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def heartbeat(job, progress):
+        return
+    monkeypatch.setattr(sign_jobs_module, "sign_document_as", sign_document_as)
+    monkeypatch.setattr(sign_jobs, "_heartbeat", heartbeat)
+    job = {"_id": ObjectId(), "document_id": str(ObjectId()), "username": "alice", "attempts": 1, "lease_id": "lost"}
+    await db.sign_jobs.insert_one({**job, "status": "running", "lease_id": "other-worker"})
+
+    await asyncio.wait_for(sign_jobs._run(job), timeout=1)
+
+    assert cancelled.is_set()
+    # 不寫入結果，由持有租約的工作者完成
+    assert (await db.sign_jobs.find_one({"_id": job["_id"]}))["status"] == "running"
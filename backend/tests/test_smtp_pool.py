@@ -0,0 +1,128 @@
+import time
+from email.mime.multipart import MIMEMultipart
+
+import aiosmtplib
+import pytest
+
+import app.core.email as email_module
+from app.core.email import SMTPConnectionPool, send_email
+
+pytestmark = pytest.mark.anyio
+
+class FakeSMTP:
+    """記錄連線及發送的假 SMTP 連接"""
+
+    instances = []
+    refused_hosts = set()
+
+    def __init__(self, hostname, port, **options):
+        self.hostname = hostname
+        self.port = port
+        self.is_connected = False
+        self.sent = []
+        self.fail_next = None
+        self.quit_called = False
+        FakeSMTP.instances.append(self)
+
+    async def connect(self):
+        if self.hostname in FakeSMTP.refused_hosts:
+            raise ConnectionRefusedError(self.hostname)
+        self.is_connected = True
+
+    async def login(self, username, password):
+        pass
+
+    async def send_message(self, message):
+        if self.fail_next is not None:
+            error, self.fail_next = self.fail_next, None
+            self.is_connected = False
+            raise error
+        self.sent.append(message["To"])
+
+    async def noop(self):
+        pass
+
+    async def quit(self):
+        self.quit_called = True
+        self.is_connected = False
+
+    def close(self):
+        self.is_connected = False
+
+@pytest.fixture(autouse=True)
+def fake_smtp(monkeypatch):
+    FakeSMTP.instances = []
+    FakeSMTP.refused_hosts = set()
+    monkeypatch.setattr(email_module.aiosmtplib, "SMTP", FakeSMTP)
+    return FakeSMTP
+
+def message(to: str = "alice@example.com"):
+    mime = MIMEMultipart("alternative")
+    mime["To"] = to
+    return mime
+
+async def test_connection_reused_across_messages(anyio_backend):
+    pool = SMTPConnectionPool("test", "smtp.test", 25)
+
+    for to in ("a@example.com", "b@example.com", "c@example.com"):
+        await pool.send(message(to))
+
+    [connection] = FakeSMTP.instances
+    assert connection.sent == ["a@example.com", "b@example.com", "c@example.com"]
+    assert pool.stats() == {"idle": 1, "connects": 1, "reused": 2, "failures": 0}
+
+async def test_connection_recycled_after_max_messages(anyio_backend):
+    pool = SMTPConnectionPool("test", "smtp.test", 25)
+    pool.max_messages = 2
+
+    for _ in range(3):
+        await pool.send(message())
+    await pool.close()
+
+    first, second = FakeSMTP.instances
+    assert len(first.sent) == 2 and first.quit_called
+    assert len(second.sent) == 1
+
+async def test_dropped_reused_connection_retried_on_new_connection(anyio_backend):
+    pool = SMTPConnectionPool("test", "smtp.test", 25)
+    await pool.send(message())
+    FakeSMTP.instances[0].fail_next = aiosmtplib.SMTPServerDisconnected("closed by server")
+
+    await pool.send(message("b@example.com"))
+
+    first, second = FakeSMTP.instances
+    assert second.sent == ["b@example.com"]
+    assert pool.stats()["failures"] == 0
+
+async def test_failure_on_new_connection_raised(anyio_backend):
+    pool = SMTPConnectionPool("test", "smtp.test", 25)
+    FakeSMTP.refused_hosts.add("smtp.test")
+
+    with pytest.raises(ConnectionRefusedError):
+        await pool.send(message())
+    assert pool.stats()["idle"] == 0
+
+async def test_idle_connection_replaced_after_timeout(anyio_backend):
+    pool = SMTPConnectionPool("test", "smtp.test", 25)
+    await pool.send(message())
+    pool._idle[0].last_used = time.monotonic() - pool.idle_timeout - 1
+
+    await pool.send(message())
+
+    first, second = FakeSMTP.instances
+    assert not first.is_connected
+    assert pool.stats()["connects"] == 2
+
+async def test_send_email_falls_back_to_next_pool(monkeypatch):
+    pools = [SMTPConnectionPool("starttls", "down.test", 587), SMTPConnectionPool("ssl", "up.test", 465)]
+    monkeypatch.setattr(email_module, "smtp_pools", pools)
+    FakeSMTP.refused_hosts.add("down.test")
+
+    assert await send_email("alice@example.com", "subject", "<p>hi</p>", "hi")
+    assert [instance.hostname for instance in FakeSMTP.instances if instance.sent] == ["up.test"]
+
+async def test_send_email_reports_failure_when_all_pools_fail(monkeypatch):
+    monkeypatch.setattr(email_module, "smtp_pools", [SMTPConnectionPool("starttls", "down.test", 587)])
+    FakeSMTP.refused_hosts.add("down.test")
+
+    assert not await send_email("alice@example.com", "subject", "<p>hi</p>")
@@ -0,0 +1,39 @@
+import multiprocessing
+
+import start_server
+from app.core.config import settings
+
+def test_http_options(monkeypatch):
+    monkeypatch.setattr(settings, "server_workers", 3)
+
+    options = start_server.build_options("http", 7080)
+
+    assert options["bind"] == ["0.0.0.0:7080"]
+    assert options["workers"] == 3
+    assert options["worker_class"] == "uvicorn.workers.UvicornWorker"
+    assert options["max_requests"] == settings.server_max_requests
+    assert options["max_requests_jitter"] == settings.server_max_requests_jitter
+    assert options["child_exit"] is start_server.child_exit
+    assert "keyfile" not in options
+
+def test_workers_default_to_cpu_count(monkeypatch):
+    monkeypatch.setattr(settings, "server_workers", 0)
+
+    assert start_server.build_options("http", 7080)["workers"] == multiprocessing.cpu_count()
+
+def test_https_options_use_certificates():
+    options = start_server.build_options("https", 7443, ssl=True)
+
+    assert options["bind"] == ["0.0.0.0:7443"]
+    assert options["keyfile"] == settings.server_ssl_keyfile
+    assert options["certfile"] == settings.server_ssl_certfile
+    assert options["proc_name"] == "esigned-https"
+
+def test_metrics_dir_cleared_before_workers_start(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    (tmp_path / "counter_1234.db").write_bytes(b"stale")
+    (tmp_path / "keep.txt").write_text("other")
+
+    start_server.prepare_metrics_dir()
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["keep.txt"]
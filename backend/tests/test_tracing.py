@@ -0,0 +1,55 @@
+import json
+import os
+
+import pytest
+
+from app.core.config import settings
+from app.core.tracing import span
+from conftest import auth_header, signature_payload
+
+pytestmark = pytest.mark.anyio
+
+def worker_trace_path() -> str:
+    root, ext = os.path.splitext(settings.tracing_jsonl_path)
+    return f"{root}.{os.getpid()}{ext}"
+
+def read_spans() -> list:
+    with open(worker_trace_path(), encoding="utf-8") as file:
+        return [json.loads(line) for line in file]
+
+async def test_sign_returns_server_timing_for_each_stage(client, create_user, login, upload):
+    await create_user("admin", role="admin")
+    await create_user("alice")
+    document = await upload(await login("admin"))
+
+    response = await client.post(
+        f"/api/documents/{document['id']}/sign",
+        json=signature_payload("alice"),
+        headers=auth_header(await login("alice"))
+    )
+    assert response.status_code == 200, response.text
+
+    stages = [item.split(";")[0] for item in response.headers["Server-Timing"].split(", ")]
+    assert "pdf.sign" in stages
+    assert {"pdf.load", "pdf.overlay", "pdf.write"} <= set(stages)
+
+async def test_spans_written_to_per_worker_file(started_app):
+    with span("test.parent", case="nested") as parent:
+        with span("test.child"):
+            pass
+
+    spans = {record["name"]: record for record in read_spans() if record["name"].startswith("test.")}
+    assert spans["test.child"]["trace_id"] == parent.trace_id
+    assert spans["test.child"]["parent_span_id"] == parent.span_id
+    assert spans["test.parent"]["attributes"] == {"case": "nested"}
+    assert spans["test.parent"]["pid"] == os.getpid()
+    assert not os.path.exists(settings.tracing_jsonl_path)
+
+async def test_span_records_exception(started_app):
+    with pytest.raises(ValueError):
+        with span("test.failure"):
+            raise ValueError("broken")
+
+    [record] = [record for record in read_spans() if record["name"] == "test.failure"]
+    assert record["status"] == "ERROR"
+    assert record["attributes"]["exception.type"] == "ValueError"
@@ -0,0 +1,84 @@
+import pytest
+
+from app.core.cache import TTLCache, invalidate_user, user_cache, user_cache_invalidator
+from app.core.security import get_user_by_id
+from conftest import auth_header
+
+pytestmark = pytest.mark.anyio
+
+async def full_name(client, tokens):
+    response = await client.get("/api/auth/me", headers=auth_header(tokens))
+    assert response.status_code == 200, response.text
+    return response.json()["full_name"]
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache("test", max_size=10, ttl_seconds=-1)
+    cache.set("alice", {"username": "alice"})
+
+    assert cache.get("alice") is None
+    assert cache.stats()["size"] == 0
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache("test", max_size=2, ttl_seconds=60)
+    cache.set("alice", 1)
+    cache.set("bob", 2)
+    cache.get("alice")
+    cache.set("carol", 3)
+
+    assert cache.get("bob") is None
+    assert cache.get("alice") == 1
+    assert cache.get("carol") == 3
+
+def test_ttl_cache_invalidate_where():
+    cache = TTLCache("test", max_size=10, ttl_seconds=60)
+    cache.set("alice", {"_id": 1})
+    cache.set(("id", "1"), {"_id": 1})
+    cache.set("bob", {"_id": 2})
+
+    cache.invalidate_where(lambda user: user["_id"] == 1)
+
+    assert cache.get("alice") is None
+    assert cache.get(("id", "1")) is None
+    assert cache.get("bob") == {"_id": 2}
+
+async def test_user_lookup_served_from_cache(client, db, create_user, login):
+    alice = await create_user("alice")
+    tokens = await login("alice")
+    assert await full_name(client, tokens) is None
+
+    # 直接修改資料庫（未經 API 使快取失效），快取期間仍回傳舊資料
+    await db.users.update_one({"_id": alice["_id"]}, {"$set": {"full_name": "Stale"}})
+    hits = user_cache.hits
+
+    assert await full_name(client, tokens) is None
+    assert user_cache.hits > hits
+
+async def test_profile_update_invalidates_cache(client, create_user, login):
+    await create_user("alice")
+    tokens = await login("alice")
+    assert await full_name(client, tokens) is None
+
+    response = await client.put("/api/users/me", json={"full_name": "Alice Chen"}, headers=auth_header(tokens))
+    assert response.status_code == 200, response.text
+
+    assert await full_name(client, tokens) == "Alice Chen"
+
+async def test_change_from_other_worker_invalidates_cache(client, db, create_user, login):
+    alice = await create_user("alice")
+    tokens = await login("alice")
+    assert await full_name(client, tokens) is None
+
+    # 其他 worker 更新用戶，本 worker 經由 change stream 收到事件
+    await db.users.update_one({"_id": alice["_id"]}, {"$set": {"full_name": "Alice Chen"}})
+    user_cache_invalidator._dispatch({"operationType": "update", "documentKey": {"_id": alice["_id"]}})
+
+    assert await full_name(client, tokens) == "Alice Chen"
+
+async def test_invalidating_username_also_drops_id_entry(db, create_user):
+    alice = await create_user("alice")
+    await get_user_by_id(str(alice["_id"]))
+    await db.users.update_one({"_id": alice["_id"]}, {"$set": {"full_name": "Alice Chen"}})
+
+    invalidate_user(username="alice")
+
+    assert (await get_user_by_id(str(alice["_id"])))["full_name"] == "Alice Chen"
@@ -0,0 +1,81 @@
+import logging
+
+import pytest
+
+import app.core.error_logging as error_logging
+from app.core.config import settings
+from app.core.error_logging import ErrorLogSampler
+from conftest import auth_header
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture(autouse=True)
+def sampler(monkeypatch):
+    sampler = ErrorLogSampler(window_seconds=60, max_per_window=2, max_keys=10)
+    monkeypatch.setattr(error_logging, "validation_log_sampler", sampler)
+    return sampler
+
+def validation_records(caplog) -> list:
+    return [record.fields for record in caplog.records if getattr(record, "fields", {}).get("event") == "validation_error"]
+
+async def register(client, **payload):
+    return await client.post("/api/auth/register", json=payload)
+
+async def test_response_and_log_omit_input(client, caplog):
+    caplog.set_level(logging.WARNING, logger="app.core.error_logging")
+
+    response = await register(client, username="alice", password="very-secret")
+
+    assert response.status_code == 422
+    [error] = response.json()["errors"]
+    assert error["loc"] == ["body", "email"]
+    assert "input" not in error
+    [record] = validation_records(caplog)
+    assert record["path"] == "/api/auth/register"
+    assert record["errors"] == [error]
+
+async def test_logged_body_truncated(client, caplog, monkeypatch):
+    caplog.set_level(logging.WARNING, logger="app.core.error_logging")
+    monkeypatch.setattr(settings, "validation_log_body_max_bytes", 32)
+
+    await register(client, username="alice", password="x" * 10_000)
+
+    [record] = validation_records(caplog)
+    assert record["body"].endswith("…(已截斷)")
+    assert len(record["body"]) < 64
+
+async def test_multipart_body_not_logged(client, caplog, create_user, login):
+    await create_user("admin", role="admin")
+    tokens = await login("admin")
+    caplog.set_level(logging.WARNING, logger="app.core.error_logging")
+
+    response = await client.post(
+        "/api/documents/upload",
+        files={"attachment": ("big.bin", b"\0" * 100_000, "application/octet-stream")},
+        headers=auth_header(tokens)
+    )
+
+    assert response.status_code == 422
+    [record] = validation_records(caplog)
+    assert record["body"] == "<multipart/form-data 略過>"
+
+async def test_repeated_errors_sampled(client, caplog, sampler):
+    caplog.set_level(logging.WARNING, logger="app.core.error_logging")
+
+    # 用戶名不同（避免觸發註冊頻率限制），錯誤相同
+    for index in range(5):
+        assert (await register(client, username=f"user{index}", password="pw1234")).status_code == 422
+
+    assert len(validation_records(caplog)) == 2
+    assert sampler.suppressed_total == 3
+
+    # 下一個窗口的第一筆記錄附上略過的次數
+    sampler.window_seconds = 0
+    await register(client, username="user5", password="pw1234")
+    assert validation_records(caplog)[-1]["suppressed"] == 3
+
+def test_sampler_bounded_by_max_keys(sampler):
+    for key in range(20):
+        assert sampler.sample(key) == (True, 0)
+
+    assert len(sampler._entries) == sampler.max_keys
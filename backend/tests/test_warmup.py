@@ -0,0 +1,40 @@
+import pytest
+
+import app.core.warmup as warmup
+from app.core.warmup import WarmupState, sign_sample_pdf, warm_up
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def state(monkeypatch):
+    state = WarmupState()
+    monkeypatch.setattr(warmup, "warmup_state", state)
+    return state
+
+def test_sign_sample_pdf_exercises_pdf_stack():
+    sign_sample_pdf()
+
+async def test_warm_up_records_result(state):
+    await warm_up()
+
+    assert state.completed
+    assert state.error is None
+    assert state.stats()["duration_ms"] > 0
+
+async def test_failed_warm_up_does_not_block_startup(state, monkeypatch):
+    def broken():
+        raise RuntimeError("no fonts")
+    monkeypatch.setattr(warmup, "sign_sample_pdf", broken)
+
+    await warm_up()
+
+    assert state.completed
+    assert state.error == "no fonts"
+
+async def test_readiness_reports_warm_up_without_gating_on_it(client):
+    # 測試環境未啟用預熱；預熱在 lifespan 中完成後才接受請求，就緒檢查不再另外判斷
+    response = await client.get("/health/ready")
+
+    assert response.status_code == 200, response.text
+    assert response.json()["status"] == "ready"
+    assert response.json()["warmup"] == {"completed": False, "duration_ms": None, "error": None}
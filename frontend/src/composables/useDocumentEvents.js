@@ -0,0 +1,106 @@
+import { onMounted, onUnmounted } from 'vue'
+import api from '@/services/api'
+
+/**
+ * 文件變更事件組合式函數
+ * 透過 Server-Sent Events 接收文件新增、更新、刪除的增量通知，
+ * 避免每次切換頁面都重新載入完整列表
+ *
+ * @param {Object} handlers - { created, updated, deleted, resync } 事件處理函數
+ */
+export function useDocumentEvents(handlers) {
+  let source = null
+  let connectedOnce = false
+
+  const emit = (name, data) => {
+    if (handlers[name]) {
+      handlers[name](data)
+    }
+  }
+
+  const disconnect = () => {
+    if (source) {
+      source.close()
+      source = null
+    }
+  }
+
+  const connect = () => {
+    const token = localStorage.getItem('token')
+    if (!token || typeof EventSource === 'undefined') return
+
+    source = new EventSource(`/api/documents/events?token=${encodeURIComponent(token)}`)
+
+    source.onerror = () => {
+      // 網路中斷時 EventSource 會自動重連；令牌過期（401）則直接關閉。
+      // 以一般 API 請求觸發攔截器刷新令牌，刷新後由 token-refreshed 事件重新連線
+      if (source && source.readyState === EventSource.CLOSED) {
+        disconnect()
+        api.get('/auth/me').then(() => {
+          if (!source && localStorage.getItem('token') !== token) {
+            connect()
+          }
+        }).catch(() => {})
+      }
+    }
+
+    source.addEventListener('ready', (event) => {
+      const { live } = JSON.parse(event.data)
+      if (!live) {
+        // 伺服器無法即時推送，維持原本的重新載入方式
+        disconnect()
+        return
+      }
+      // 斷線重連期間可能遺漏事件，重新載入一次完整列表
+      if (connectedOnce) {
+        emit('resync', {})
+      }
+      connectedOnce = true
+    })
+
+    ;['created', 'updated', 'deleted', 'resync'].forEach((name) => {
+      source.addEventListener(name, (event) => {
+        emit(name, JSON.parse(event.data))
+      })
+    })
+  }
+
+  // 令牌刷新後以新令牌重新連線（查詢參數中的令牌無法更新）
+  const onTokenRefreshed = () => {
+    disconnect()
+    connect()
+  }
+
+  onMounted(() => {
+    window.addEventListener('token-refreshed', onTokenRefreshed)
+    connect()
+  })
+  onUnmounted(() => {
+    window.removeEventListener('token-refreshed', onTokenRefreshed)
+    disconnect()
+  })
+
+  return { connect, disconnect }
+}
+
+/**
+ * 將文件新增或更新到列表（依建立時間新到舊排序）
+ */
+export function upsertDocument(list, doc) {
+  const index = list.findIndex(item => item.id === doc.id)
+  if (index >= 0) {
+    list.splice(index, 1, doc)
+  } else {
+    list.unshift(doc)
+  }
+}
+
+/**
+ * 從列表移除文件
+ */
+export function removeDocument(list, id) {
+  const index = list.findIndex(item => item.id === id)
+  if (index >= 0) {
+    list.splice(index, 1)
+  }
+}
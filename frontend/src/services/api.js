@@ -23,15 +23,92 @@ api.interceptors.request.use(
   }
 )
 
+// 同時有多個請求收到 401 時只刷新一次
+let refreshPromise = null
+
+const REFRESH_LOCK = 'esigned-token-refresh'
+
+const refreshAccessToken = async () => {
+  const refreshToken = localStorage.getItem('refresh_token')
+  if (!refreshToken) {
+    throw new Error('No refresh token')
+  }
+
+  // 直接使用 axios，避免再次進入此攔截器
+  const response = await axios.post('/api/auth/refresh', { refresh_token: refreshToken })
+  const { access_token, refresh_token } = response.data
+
+  localStorage.setItem('token', access_token)
+  localStorage.setItem('refresh_token', refresh_token)
+  api.defaults.headers.common['Authorization'] = `Bearer ${access_token}`
+  window.dispatchEvent(new CustomEvent('token-refreshed', { detail: { token: access_token } }))
+
+  return access_token
+}
+
+/**
+ * 跨分頁只刷新一次
+ * 刷新令牌只能使用一次，多個分頁同時以同一個刷新令牌刷新會被視為令牌外洩。
+ * 以 Web Locks 讓各分頁依序刷新；取得鎖時若其他分頁已換發新令牌，直接使用新令牌
+ */
+const refreshOnce = async (failedToken) => {
+  const refreshIfStale = () => {
+    const current = localStorage.getItem('token')
+    if (current && current !== failedToken) {
+      api.defaults.headers.common['Authorization'] = `Bearer ${current}`
+      return current
+    }
+    return refreshAccessToken()
+  }
+
+  if (navigator.locks?.request) {
+    return navigator.locks.request(REFRESH_LOCK, refreshIfStale)
+  }
+  return refreshIfStale()
+}
+
+// 其他分頁刷新令牌後同步到本分頁（storage 事件只在其他分頁觸發）
+window.addEventListener('storage', (event) => {
+  if (event.key === 'token' && event.newValue) {
+    api.defaults.headers.common['Authorization'] = `Bearer ${event.newValue}`
+    window.dispatchEvent(new CustomEvent('token-refreshed', { detail: { token: event.newValue } }))
+  }
+})
+
+const isAuthRequest = (config) => {
+  return ['/auth/login', '/auth/refresh', '/auth/logout'].some(path => config.url?.startsWith(path))
+}
+
 // 響應攔截器
 api.interceptors.response.use(
   (response) => {
     return response
   },
-  (error) => {
+  async (error) => {
+    const originalRequest = error.config
+
+    // 訪問令牌過期時使用刷新令牌取得新令牌並重試一次
+    if (error.response?.status === 401 && originalRequest && !originalRequest._retry && !isAuthRequest(originalRequest) && localStorage.getItem('refresh_token')) {
+      originalRequest._retry = true
+      try {
+        if (!refreshPromise) {
+          const failedToken = originalRequest.headers.Authorization?.replace(/^Bearer /, '')
+          refreshPromise = refreshOnce(failedToken).finally(() => {
+            refreshPromise = null
+          })
+        }
+        const token = await refreshPromise
+        originalRequest.headers.Authorization = `Bearer ${token}`
+        return api(originalRequest)
+      } catch (refreshError) {
+        // 刷新失敗，需要重新登入
+      }
+    }
+
     if (error.response?.status === 401) {
       // 清除本地存儲的 token
       localStorage.removeItem('token')
+      localStorage.removeItem('refresh_token')
       // 重定向到登入頁面
       window.location.href = '/login'
     }
@@ -39,4 +116,4 @@ api.interceptors.response.use(
   }
 )
 
-export default api
\ No newline at end of file
+export default api
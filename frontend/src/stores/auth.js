@@ -20,10 +20,13 @@ export const useAuthStore = defineStore('auth', () => {
           'Content-Type': 'application/x-www-form-urlencoded'
         }
       })
-      const { access_token } = response.data
+      const { access_token, refresh_token } = response.data
       
       token.value = access_token
       localStorage.setItem('token', access_token)
+      if (refresh_token) {
+        localStorage.setItem('refresh_token', refresh_token)
+      }
       
       // 設定 axios 預設 header
       api.defaults.headers.common['Authorization'] = `Bearer ${access_token}`
@@ -70,15 +73,33 @@ export const useAuthStore = defineStore('auth', () => {
   }
 
   const logout = async () => {
+    // 通知後端撤銷令牌（訪問令牌過期時仍撤銷刷新令牌；失敗時仍清除本地狀態）
+    if (token.value || localStorage.getItem('refresh_token')) {
+      try {
+        await api.post('/auth/logout', {
+          refresh_token: localStorage.getItem('refresh_token')
+        })
+      } catch (error) {
+        // 忽略錯誤
+      }
+    }
     user.value = null
     token.value = null
     localStorage.removeItem('token')
+    localStorage.removeItem('refresh_token')
     delete api.defaults.headers.common['Authorization']
   }
 
   const changePassword = async (passwordData) => {
     try {
       const response = await api.post('/auth/change-password', passwordData)
+      // 修改密碼後舊令牌失效，改用新令牌
+      if (response.data.access_token) {
+        token.value = response.data.access_token
+        localStorage.setItem('token', response.data.access_token)
+        localStorage.setItem('refresh_token', response.data.refresh_token)
+        api.defaults.headers.common['Authorization'] = `Bearer ${response.data.access_token}`
+      }
       return response.data
     } catch (error) {
       throw error
@@ -103,6 +124,11 @@ export const useAuthStore = defineStore('auth', () => {
     }
   }
 
+  // 攔截器刷新令牌後同步狀態
+  window.addEventListener('token-refreshed', (event) => {
+    token.value = event.detail.token
+  })
+
   // 初始化時檢查 token
   if (token.value) {
     api.defaults.headers.common['Authorization'] = `Bearer ${token.value}`